@@ -0,0 +1,204 @@
+## app/auth/password_pool.py
+
+import asyncio
+import math
+import multiprocessing
+import threading
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from passlib.hash import bcrypt
+
+
+# bcrypt cost bounds for auto-tuning; each step doubles the work
+MIN_ROUNDS = 10
+MAX_ROUNDS = 15
+DEFAULT_ROUNDS = 12   # passlib's default, used until calibration finishes
+
+
+class PasswordPoolBusy(Exception):
+    """Too many hash / verify calls in flight; the caller should retry later."""
+
+
+# -----------------------------------------------
+# Worker-side functions (module level so they pickle)
+# -----------------------------------------------
+def _hash(password: str, rounds: int) -> str:
+    return bcrypt.using(rounds=rounds).hash(password)
+
+
+def _rounds_of(hashed: str) -> Optional[int]:
+    # $2b$12$<salt+checksum>
+    try:
+        return int(hashed.split("$")[2])
+    except (IndexError, ValueError):
+        return None
+
+
+def _verify_and_update(
+    password: str, hashed: str, rounds: int, upgrade_only: bool
+) -> Tuple[bool, Optional[str]]:
+    """(valid, new_hash); new_hash is set when the stored cost is outdated."""
+    if not bcrypt.verify(password, hashed):
+        return False, None
+
+    stored = _rounds_of(hashed)
+    outdated = stored is None or (stored < rounds if upgrade_only else stored != rounds)
+    return True, (_hash(password, rounds) if outdated else None)
+
+
+def _time_hash(rounds: int, samples: int = 3) -> float:
+    best = math.inf
+    for _ in range(samples):
+        start = time.perf_counter()
+        _hash("calibration-password", rounds)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+class PasswordPool:
+    """
+    Runs bcrypt in a small process pool so password work never holds the
+    GIL or a slot of the request threadpool for long. At most
+    workers + max_queue calls are admitted at once; beyond that callers get
+    PasswordPoolBusy immediately instead of queueing behind a login storm.
+    Callers await the result on the event loop, so a waiting login holds
+    neither a request thread nor the loop.
+
+    With rounds=0 the bcrypt cost is calibrated at start() to the largest
+    value that hashes within target_ms, and stored hashes below it are
+    upgraded on the next successful login. A fixed rounds value rehashes
+    anything that differs from it.
+    """
+
+    def __init__(
+        self,
+        workers: int = 2,
+        max_queue: int = 16,
+        timeout_seconds: float = 10.0,
+        rounds: int = 0,
+        target_ms: float = 250.0,
+    ):
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout_seconds = timeout_seconds
+        self.fixed_rounds = rounds
+        self.target_ms = target_ms
+        self.rounds = rounds or DEFAULT_ROUNDS
+        self.calibrated = bool(rounds)
+
+        self._pool: Optional[ProcessPoolExecutor] = None
+        self._lock = threading.Lock()
+        self._in_flight = 0
+
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+        self.rehashed = 0
+        self.hash_ms: Optional[float] = None   # estimated, from calibration
+
+    # -----------------------------------------------
+    # Lifecycle
+    # -----------------------------------------------
+    def start(self):
+        if self.workers > 0 and self._pool is None:
+            # spawn: workers only import this module, not the running app
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn"),
+            )
+        if not self.calibrated:
+            self._calibrate()
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.shutdown(wait=False, cancel_futures=True)
+            self._pool = None
+
+    def _calibrate(self):
+        """Pick the bcrypt cost for target_ms; runs in the background."""
+
+        def apply(seconds: float):
+            # cost doubles per round: go up from MIN_ROUNDS while it fits
+            steps = math.floor(math.log2(self.target_ms / 1000 / seconds)) if seconds > 0 else 0
+            self.rounds = min(MAX_ROUNDS, max(MIN_ROUNDS, MIN_ROUNDS + steps))
+            self.hash_ms = seconds * 1000 * 2 ** (self.rounds - MIN_ROUNDS)
+            self.calibrated = True
+            print(f"Password hashing: bcrypt rounds={self.rounds} (~{self.hash_ms:.0f} ms, target {self.target_ms:.0f} ms)")
+
+        if self._pool is None:
+            threading.Thread(target=lambda: apply(_time_hash(MIN_ROUNDS)), daemon=True).start()
+            return
+
+        def done(future: Future):
+            try:
+                apply(future.result())
+            except Exception as e:
+                print("Password cost calibration failed:", e)
+
+        self._pool.submit(_time_hash, MIN_ROUNDS).add_done_callback(done)
+
+    # -----------------------------------------------
+    # Admission + dispatch
+    # -----------------------------------------------
+    def _finish(self, _future: Optional[Future] = None):
+        with self._lock:
+            self._in_flight -= 1
+            self.completed += 1
+
+    async def _run(self, fn: Callable, *args) -> Any:
+        with self._lock:
+            if self._in_flight >= self.workers + self.max_queue:
+                self.rejected += 1
+                raise PasswordPoolBusy()
+            self._in_flight += 1
+
+        if self._pool is None:
+            # no pool (workers=0 or not started): run on a thread
+            try:
+                return await asyncio.to_thread(fn, *args)
+            finally:
+                self._finish()
+
+        try:
+            future = self._pool.submit(fn, *args)
+        except Exception:
+            self._finish()
+            raise
+        # the slot is released when the job really ends, not when we stop waiting
+        future.add_done_callback(self._finish)
+        try:
+            return await asyncio.wait_for(
+                asyncio.shield(asyncio.wrap_future(future)), self.timeout_seconds
+            )
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise PasswordPoolBusy()
+
+    async def hash(self, password: str) -> str:
+        return await self._run(_hash, password, self.rounds)
+
+    async def verify_and_update(self, password: str, hashed: str) -> Tuple[bool, Optional[str]]:
+        """(valid, new_hash); store new_hash when it isn't None."""
+        ok, new_hash = await self._run(
+            _verify_and_update, password, hashed, self.rounds, not self.fixed_rounds
+        )
+        if new_hash is not None:
+            self.rehashed += 1
+        return ok, new_hash
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "workers": self.workers,
+            "max_queue": self.max_queue,
+            "in_flight": self._in_flight,
+            "rounds": self.rounds,
+            "calibrated": self.calibrated,
+            "target_ms": self.target_ms,
+            "hash_ms": self.hash_ms,
+            "completed": self.completed,
+            "rejected": self.rejected,
+            "timeouts": self.timeouts,
+            "rehashed": self.rehashed,
+        }
@@ -1,7 +1,13 @@
-from fastapi import APIRouter, HTTPException
+import asyncio
+
+from fastapi import APIRouter, Depends, HTTPException
 from pydantic import BaseModel, EmailStr
 from app.database import get_db_connection
-from app.auth.security import hash_password, verify_password, create_access_token
+from app.auth.security import (
+    hash_password, verify_and_update_password, issue_tokens, refresh_tokens,
+    get_current_user, require_manager, token_cache, sessions,
+    password_pool, PasswordPoolBusy, busy_response, InvalidRefreshToken,
+)
 
 router = APIRouter(prefix="/auth", tags=["Auth"])
 
@@ -21,39 +27,84 @@ class LoginSchema(BaseModel):
     password: str
 
 
+class RefreshSchema(BaseModel):
+    refresh_token: str
+
+
 # -----------------------------
-# REGISTER USER
+# USERS TABLE (psycopg2 is blocking: called through asyncio.to_thread)
 # -----------------------------
 
-@router.post("/register")
-def register(data: RegisterSchema):
+def _find_user(email: str):
     conn = get_db_connection()
-    cur = conn.cursor()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, email, password_hash, role FROM users WHERE email=%s",
+            (email,)
+        )
+        user = cur.fetchone()
+        cur.close()
+        return user
+    finally:
+        conn.close()
 
-    # Check existing user
-    cur.execute("SELECT id FROM users WHERE email=%s", (data.email,))
-    if cur.fetchone():
+
+def _insert_user(email: str, hashed: str, role: str):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            """
+            INSERT INTO users (email, password_hash, role)
+            VALUES (%s, %s, %s)
+            RETURNING id, email, role
+            """,
+            (email, hashed, role)
+        )
+        user = cur.fetchone()
+        conn.commit()
         cur.close()
+        return user
+    finally:
         conn.close()
+
+
+def _store_password_hash(user_id, new_hash: str):
+    conn = get_db_connection()
+    try:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE users SET password_hash=%s WHERE id=%s",
+            (new_hash, user_id)
+        )
+        conn.commit()
+        cur.close()
+    except Exception as e:
+        conn.rollback()
+        print("Password rehash failed:", e)
+    finally:
+        conn.close()
+
+
+# -----------------------------
+# REGISTER USER
+# -----------------------------
+
+@router.post("/register")
+async def register(data: RegisterSchema):
+    # Check existing user
+    if await asyncio.to_thread(_find_user, data.email):
         raise HTTPException(status_code=400, detail="User already exists")
 
-    # Hash password
-    hashed = hash_password(data.password)
+    # Hash password (in the password pool; awaited, no thread held)
+    try:
+        hashed = await hash_password(data.password)
+    except PasswordPoolBusy:
+        raise busy_response()
 
     # Insert new user
-    cur.execute(
-        """
-        INSERT INTO users (email, password_hash, role)
-        VALUES (%s, %s, %s)
-        RETURNING id, email, role
-        """,
-        (data.email, hashed, data.role)
-    )
-
-    user = cur.fetchone()
-    conn.commit()
-    cur.close()
-    conn.close()
+    user = await asyncio.to_thread(_insert_user, data.email, hashed, data.role)
 
     return {
         "message": "User created successfully",
@@ -66,39 +117,69 @@ def register(data: RegisterSchema):
 # -----------------------------
 
 @router.post("/login")
-def login(data: LoginSchema):
-    conn = get_db_connection()
-    cur = conn.cursor()
-
-    cur.execute(
-        "SELECT id, email, password_hash, role FROM users WHERE email=%s",
-        (data.email,)
-    )
-    user = cur.fetchone()
+async def login(data: LoginSchema):
+    user = await asyncio.to_thread(_find_user, data.email)
 
     if not user:
-        cur.close()
-        conn.close()
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
     # Verify password
-    if not verify_password(data.password, user["password_hash"]):
-        cur.close()
-        conn.close()
+    try:
+        valid, new_hash = await verify_and_update_password(data.password, user["password_hash"])
+    except PasswordPoolBusy:
+        raise busy_response()
+
+    if not valid:
         raise HTTPException(status_code=401, detail="Invalid email or password")
 
-    # Generate JWT token
-    token = create_access_token({
-        "sub": str(user["id"]),
-        "email": user["email"],
-        "role": user["role"]
-    })
+    # Stored with an outdated bcrypt cost: swap in the new hash
+    if new_hash:
+        await asyncio.to_thread(_store_password_hash, user["id"], new_hash)
+
+    # Short-lived JWT plus a refresh token for renewing it
+    return await asyncio.to_thread(issue_tokens, user)
+
+
+# -----------------------------
+# REFRESH (rotates the refresh token, no password check)
+# -----------------------------
+
+@router.post("/refresh")
+def refresh(data: RefreshSchema):
+    try:
+        return refresh_tokens(data.refresh_token)
+    except InvalidRefreshToken:
+        raise HTTPException(status_code=401, detail="Session expired, please sign in again")
+
 
-    cur.close()
-    conn.close()
+# -----------------------------
+# LOGOUT (ends the refresh token's session)
+# -----------------------------
+
+@router.post("/logout")
+def logout(data: RefreshSchema):
+    return {"revoked": sessions.revoke(data.refresh_token)}
+
+
+# -----------------------------
+# REVOKE ALL SESSIONS OF A USER
+# -----------------------------
+
+@router.post("/users/{user_id}/revoke-sessions")
+def revoke_user_sessions(user_id: str, user=Depends(get_current_user)):
+    require_manager(user)
+    return {"revoked": sessions.revoke_user(user_id)}
+
+
+# -----------------------------
+# AUTH STATS (token cache hit rate, password pool, sessions)
+# -----------------------------
 
+@router.get("/stats")
+def auth_stats(user=Depends(get_current_user)):
+    require_manager(user)
     return {
-        "access_token": token,
-        "token_type": "bearer",
-        "role": user["role"]
+        "token_cache": token_cache.stats(),
+        "password_pool": password_pool.stats(),
+        "sessions": sessions.stats(),
     }
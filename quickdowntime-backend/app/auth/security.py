@@ -1,27 +1,48 @@
 ##app/auth/security.py
 
 
+import os
 from datetime import datetime, timedelta
 from fastapi import Depends, HTTPException
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import jwt, JWTError
-from passlib.context import CryptContext
 
 from app.config import settings
+from app.auth.token_cache import VerifiedTokenCache
+from app.auth.password_pool import PasswordPool, PasswordPoolBusy
+from app.auth.sessions import SessionStore, InvalidRefreshToken
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Password hashing: bcrypt runs in its own processes, off the request threadpool
+password_pool = PasswordPool(
+    workers=settings.PASSWORD_POOL_WORKERS,
+    max_queue=settings.PASSWORD_POOL_MAX_QUEUE,
+    timeout_seconds=settings.PASSWORD_POOL_TIMEOUT_SECONDS,
+    rounds=settings.PASSWORD_BCRYPT_ROUNDS,
+    target_ms=settings.PASSWORD_HASH_TARGET_MS,
+)
 
-def hash_password(password: str) -> str:
-    return pwd_context.hash(password)
+async def hash_password(password: str) -> str:
+    return await password_pool.hash(password)
 
-def verify_password(plain: str, hashed: str) -> bool:
-    return pwd_context.verify(plain, hashed)
+async def verify_password(plain: str, hashed: str) -> bool:
+    return (await password_pool.verify_and_update(plain, hashed))[0]
+
+async def verify_and_update_password(plain: str, hashed: str):
+    """(valid, new_hash): new_hash replaces the stored one when not None."""
+    return await password_pool.verify_and_update(plain, hashed)
+
+
+def busy_response() -> HTTPException:
+    return HTTPException(
+        status_code=429,
+        detail="Too many sign-ins in progress, please retry shortly",
+        headers={"Retry-After": "1"},
+    )
 
 
 # JWT settings
 ALGORITHM = "HS256"
-ACCESS_TOKEN_EXPIRE_MINUTES = 60
+ACCESS_TOKEN_EXPIRE_MINUTES = settings.AUTH_ACCESS_TOKEN_MINUTES
 
 def create_access_token(data: dict):
     to_encode = data.copy()
@@ -30,13 +51,90 @@ def create_access_token(data: dict):
     return jwt.encode(to_encode, settings.SECRET_KEY, algorithm=ALGORITHM)
 
 
+# Refresh-token sessions: renewing an access token is an HMAC check and a
+# SQLite row update, never a password verify
+sessions = SessionStore(
+    db_path=os.path.join(settings.DATA_DIR, "auth_sessions.sqlite3"),
+    secret_key=settings.SECRET_KEY,
+    ttl_seconds=settings.AUTH_REFRESH_TOKEN_DAYS * 86400,
+    max_age_seconds=settings.AUTH_SESSION_MAX_DAYS * 86400,
+    cache_seconds=settings.AUTH_SESSION_CACHE_SECONDS,
+    cache_size=settings.AUTH_TOKEN_CACHE_SIZE,
+    reuse_grace_seconds=settings.AUTH_REFRESH_REUSE_GRACE_SECONDS,
+)
+
+def issue_tokens(user: dict) -> dict:
+    """Access + refresh token pair for a user who just signed in."""
+    sid, refresh_token = sessions.create(user)
+    return {
+        "access_token": create_access_token({
+            "sub": str(user["id"]),
+            "email": user["email"],
+            "role": user["role"],
+            "sid": sid,
+        }),
+        "refresh_token": refresh_token,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "role": user["role"],
+    }
+
+def refresh_tokens(refresh_token: str) -> dict:
+    """Rotate a refresh token; raises InvalidRefreshToken."""
+    claims, new_refresh = sessions.rotate(refresh_token)
+    return {
+        "access_token": create_access_token(claims),
+        "refresh_token": new_refresh,
+        "token_type": "bearer",
+        "expires_in": ACCESS_TOKEN_EXPIRE_MINUTES * 60,
+        "role": claims["role"],
+    }
+
+
+# Claims of recently verified tokens, so repeat requests skip the HMAC check
+token_cache = VerifiedTokenCache(
+    max_entries=settings.AUTH_TOKEN_CACHE_SIZE,
+    ttl_seconds=settings.AUTH_TOKEN_CACHE_TTL_SECONDS,
+)
+
+def _verified_claims(token: str) -> dict:
+    claims = token_cache.get(token)
+    if claims is None:
+        claims = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        token_cache.put(token, claims)
+    return claims
+
+def decode_token(token: str) -> dict:
+    """
+    Verified claims for a token; raises JWTError if invalid or expired.
+    A session cache miss reads SQLite inline: from async code use
+    adecode_token().
+    """
+    claims = _verified_claims(token)
+
+    # tokens from before sessions existed have no sid and simply expire
+    sid = claims.get("sid")
+    if sid and not sessions.is_active(sid):
+        raise JWTError("Session revoked")
+    return claims
+
+async def adecode_token(token: str) -> dict:
+    """decode_token() for the event loop: the session lookup runs in a thread."""
+    claims = _verified_claims(token)
+
+    sid = claims.get("sid")
+    if sid and not await sessions.ais_active(sid):
+        raise JWTError("Session revoked")
+    return claims
+
+
 # Bearer authentication
 auth_scheme = HTTPBearer()
 
-def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
+async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(auth_scheme)):
     token = credentials.credentials
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[ALGORITHM])
+        payload = await adecode_token(token)
         return {
             "id": payload.get("sub"),
             "email": payload.get("email"),
@@ -0,0 +1,311 @@
+## app/auth/sessions.py
+
+import asyncio
+import hashlib
+import hmac
+import os
+import secrets
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+class InvalidRefreshToken(Exception):
+    """Unknown, expired, revoked or already-rotated refresh token."""
+
+
+class SessionStore:
+    """
+    Server-side login sessions backing refresh tokens.
+
+    A refresh token is "<session id>.<secret>". The table keeps one compact
+    row per session: the claims needed to mint access tokens (so renewal
+    never touches the users table or bcrypt) and an HMAC of the current
+    secret. Every refresh rotates the secret with a compare-and-swap, so a
+    token works once; presenting the previous one again after
+    reuse_grace_seconds is treated as theft and revokes the session.
+
+    Access tokens carry the session id as "sid". is_active() answers from a
+    small in-memory cache for cache_seconds, so revoking a session takes
+    effect at once on this worker and within cache_seconds on the others.
+    Only a revoked or ended session is refused: a sid this store has no row
+    for (fresh DATA_DIR, another host) passes, since the access token is
+    signed and short-lived anyway.
+    """
+
+    def __init__(
+        self,
+        db_path: str,
+        secret_key: str,
+        ttl_seconds: float = 14 * 86400,
+        max_age_seconds: float = 30 * 86400,
+        cache_seconds: float = 30.0,
+        cache_size: int = 10000,
+        reuse_grace_seconds: float = 10.0,
+    ):
+        self.db_path = db_path
+        self.ttl_seconds = ttl_seconds
+        self.max_age_seconds = max_age_seconds
+        self.cache_seconds = cache_seconds
+        self.cache_size = cache_size
+        self.reuse_grace_seconds = reuse_grace_seconds
+        self._key = hashlib.sha256(("refresh:" + secret_key).encode("utf-8")).digest()
+
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # sid -> (checked_at, active)
+        self._active: "OrderedDict[str, Tuple[float, bool]]" = OrderedDict()
+        self._cache_lock = threading.Lock()
+
+        self.created = 0
+        self.rotated = 0
+        self.rejected = 0
+        self.reuse_detected = 0
+        self.revoked = 0
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    # -----------------------------------------------
+    # SQLite backing
+    # -----------------------------------------------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            # several uvicorn workers share the file
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS auth_sessions ("
+                " id TEXT PRIMARY KEY,"
+                " user_id TEXT NOT NULL,"
+                " email TEXT NOT NULL,"
+                " role TEXT NOT NULL,"
+                " token_hash BLOB NOT NULL,"
+                " prev_hash BLOB,"
+                " created_at REAL NOT NULL,"
+                " rotated_at REAL NOT NULL,"
+                " expires_at REAL NOT NULL,"
+                " revoked_at REAL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS auth_sessions_user ON auth_sessions (user_id)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _hash(self, secret: str) -> bytes:
+        return hmac.new(self._key, secret.encode("utf-8"), hashlib.sha256).digest()
+
+    @staticmethod
+    def _split(refresh_token: str) -> Tuple[str, str]:
+        sid, _, secret = (refresh_token or "").partition(".")
+        if not sid or not secret:
+            raise InvalidRefreshToken()
+        return sid, secret
+
+    def _remember(self, sid: str, active: bool):
+        with self._cache_lock:
+            self._active[sid] = (time.time(), active)
+            self._active.move_to_end(sid)
+            while len(self._active) > self.cache_size:
+                self._active.popitem(last=False)
+
+    # -----------------------------------------------
+    # Sessions
+    # -----------------------------------------------
+    def create(self, user: Dict[str, Any]) -> Tuple[str, str]:
+        """Open a session for a user who just signed in: (sid, refresh_token)."""
+        sid = secrets.token_urlsafe(12)
+        secret = secrets.token_urlsafe(32)
+        now = time.time()
+
+        with self._db_lock:
+            conn = self._db()
+            conn.execute(
+                "INSERT INTO auth_sessions"
+                " (id, user_id, email, role, token_hash, created_at, rotated_at, expires_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (
+                    sid, str(user["id"]), user["email"], user["role"],
+                    self._hash(secret), now, now,
+                    min(now + self.ttl_seconds, now + self.max_age_seconds),
+                ),
+            )
+            # drop sessions that ended a while ago (kept briefly for reuse checks)
+            conn.execute(
+                "DELETE FROM auth_sessions WHERE expires_at < ?",
+                (now - self.ttl_seconds,),
+            )
+            conn.commit()
+
+        self.created += 1
+        self._remember(sid, True)
+        return sid, f"{sid}.{secret}"
+
+    def rotate(self, refresh_token: str) -> Tuple[Dict[str, Any], str]:
+        """
+        Exchange a refresh token for (claims, new refresh token). Raises
+        InvalidRefreshToken; the old token stops working either way.
+        """
+        sid, secret = self._split(refresh_token)
+        presented = self._hash(secret)
+        now = time.time()
+
+        with self._db_lock:
+            conn = self._db()
+            row = conn.execute(
+                "SELECT user_id, email, role, token_hash, prev_hash, created_at,"
+                " rotated_at, expires_at, revoked_at FROM auth_sessions WHERE id = ?",
+                (sid,),
+            ).fetchone()
+
+            if row is None:
+                self.rejected += 1
+                raise InvalidRefreshToken()
+
+            user_id, email, role, token_hash, prev_hash, created_at, rotated_at, expires_at, revoked_at = row
+            if revoked_at is not None or now >= expires_at:
+                self.rejected += 1
+                raise InvalidRefreshToken()
+
+            if not hmac.compare_digest(presented, token_hash):
+                self.rejected += 1
+                if prev_hash is not None and hmac.compare_digest(presented, prev_hash):
+                    if now - rotated_at > self.reuse_grace_seconds:
+                        # an old token came back: assume it leaked
+                        self.reuse_detected += 1
+                        self._revoke_locked(conn, "id = ?", (sid,), now)
+                        conn.commit()
+                        self._remember(sid, False)
+                    # else: a second tab raced the rotation; it should pick up
+                    # the new token instead of killing the session
+                raise InvalidRefreshToken()
+
+            new_secret = secrets.token_urlsafe(32)
+            cur = conn.execute(
+                "UPDATE auth_sessions SET token_hash = ?, prev_hash = ?, rotated_at = ?, expires_at = ?"
+                " WHERE id = ? AND token_hash = ? AND revoked_at IS NULL",
+                (
+                    self._hash(new_secret), token_hash, now,
+                    min(now + self.ttl_seconds, created_at + self.max_age_seconds),
+                    sid, token_hash,
+                ),
+            )
+            conn.commit()
+
+        if cur.rowcount != 1:
+            # another worker rotated or revoked it between our read and write
+            self.rejected += 1
+            raise InvalidRefreshToken()
+
+        self.rotated += 1
+        self._remember(sid, True)
+        return {"sub": user_id, "email": email, "role": role, "sid": sid}, f"{sid}.{new_secret}"
+
+    def _revoke_locked(self, conn: sqlite3.Connection, where: str, params: tuple, now: float) -> int:
+        cur = conn.execute(
+            f"UPDATE auth_sessions SET revoked_at = ? WHERE {where} AND revoked_at IS NULL",
+            (now, *params),
+        )
+        self.revoked += cur.rowcount
+        return cur.rowcount
+
+    def revoke(self, refresh_token: str) -> bool:
+        """Sign out the session a refresh token belongs to (needs its secret)."""
+        try:
+            sid, secret = self._split(refresh_token)
+        except InvalidRefreshToken:
+            return False
+
+        presented = self._hash(secret)
+        with self._db_lock:
+            conn = self._db()
+            row = conn.execute(
+                "SELECT token_hash, prev_hash FROM auth_sessions WHERE id = ?", (sid,)
+            ).fetchone()
+            if row is None or not any(
+                h is not None and hmac.compare_digest(presented, h) for h in row
+            ):
+                return False
+            count = self._revoke_locked(conn, "id = ?", (sid,), time.time())
+            conn.commit()
+
+        self._remember(sid, False)
+        return count > 0
+
+    def revoke_user(self, user_id: str) -> int:
+        """Sign a user out everywhere; returns the number of sessions ended."""
+        with self._db_lock:
+            conn = self._db()
+            sids = [
+                r[0] for r in conn.execute(
+                    "SELECT id FROM auth_sessions WHERE user_id = ? AND revoked_at IS NULL",
+                    (str(user_id),),
+                )
+            ]
+            count = self._revoke_locked(conn, "user_id = ?", (str(user_id),), time.time())
+            conn.commit()
+
+        for sid in sids:
+            self._remember(sid, False)
+        return count
+
+    def is_active(self, sid: str) -> bool:
+        """
+        False only for a session known to be revoked or ended (cached). A
+        cache miss reads SQLite inline: from async code use ais_active().
+        """
+        now = time.time()
+        active = self._cached(sid, now)
+        return active if active is not None else self._lookup(sid, now)
+
+    async def ais_active(self, sid: str) -> bool:
+        """is_active() for the event loop: cache inline, SQLite in a worker thread."""
+        now = time.time()
+        active = self._cached(sid, now)
+        if active is None:
+            active = await asyncio.to_thread(self._lookup, sid, now)
+        return active
+
+    def _cached(self, sid: str, now: float) -> Optional[bool]:
+        with self._cache_lock:
+            entry = self._active.get(sid)
+            if entry is not None and now - entry[0] < self.cache_seconds:
+                self._active.move_to_end(sid)
+                self.cache_hits += 1
+                return entry[1]
+            self.cache_misses += 1
+        return None
+
+    def _lookup(self, sid: str, now: float) -> bool:
+        try:
+            with self._db_lock:
+                row = self._db().execute(
+                    "SELECT expires_at, revoked_at FROM auth_sessions WHERE id = ?", (sid,)
+                ).fetchone()
+        except sqlite3.Error as e:
+            # fail open: the access token itself is still signed and short-lived
+            print("Session lookup failed:", e)
+            return True
+
+        # no row: not ours to judge; only a revocation or expiry refuses
+        active = row is None or (row[1] is None and now < row[0])
+        self._remember(sid, active)
+        return active
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.cache_hits + self.cache_misses
+        return {
+            "created": self.created,
+            "rotated": self.rotated,
+            "rejected": self.rejected,
+            "reuse_detected": self.reuse_detected,
+            "revoked": self.revoked,
+            "cached": len(self._active),
+            "cache_seconds": self.cache_seconds,
+            "cache_hit_rate": round(self.cache_hits / lookups, 4) if lookups else 0.0,
+        }
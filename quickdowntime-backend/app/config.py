@@ -1,10 +1,12 @@
 # app/config.py
 import os
+import threading
 from functools import lru_cache
+from typing import TYPE_CHECKING, Any, Callable, Optional
 from pydantic_settings import BaseSettings
-from supabase import create_client, Client, ClientOptions   # <-- IMPORTANT
-import google.generativeai as genai
-import httpx
+
+if TYPE_CHECKING:
+    from supabase import Client
 
 
 class Settings(BaseSettings):
@@ -16,11 +18,140 @@ class Settings(BaseSettings):
 
     SECRET_KEY: str
 
+    # Verified JWT claims cached in memory (0 disables); entries also end at
+    # the token's own exp
+    AUTH_TOKEN_CACHE_SIZE: int = 10000
+    AUTH_TOKEN_CACHE_TTL_SECONDS: float = 300.0
+
+    # Short-lived access tokens renewed through rotating refresh tokens
+    # (sessions in SQLite under DATA_DIR). A refresh slides the session by
+    # AUTH_REFRESH_TOKEN_DAYS up to AUTH_SESSION_MAX_DAYS after sign-in;
+    # revocations reach other workers within AUTH_SESSION_CACHE_SECONDS.
+    # Access tokens from sessions this host has no record of stay valid
+    AUTH_ACCESS_TOKEN_MINUTES: int = 15
+    AUTH_REFRESH_TOKEN_DAYS: float = 14.0
+    AUTH_SESSION_MAX_DAYS: float = 30.0
+    AUTH_SESSION_CACHE_SECONDS: float = 30.0
+    AUTH_REFRESH_REUSE_GRACE_SECONDS: float = 10.0
+
+    # Password hashing pool: bcrypt in separate processes; logins beyond
+    # workers + queue get 429. PASSWORD_BCRYPT_ROUNDS=0 tunes the cost to
+    # PASSWORD_HASH_TARGET_MS at startup
+    PASSWORD_POOL_WORKERS: int = 2
+    PASSWORD_POOL_MAX_QUEUE: int = 16
+    PASSWORD_POOL_TIMEOUT_SECONDS: float = 10.0
+    PASSWORD_BCRYPT_ROUNDS: int = 0
+    PASSWORD_HASH_TARGET_MS: float = 250.0
+
     GEMINI_API_KEY: str = ""
 
+    # Model backend: "gemini", or "local" for the offline stand-in
+    AI_BACKEND: str = "gemini"
+    AI_STANDIN_LATENCY_MS: float = 800.0
+    AI_STANDIN_JITTER_MS: float = 200.0
+    AI_STANDIN_FAILURE_RATE: float = 0.0
+    AI_STANDIN_OUTPUT_CHARS: int = 600
+    AI_STANDIN_SEED: int = 0
+
     UPLOAD_DIR: str = "./app/uploads"
     USE_LOCAL_STORAGE: bool = True
 
+    # Server-side state (kept out of UPLOAD_DIR, which is served publicly)
+    DATA_DIR: str = "./app/data"
+
+    # Idempotency-key dedup index for downtime submissions
+    IDEMPOTENCY_TTL_SECONDS: int = 86400
+    IDEMPOTENCY_MAX_ENTRIES: int = 10000
+
+    # AI result cache (memory LRU + SQLite under DATA_DIR)
+    AI_CACHE_ENABLED: bool = True
+    AI_CACHE_TTL_SECONDS: int = 604800
+    AI_CACHE_MAX_ENTRIES: int = 2048
+
+    # Micro-batching of downtime analyses (0 disables): longest an event
+    # waits for others while a model call is already in flight
+    AI_BATCH_WINDOW_MS: int = 250
+    AI_BATCH_MAX_SIZE: int = 16
+
+    # Approximate token budget for a single downtime analysis prompt
+    AI_PROMPT_TOKEN_BUDGET: int = 1200
+
+    # Similar-incident retrieval used as AI context
+    AI_HISTORY_TOP_K: int = 10
+    AI_HISTORY_INDEX_BACKFILL: int = 5000
+    AI_HISTORY_INDEX_MAX_PER_MACHINE: int = 2000
+    AI_HISTORY_INDEX_REFRESH_SECONDS: float = 60.0   # catch up on rows from other workers
+
+    # Local severity / root-cause classifier (fast path before the LLM)
+    LOCAL_CLASSIFIER_ENABLED: bool = True
+    LOCAL_CLASSIFIER_MIN_CONFIDENCE: float = 0.5
+    LOCAL_CLASSIFIER_MIN_CLASS_COUNT: int = 3
+    LOCAL_CLASSIFIER_TRAINING_ROWS: int = 5000
+    LOCAL_CLASSIFIER_RETRAIN_SECONDS: int = 3600
+
+    # Precomputed daily / weekly AI summaries
+    AI_SUMMARY_REFRESH_SECONDS: int = 300
+    AI_SUMMARY_MIN_INTERVAL_SECONDS: int = 30
+
+    # Gemini call limits and circuit breaker
+    AI_MAX_CONCURRENCY: int = 4
+    AI_MAX_QUEUE: int = 64
+    AI_CALL_TIMEOUT_SECONDS: float = 30.0
+    AI_BREAKER_FAILURE_THRESHOLD: int = 5
+    AI_BREAKER_RESET_SECONDS: float = 30.0
+
+    # Per-connection WebSocket outbound queues
+    WS_SEND_QUEUE_SIZE: int = 256
+    WS_OVERFLOW_POLICY: str = "drop_oldest"   # drop_oldest | coalesce | disconnect
+    WS_SEND_TIMEOUT_SECONDS: float = 10.0
+
+    # Frames kept per audience for replay to reconnecting clients (last_seq)
+    WS_REPLAY_BUFFER_SIZE: int = 500
+
+    # Cross-worker broadcast backplane: "inprocess" (single worker) or
+    # "unix" (uvicorn --workers N on one host)
+    WS_BACKPLANE: str = "inprocess"
+    WS_BACKPLANE_DIR: str = ""   # defaults to DATA_DIR/ws-backplane
+
+    # Keepalive: the server pings quiet sockets and evicts ones it hasn't
+    # heard from (pong or anything else) for WS_IDLE_TIMEOUT_SECONDS; 0 = off
+    WS_PING_INTERVAL_SECONDS: float = 25.0
+    WS_IDLE_TIMEOUT_SECONDS: float = 75.0
+
+    # After a broadcast, further ones to the same audience within this window
+    # go out together as one "batch" frame; 0 = send each immediately
+    WS_COALESCE_WINDOW_MS: int = 250
+
+    # Compact frames for clients that negotiate them (msgpack / deflate
+    # subprotocols); payloads under WS_DEFLATE_MIN_BYTES aren't compressed
+    WS_DEFLATE_LEVEL: int = 6
+    WS_DEFLATE_WINDOW_BITS: int = 12   # 9..15
+    WS_DEFLATE_MIN_BYTES: int = 200
+
+    # Graceful WebSocket drain: sockets are closed (1012) in waves over
+    # WS_DRAIN_SECONDS, each told to wait a staggered delay of up to
+    # WS_DRAIN_RECONNECT_SPREAD_SECONDS before reconnecting
+    WS_DRAIN_SECONDS: float = 5.0
+    WS_DRAIN_RECONNECT_SPREAD_SECONDS: float = 20.0
+    # Triggers (either reaches every worker over the backplane): this signal
+    # sent to any one worker process, or POST /api/ws/drain with the
+    # X-Drain-Token header; an empty token disables the endpoint
+    WS_DRAIN_SIGNAL: str = "SIGUSR1"
+    WS_DRAIN_TOKEN: str = ""
+
+    # Shared outbound HTTP pools (Supabase); opened at startup and closed at
+    # shutdown by the app lifespan. HTTP/2 needs the h2 package (httpx[http2])
+    HTTP_MAX_CONNECTIONS: int = 20
+    HTTP_MAX_KEEPALIVE_CONNECTIONS: int = 10
+    HTTP_KEEPALIVE_EXPIRY_SECONDS: float = 30.0
+    HTTP2_ENABLED: bool = True
+    HTTP_CONNECT_TIMEOUT_SECONDS: float = 10.0
+    HTTP_READ_TIMEOUT_SECONDS: float = 20.0
+    HTTP_WRITE_TIMEOUT_SECONDS: float = 10.0
+    HTTP_POOL_TIMEOUT_SECONDS: float = 30.0
+    HTTP_WARMUP_CONNECTIONS: int = 2   # 0 = no warmup
+    HTTP_WARMUP_TIMEOUT_SECONDS: float = 5.0
+
     HOST: str = "0.0.0.0"
     PORT: int = 8000
 
@@ -36,27 +167,21 @@ def get_settings():
 settings = get_settings()
 
 
-os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
-os.makedirs(os.path.join(settings.UPLOAD_DIR, "images"), exist_ok=True)
-os.makedirs(os.path.join(settings.UPLOAD_DIR, "audio"), exist_ok=True)
-os.makedirs(os.path.join(settings.UPLOAD_DIR, "unsynced"), exist_ok=True)
-
-
-def create_supabase_client() -> Client:
-    http_client = httpx.Client(
-        timeout=httpx.Timeout(
-            timeout=30.0,
-            connect=10.0,
-            read=20.0,
-            write=10.0,
-        ),
-        limits=httpx.Limits(
-            max_keepalive_connections=10,
-            max_connections=20,
-            keepalive_expiry=30.0
-        ),
-        http2=False
-    )
+@lru_cache()
+def ensure_storage_dirs():
+    """Create upload / data directories once (called from the app lifespan)."""
+    os.makedirs(settings.UPLOAD_DIR, exist_ok=True)
+    os.makedirs(os.path.join(settings.UPLOAD_DIR, "images"), exist_ok=True)
+    os.makedirs(os.path.join(settings.UPLOAD_DIR, "audio"), exist_ok=True)
+    os.makedirs(os.path.join(settings.UPLOAD_DIR, "unsynced"), exist_ok=True)
+    os.makedirs(settings.DATA_DIR, exist_ok=True)
+
+
+def create_supabase_client() -> "Client":
+    # supabase (postgrest, gotrue, realtime...) and httpx are only imported
+    # by the first worker code that actually talks to the database
+    from supabase import create_client, ClientOptions
+    from app.services.http_pools import http_pools
 
     return create_client(
         supabase_url=settings.SUPABASE_URL,
@@ -66,10 +191,49 @@ def create_supabase_client() -> Client:
             headers={"x-client-info": "quickdowntime/1.0"},
             auto_refresh_token=True,
             persist_session=True,
+            # shared pool: sized from settings, closed by the lifespan
+            httpx_client=http_pools.client("supabase"),
         )
     )
 
 
-supabase: Client = create_supabase_client()
+def warm_up_supabase():
+    """Build the client and open its connections before the first request (blocking)."""
+    from app.services.http_pools import http_pools
+
+    supabase.get()
+    http_pools.warm(
+        "supabase",
+        f"{settings.SUPABASE_URL.rstrip('/')}/rest/v1/",
+        headers={"apikey": settings.SUPABASE_SERVICE_KEY},
+    )
+
+
+class LazyClient:
+    """
+    Module-level stand-in for a client that is built on first attribute
+    access, so `from app.config import supabase` stays cheap and workers
+    that never query the database never construct it.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client: Optional[Any] = None
+        self._lock = threading.Lock()
+
+    @property
+    def initialized(self) -> bool:
+        return self._client is not None
+
+    def get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.get(), name)
+
 
-genai.configure(api_key=settings.GEMINI_API_KEY)
+supabase: "Client" = LazyClient(create_supabase_client)
@@ -1,3 +1,6 @@
+import asyncio
+import signal
+from contextlib import asynccontextmanager
 from fastapi import FastAPI, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
 from .routers import downtime, dashboard
@@ -9,11 +12,69 @@ from app.routers.management_stats import router as stats_router
 from app.routers import operator
 from app.routers import ai_analysis
 from app.routers.machine_monitoring import router as machine_monitoring_router  # NEW
+from app.services.local_classifier import local_classifier
+from app.services.ai_summaries import summary_store
+from app.config import settings, ensure_storage_dirs, warm_up_supabase
+from app.services.http_pools import http_pools
+from app.auth.security import password_pool
 import os
 from fastapi.staticfiles import StaticFiles
 
 
-app = FastAPI()
+UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
+
+
+# Startup / shutdown. Importing the app builds nothing heavy: the Supabase
+# client and its HTTP pool are created and warmed here (the Gemini SDK
+# still loads on first use), and closed again on the way out.
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    ensure_storage_dirs()
+    os.makedirs(UPLOAD_DIR, exist_ok=True)
+
+    # DNS / TLS / HTTP2 handshakes before the first request needs them
+    if settings.HTTP_WARMUP_CONNECTIONS > 0:
+        try:
+            await asyncio.to_thread(warm_up_supabase)
+        except Exception as e:
+            print("Supabase warmup failed:", e)
+
+    # Background jobs
+    if settings.LOCAL_CLASSIFIER_ENABLED:
+        local_classifier.start()
+    summary_store.start()
+    password_pool.start()
+    await ws_manager.start()
+
+    # Paced WebSocket drain on WS_DRAIN_SIGNAL (send it to any one worker
+    # from the pre-stop hook; the others hear about it over the backplane)
+    drain_signal = getattr(signal, settings.WS_DRAIN_SIGNAL, None) if settings.WS_DRAIN_SIGNAL else None
+    loop = asyncio.get_running_loop()
+    if drain_signal is not None:
+        try:
+            loop.add_signal_handler(
+                drain_signal, lambda: asyncio.ensure_future(ws_manager.request_drain())
+            )
+        except (NotImplementedError, RuntimeError, ValueError) as e:
+            print("WS drain signal not installed:", e)
+            drain_signal = None
+    try:
+        yield
+    finally:
+        if drain_signal is not None:
+            loop.remove_signal_handler(drain_signal)
+        # Under uvicorn, sockets still open here were already closed with
+        # 1012 and clients spread those reconnects themselves; signal the
+        # workers (or POST /api/ws/drain) beforehand for a paced drain
+        await ws_manager.drain()
+        local_classifier.stop()
+        summary_store.stop()
+        password_pool.stop()
+        await ws_manager.stop()
+        http_pools.close()
+
+
+app = FastAPI(lifespan=lifespan)
 
 # CORS
 app.add_middleware(
@@ -44,14 +105,10 @@ async def root():
 @app.websocket("/ws/management")
 async def management_ws(websocket: WebSocket):
     await ws_manager.connect(websocket)
-    try:
-        while True:
-            await websocket.receive_text()
-    except:
-        ws_manager.disconnect(websocket)
+    # handles disconnects, logs unexpected receive errors, answers pings
+    await ws_manager.listen(websocket)
 
 
 # Mount uploads folder so saved images/audio are accessible
-UPLOAD_DIR = os.path.join(os.path.dirname(__file__), "uploads")
-os.makedirs(UPLOAD_DIR, exist_ok=True)
-app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR), name="uploads")
\ No newline at end of file
+# (created by the lifespan, hence check_dir=False)
+app.mount("/uploads", StaticFiles(directory=UPLOAD_DIR, check_dir=False), name="uploads")
\ No newline at end of file
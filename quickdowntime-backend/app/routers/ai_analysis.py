@@ -1,147 +1,132 @@
+import asyncio
+import json
+import time
+
 from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
 from app.auth.security import get_current_user, require_manager
 from app.config import supabase
 from app.services.ai_engine import ai_engine
-from datetime import datetime, timedelta
+from app.services.ai_summaries import daily_context, weekly_context, summary_store
+from app.services.history_index import history_index, retrieve_history
+from app.services.local_classifier import local_classifier
+from app.services.ai_analysis_store import ai_analysis_store, analysis_version
 
 router = APIRouter(prefix="/api/ai/analysis", tags=["AI Analysis"])
 
 
-# ---------------------------
-# Helper function
-# ---------------------------
-def calculate_duration(start_time, end_time):
-    """Calculate duration between start and end time"""
-    if not start_time:
-        return "Unknown"
-    
-    if not end_time:
-        return "Ongoing"
-    
-    try:
-        start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
-        end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
-        delta = end - start
-        
-        hours = delta.seconds // 3600
-        minutes = (delta.seconds % 3600) // 60
-        
-        if hours > 0:
-            return f"{hours}h {minutes}m"
-        else:
-            return f"{minutes}m"
-    except:
-        return "Unknown"
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data, default=str)}\n\n"
+
+
+async def _stream_summary(kind, rows, summary_text, payload, force):
+    """
+    SSE body: "chunk" events with {"text"} as the model writes, then one
+    "done" event carrying the structured stats plus timing metrics.
+    The finished summary is saved to the summary store. Generation holds
+    the summary store's lease like refresh() does: if another request or
+    worker produces the summary meanwhile, that copy is served instead.
+    """
+    started = time.perf_counter()
+    ttft_ms = None
+
+    async with summary_store.generating(kind, rows, force) as current:
+        if current is not None:
+            async for frame in _stream_stored(current):
+                yield frame
+            return
+
+        if summary_text is None:
+            summary = summary_store.save(kind, rows, payload)
+            yield _sse("chunk", {"text": payload["analysis"]})
+            yield _sse("done", {**summary, "ttft_ms": 0, "total_ms": 0})
+            return
+
+        parts = []
+        async for text in ai_engine.stream_downtime_summary(summary_text):
+            if ttft_ms is None:
+                ttft_ms = round((time.perf_counter() - started) * 1000, 1)
+            parts.append(text)
+            yield _sse("chunk", {"text": text})
+
+        summary = summary_store.save(kind, rows, {"analysis": "".join(parts).strip(), **payload})
+
+    # events are left out: the page already has them from the list APIs
+    # and they'd make the final frame much larger than the analysis
+    done = {k: v for k, v in summary.items() if k not in ("events", "analysis")}
+    yield _sse("done", {
+        **done,
+        "ttft_ms": ttft_ms,
+        "total_ms": round((time.perf_counter() - started) * 1000, 1),
+    })
+
+
+async def _stream_stored(summary):
+    yield _sse("chunk", {"text": summary.get("analysis", "")})
+    done = {k: v for k, v in summary.items() if k not in ("events", "analysis")}
+    yield _sse("done", {**done, "ttft_ms": 0, "total_ms": 0, "cached": True})
+
+
+async def _stream_or_serve(kind: str, context, refresh: bool):
+    summary = None if refresh else await summary_store.aget(kind)
+    if summary is not None:
+        return _sse_response(_stream_stored(summary))
+    rows, summary_text, payload = await asyncio.to_thread(context)
+    return _sse_response(_stream_summary(kind, rows, summary_text, payload, refresh))
+
+
+def _sse_response(body) -> StreamingResponse:
+    return StreamingResponse(
+        body,
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 # ---------------------------
 # 1) DAILY AI SUMMARY (Today's downtimes only)
+# Served from the summary store; ?refresh=true forces a recompute
 # ---------------------------
 @router.get("/daily")
-async def ai_daily_summary(user=Depends(get_current_user)):
+async def ai_daily_summary(refresh: bool = False, user=Depends(get_current_user)):
     require_manager(user)
+    return await summary_store.serve("daily", force=refresh)
 
-    # Get today's downtimes only
-    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-    today_start_str = today_start.isoformat()
 
-    res = supabase.table("downtime_logs") \
-        .select("*") \
-        .gte("start_time", today_start_str) \
-        .order("start_time", desc=True) \
-        .execute()
-
-    rows = res.data or []
-
-    if not rows:
-        return {
-            "analysis": "✅ No downtimes recorded today. Excellent performance! All machines are running smoothly.",
-            "total_incidents": 0
-        }
-
-    # Prepare summary data for AI
-    summary_text = f"Today's JSW Steel Downtime Analysis ({len(rows)} incidents):\n\n"
-    
-    for idx, event in enumerate(rows, 1):
-        duration = calculate_duration(event.get("start_time"), event.get("end_time"))
-        summary_text += f"{idx}. Machine: {event.get('machine_id')}\n"
-        summary_text += f"   Root Cause: {event.get('root_cause')} - {event.get('sub_category')}\n"
-        summary_text += f"   Duration: {duration}\n"
-        summary_text += f"   Description: {event.get('description', 'N/A')}\n\n"
-
-    # Send to AI for analysis
-    ai_result = await ai_engine.analyze_downtime_summary(summary_text, rows)
-    
-    return {
-        "analysis": ai_result,
-        "total_incidents": len(rows),
-        "events": rows
-    }
+@router.get("/daily/stream")
+async def ai_daily_summary_stream(refresh: bool = False, user=Depends(get_current_user)):
+    require_manager(user)
+    return await _stream_or_serve("daily", daily_context, refresh)
 
 
 # ---------------------------
 # 2) WEEKLY AI SUMMARY (Last 7 days)
 # ---------------------------
 @router.get("/weekly")
-async def ai_weekly_summary(user=Depends(get_current_user)):
+async def ai_weekly_summary(refresh: bool = False, user=Depends(get_current_user)):
     require_manager(user)
+    return await summary_store.serve("weekly", force=refresh)
 
-    # Get last 7 days of downtimes
-    week_start = datetime.now() - timedelta(days=7)
-    week_start_str = week_start.isoformat()
 
-    res = supabase.table("downtime_logs") \
-        .select("*") \
-        .gte("start_time", week_start_str) \
-        .order("start_time", desc=True) \
-        .execute()
+@router.get("/weekly/stream")
+async def ai_weekly_summary_stream(refresh: bool = False, user=Depends(get_current_user)):
+    require_manager(user)
+    return await _stream_or_serve("weekly", weekly_context, refresh)
 
-    rows = res.data or []
-
-    if not rows:
-        return {
-            "analysis": "✅ No downtimes recorded in the last 7 days. Outstanding performance!",
-            "total_incidents": 0,
-            "machine_stats": {},
-            "cause_stats": {}
-        }
-
-    # Group by machine and cause
-    machine_stats = {}
-    cause_stats = {}
-    
-    for event in rows:
-        machine = event.get('machine_id', 'Unknown')
-        cause = event.get('root_cause', 'Unknown')
-        
-        machine_stats[machine] = machine_stats.get(machine, 0) + 1
-        cause_stats[cause] = cause_stats.get(cause, 0) + 1
-
-    # Prepare summary for AI
-    summary_text = f"Weekly JSW Steel Downtime Analysis (Last 7 days - {len(rows)} total incidents):\n\n"
-    
-    summary_text += "Top Affected Machines:\n"
-    for machine, count in sorted(machine_stats.items(), key=lambda x: x[1], reverse=True)[:5]:
-        summary_text += f"  - {machine}: {count} incidents\n"
-    
-    summary_text += "\nTop Root Causes:\n"
-    for cause, count in sorted(cause_stats.items(), key=lambda x: x[1], reverse=True)[:5]:
-        summary_text += f"  - {cause}: {count} incidents\n"
-    
-    summary_text += "\nRecent Events:\n"
-    for idx, event in enumerate(rows[:10], 1):
-        duration = calculate_duration(event.get("start_time"), event.get("end_time"))
-        summary_text += f"{idx}. {event.get('machine_id')} - {event.get('root_cause')}, Duration: {duration}\n"
-
-    # Send to AI for analysis
-    ai_result = await ai_engine.analyze_downtime_summary(summary_text, rows)
-    
+
+# ---------------------------
+# AI ENGINE STATS (cache hit/miss etc.)
+# Declared before /{downtime_id} so "stats" isn't parsed as an id
+# ---------------------------
+@router.get("/stats")
+def ai_engine_stats(user=Depends(get_current_user)):
+    require_manager(user)
     return {
-        "analysis": ai_result,
-        "total_incidents": len(rows),
-        "machine_stats": machine_stats,
-        "cause_stats": cause_stats,
-        "events": rows
+        **ai_engine.stats(),
+        "history_index": history_index.stats(),
+        "local_classifier": local_classifier.stats(),
+        "summaries": summary_store.stats(),
+        "stored_analyses": ai_analysis_store.stats(),
     }
 
 
@@ -149,7 +134,13 @@ async def ai_weekly_summary(user=Depends(get_current_user)):
 # 3) SINGLE EVENT ANALYSIS
 # ---------------------------
 @router.get("/{downtime_id}")
-async def ai_single_event(downtime_id: int, user=Depends(get_current_user)):
+async def ai_single_event(downtime_id: int, refresh: bool = False, user=Depends(get_current_user)):
+    """
+    Serve the persisted analysis when there is one. The model only runs on
+    ?refresh=true, when no analysis exists, or when the event was edited
+    since it was analysed; analyses from an older prompt/model are served
+    as-is and refreshed in the background.
+    """
     require_manager(user)
 
     res = supabase.table("downtime_logs") \
@@ -163,13 +154,19 @@ async def ai_single_event(downtime_id: int, user=Depends(get_current_user)):
     if not event:
         return {"error": "Event not found"}
 
-    history_res = supabase.table("downtime_logs") \
-        .select("*") \
-        .order("start_time", desc=True) \
-        .limit(50) \
-        .execute()
-
-    history = history_res.data or []
-
-    ai_result = await ai_engine.analyze_downtime(event, history)
-    return ai_result
\ No newline at end of file
+    stored = None if refresh else await asyncio.to_thread(ai_analysis_store.load, event)
+
+    if stored is not None:
+        analysis, freshness = stored
+        if freshness != ai_analysis_store.CHANGED:
+            ai_analysis_store.served_stored += 1
+            stale = freshness == ai_analysis_store.STALE
+            if stale:
+                history = await retrieve_history(event)
+                ai_analysis_store.refresh_in_background(event, history)
+            return {**analysis, "source": "stored", "stale": stale}
+
+    history = await retrieve_history(event)
+    # an explicit refresh must not be answered from the fingerprint cache
+    ai_result = await ai_analysis_store.recompute(event, history, use_cache=not refresh)
+    return {**ai_result, "source": "model", "stale": False, "analysis_version": analysis_version()}
@@ -1,7 +1,9 @@
 # app/routers/dashboard.py
+from anyio import from_thread
 from fastapi import APIRouter, Depends, HTTPException
 from app.auth.security import get_current_user, require_manager
 from app.config import supabase
+from app.services.live_counters import live_counters
 from datetime import datetime, timedelta
 from typing import List, Optional
 
@@ -166,6 +168,9 @@ def mark_alerts_seen(user=Depends(get_current_user)):
                 marked_count += 1
             except Exception as update_error:
                 print(f"Error marking alert {alert_id}: {update_error}")
+
+        # sync route (worker thread): publish on the event loop
+        from_thread.run(live_counters.alerts_seen, marked_count)
         
         return {
             "marked": marked_count,
@@ -201,7 +206,18 @@ def mark_single_alert_seen(alert_id: int, user=Depends(get_current_user)):
         if user_id:
             update_data["seen_by"] = str(user_id)
         
-        result = supabase.table("downtime_logs").update(update_data).eq("id", alert_id).execute()
+        # Only count it once: the badge drops just when it was still unseen
+        result = (
+            supabase.table("downtime_logs")
+            .update(update_data)
+            .eq("id", alert_id)
+            .eq("seen", False)
+            .execute()
+        )
+        if result.data:
+            from_thread.run(live_counters.alerts_seen, 1)
+        else:
+            result = supabase.table("downtime_logs").update(update_data).eq("id", alert_id).execute()
         
         if not result.data:
             raise HTTPException(status_code=404, detail="Alert not found")
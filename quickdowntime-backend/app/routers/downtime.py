@@ -2,11 +2,17 @@
 import uuid
 import json
 import os
-from fastapi import APIRouter, Form, File, UploadFile, Depends, HTTPException
+from anyio import from_thread
+from fastapi import APIRouter, Form, File, UploadFile, Depends, HTTPException, Request
 from typing import Optional
 from ..config import supabase, settings
-from ..services.ai_engine import ai_engine
+from ..services.ai_engine import ai_engine, is_failed_analysis
 from ..services.websocket_manager import ws_manager
+from ..services.idempotency import idempotency_store, scoped_key, uuid_key, IDEMPOTENCY_HEADER
+from ..services.history_index import history_index, retrieve_history
+from ..services.ai_summaries import summary_store
+from ..services.ai_analysis_store import ai_analysis_store
+from ..services.live_counters import live_counters
 from datetime import datetime
 
 router = APIRouter(prefix="/api/downtime", tags=["downtime"])
@@ -58,6 +64,7 @@ def queue_local_record(record: dict):
 
 @router.post("/log-local")
 async def log_downtime_local(
+    request: Request,
     machine_id: str = Form(...),
     reason: str = Form(...),
     category: Optional[str] = Form(None),
@@ -66,6 +73,7 @@ async def log_downtime_local(
     image: Optional[UploadFile] = File(None),
     audio: Optional[UploadFile] = File(None),
     operator_email: Optional[str] = Form(None),
+    idempotency_key: Optional[str] = Form(None),
 ):
     """
     Local upload endpoint:
@@ -73,7 +81,47 @@ async def log_downtime_local(
     - constructs downtime record
     - attempts to insert into Supabase; if fails, writes to unsynced queue
     Returns: saved record or queued filepath.
+
+    Retries carrying the same Idempotency-Key (header or form field) get the
+    original response back without re-inserting, re-analysing or re-broadcasting.
+    The endpoint is unauthenticated, so the key must be a UUID: there is no
+    user to scope it by, and anything shorter could collide across devices.
     """
+    raw_key = request.headers.get(IDEMPOTENCY_HEADER) or idempotency_key
+    try:
+        idem_key = scoped_key(uuid_key(raw_key), "log-local")
+    except ValueError:
+        raise HTTPException(status_code=400, detail=f"{IDEMPOTENCY_HEADER} must be a UUID")
+
+    if not idem_key:
+        return await _log_downtime_local(
+            machine_id, reason, category, description,
+            duration_minutes, image, audio, operator_email,
+        )
+
+    async with idempotency_store.guard(idem_key):
+        cached = await idempotency_store.aget(idem_key)
+        if cached is not None:
+            return cached
+
+        result = await _log_downtime_local(
+            machine_id, reason, category, description,
+            duration_minutes, image, audio, operator_email,
+        )
+        idempotency_store.put(idem_key, result)
+        return result
+
+
+async def _log_downtime_local(
+    machine_id: str,
+    reason: str,
+    category: Optional[str],
+    description: Optional[str],
+    duration_minutes: Optional[int],
+    image: Optional[UploadFile],
+    audio: Optional[UploadFile],
+    operator_email: Optional[str],
+) -> dict:
     image_url = None
     audio_url = None
 
@@ -106,19 +154,15 @@ async def log_downtime_local(
     ok, resp = insert_downtime_record_supabase(downtime_data)
     if ok:
         saved = resp
+        summary_store.mark_dirty()
+        await live_counters.downtime_created(saved)
         # optionally run AI analysis asynchronously — we'll call AI and save to ai_analysis table if supabase is fine
         try:
-            history = supabase.table("downtime_logs").select("*").order("created_at", desc=True).limit(20).execute().data or []
+            history = await retrieve_history(saved)
+            history_index.add(saved)
             analysis = await ai_engine.analyze_downtime(saved, history)
-            supabase.table("ai_analysis").insert({
-                "downtime_id": saved.get("id"),
-                "root_cause": analysis.get("root_cause"),
-                "immediate_actions": analysis.get("recommended_actions"),
-                "preventive_measures": analysis.get("preventive_measures"),
-                "severity": analysis.get("severity"),
-                "predicted_next_failure": analysis.get("predicted_next_failure"),
-                "confidence_score": analysis.get("confidence_score"),
-            }).execute()
+            if not is_failed_analysis(analysis):
+                ai_analysis_store.save(saved, analysis)
         except Exception:
             # ignore AI failures — not fatal
             pass
@@ -163,6 +207,9 @@ def sync_queued_records():
                 # remove queued file
                 os.remove(fpath)
                 synced += 1
+                summary_store.mark_dirty()
+                if isinstance(resp, dict):
+                    from_thread.run(live_counters.downtime_created, resp)
             else:
                 errors.append({"file": fpath, "error": resp})
         except Exception as e:
@@ -11,6 +11,8 @@ import csv
 
 # import ws_manager for broadcasts
 from app.services.websocket_manager import ws_manager
+from app.services.ai_summaries import summary_store
+from app.services.live_counters import live_counters
 
 router = APIRouter(prefix="/api/management", tags=["Management Dashboard"])
 
@@ -152,7 +154,8 @@ async def resolve_downtime(id: int, payload: ResolveIn, user=Depends(get_current
         "updated_at": datetime.utcnow().isoformat(),
     }
 
-    resp = supabase.table("downtime_logs").update(updates).eq("id", id).execute()
+    # only an open downtime is resolved, so a repeat doesn't count twice
+    resp = supabase.table("downtime_logs").update(updates).eq("id", id).eq("status", "open").execute()
 
     # resp may not have .error property; check status_code or data
     status = getattr(resp, "status_code", None)
@@ -160,21 +163,39 @@ async def resolve_downtime(id: int, payload: ResolveIn, user=Depends(get_current
     if status is not None and status >= 400:
         raise HTTPException(500, "Failed to update downtime")
 
+    if not data:
+        # already resolved (or unknown id): nothing changed, nothing to publish
+        return {"message": "Downtime already resolved", "data": []}
+
+    summary_store.mark_dirty()
+
     # ---------------------------------------------
     # 🔥 WEB SOCKET BROADCAST (Managers + Operators)
     # ---------------------------------------------
+    # machine / operator / severity let subscribers filter these
+    row = data[0]
+    topics = {
+        "machine_id": row.get("machine_id"),
+        "operator_id": row.get("operator_id"),
+        "severity": row.get("severity"),
+    }
+
+    await live_counters.downtime_resolved(row)
+
     # broadcast to managers
     await ws_manager.broadcast_managers({
         "type": "downtime_resolved",
         "id": id,
         "resolved_by": user["id"],
         "resolved_at": updates["resolved_at"],
+        **topics,
     })
 
     # broadcast to operators
     await ws_manager.broadcast_operators({
         "type": "downtime_resolved",
         "id": id,
+        **topics,
     })
 
     return {"message": "Downtime resolved", "data": data}
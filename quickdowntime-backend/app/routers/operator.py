@@ -1,10 +1,12 @@
 # app/routers/operator.py
+import asyncio
 import os
 import uuid
 import base64
 from pathlib import Path
 from typing import Optional
 
+from anyio import from_thread
 from fastapi import (
     APIRouter, Depends, File, UploadFile, Form,
     HTTPException, Request
@@ -14,8 +16,14 @@ from fastapi.responses import JSONResponse
 from app.config import settings, supabase
 from app.auth.security import get_current_user, require_operator
 
-from app.services.ai_engine import ai_engine
+from app.services.ai_engine import ai_engine, is_failed_analysis
 from app.services.websocket_manager import ws_manager
+from app.services.idempotency import idempotency_store, scoped_key, IDEMPOTENCY_HEADER
+from app.services.history_index import history_index, retrieve_history
+from app.services.local_classifier import local_classifier
+from app.services.ai_summaries import summary_store
+from app.services.ai_analysis_store import ai_analysis_store
+from app.services.live_counters import live_counters
 
 
 router = APIRouter(prefix="/api/operator", tags=["Operator"])
@@ -90,10 +98,13 @@ async def operator_log(
 ):
     require_operator(user)
 
+    raw_key = request.headers.get(IDEMPOTENCY_HEADER)
+
     # Fallback for JSON input
     ct = request.headers.get("content-type", "")
     if not machine_id and ct.startswith("application/json"):
         data = await request.json()
+        raw_key = raw_key or data.get("idempotency_key")
         machine_id = data.get("machine_id")
         reason = data.get("reason")
         category = data.get("category")
@@ -104,6 +115,42 @@ async def operator_log(
     if not machine_id:
         raise HTTPException(400, "machine_id is required")
 
+    # --------------------------------------------------------------
+    # Idempotent retries: replay the original response, skip the
+    # insert / AI analysis / broadcast entirely
+    # --------------------------------------------------------------
+    idem_key = scoped_key(raw_key, user["id"])
+    if not idem_key:
+        body = await _log_downtime(
+            user, machine_id, reason, category, description,
+            image, audio, image_base64, audio_base64,
+        )
+        return JSONResponse(body)
+
+    async with idempotency_store.guard(idem_key):
+        cached = await idempotency_store.aget(idem_key)
+        if cached is not None:
+            return JSONResponse(cached, headers={"Idempotent-Replayed": "true"})
+
+        body = await _log_downtime(
+            user, machine_id, reason, category, description,
+            image, audio, image_base64, audio_base64,
+        )
+        idempotency_store.put(idem_key, body)
+        return JSONResponse(body)
+
+
+async def _log_downtime(
+    user: dict,
+    machine_id: str,
+    reason: Optional[str],
+    category: Optional[str],
+    description: Optional[str],
+    image: Optional[UploadFile],
+    audio: Optional[UploadFile],
+    image_base64: Optional[str],
+    audio_base64: Optional[str],
+) -> dict:
     downtime_data = {
         "machine_id": machine_id,
         "reason": reason if reason not in (None, "", "null", "undefined") else "Unknown reason",
@@ -114,6 +161,12 @@ async def operator_log(
         "status": "open",
     }
 
+    prediction = local_classifier.predict(downtime_data) if settings.LOCAL_CLASSIFIER_ENABLED else None
+    if prediction:
+        downtime_data["severity"] = prediction["severity"]
+        if prediction["root_cause"]:
+            downtime_data["root_cause"] = prediction["root_cause"]
+
     saved_image_path = None
     saved_audio_path = None
 
@@ -141,69 +194,117 @@ async def operator_log(
         if not insert_res.data:
             raise Exception("Insert failed")
 
-        downtime = insert_res.data[0]
+        downtime = dict(insert_res.data[0])
 
     except Exception as e:
         raise HTTPException(500, f"Insert failed: {e}")
 
+    summary_store.mark_dirty()
+    await live_counters.downtime_created(downtime)
+
     # --------------------------------------------------------------
-    # AI Analysis (your previous logic)
+    # AI Analysis
+    # With a trained local classifier the alert goes out now with its
+    # estimate and the LLM refines it in the background; otherwise wait
+    # for the LLM as before.
+    # --------------------------------------------------------------
+    if prediction:
+        downtime["severity_source"] = "local"
+        _spawn(_refine_with_ai(downtime))
+    else:
+        await _analyse_with_ai(downtime)
+
+    # --------------------------------------------------------------
+    # WebSocket broadcast (your previous logic)
     # --------------------------------------------------------------
     try:
-        history = (
-            supabase.table("downtime_logs")
-            .select("*")
-            .order("created_at", desc=True)
-            .limit(20)
-            .execute()
-        ).data or []
+        await ws_manager.broadcast_managers({
+            "type": "new_downtime",
+            "id": downtime["id"],
+            "machine_id": downtime["machine_id"],
+            "reason": downtime["reason"],
+            "category": downtime["category"],
+            "description": downtime["description"],
+            "severity": downtime.get("severity", "unknown"),
+            "severity_source": downtime.get("severity_source", "ai"),
+            "created_at": downtime["created_at"],
+            "operator_email": downtime["operator_email"],
+            "operator_id": downtime.get("operator_id"),
+        })
+    except Exception as e:
+        print("WS broadcast error:", e)
+
+    return {"message": "Downtime logged", "data": downtime}
+
+
+
+
+
+# --------------------------------------------------------------
+# AI helpers
+# --------------------------------------------------------------
+_background_tasks = set()
+
+
+def _spawn(coro):
+    task = asyncio.create_task(coro)
+    _background_tasks.add(task)
+    task.add_done_callback(_background_tasks.discard)
+
+
+async def _analyse_with_ai(downtime: dict) -> Optional[dict]:
+    """
+    Run the LLM analysis, store it in ai_analysis and write severity /
+    root_cause back to downtime_logs. A failed call stores nothing and
+    returns None, leaving the existing (possibly locally predicted) values
+    in place.
+    """
+    try:
+        history = await retrieve_history(downtime)
+        history_index.add(downtime)
 
         ai_result = await ai_engine.analyze_downtime(downtime, history)
+        if is_failed_analysis(ai_result):
+            return None
 
-        supabase.table("ai_analysis").insert({
-            "downtime_id": downtime["id"],
-            "root_cause": ai_result.get("root_cause"),
-            "immediate_actions": ", ".join(ai_result.get("recommended_actions", [])),
-            "preventive_measures": ", ".join(ai_result.get("preventive_measures", [])),
-            "severity": ai_result.get("severity"),
-            "predicted_next_failure": ai_result.get("predicted_next_failure"),
-            "confidence_score": ai_result.get("confidence_score"),
-        }).execute()
+        ai_analysis_store.save(downtime, ai_result)
+        previous_severity = downtime.get("severity")
 
         supabase.table("downtime_logs").update({
             "severity": ai_result.get("severity"),
             "root_cause": ai_result.get("root_cause"),
+            # other workers' history indexes pick the change up by updated_at
+            "updated_at": datetime.utcnow().isoformat(),
         }).eq("id", downtime["id"]).execute()
 
         downtime["severity"] = ai_result.get("severity")
         downtime["root_cause"] = ai_result.get("root_cause")
+        history_index.add(downtime)
+        await live_counters.severity_changed(downtime, previous_severity, downtime["severity"])
+        return ai_result
 
     except Exception as e:
         print("AI analysis failed:", e)
+        return None
+
+
+async def _refine_with_ai(downtime: dict):
+    ai_result = await _analyse_with_ai(downtime)
+    if ai_result is None:
+        return
 
-    # --------------------------------------------------------------
-    # WebSocket broadcast (your previous logic)
-    # --------------------------------------------------------------
     try:
         await ws_manager.broadcast_managers({
-            "type": "new_downtime",
+            "type": "downtime_analysis",
             "id": downtime["id"],
             "machine_id": downtime["machine_id"],
-            "reason": downtime["reason"],
-            "category": downtime["category"],
-            "description": downtime["description"],
-            "severity": downtime.get("severity", "unknown"),
-            "created_at": downtime["created_at"],
-            "operator_email": downtime["operator_email"],
+            "severity": ai_result.get("severity"),
+            "root_cause": ai_result.get("root_cause"),
+            "confidence_score": ai_result.get("confidence_score"),
         })
     except Exception as e:
         print("WS broadcast error:", e)
 
-    return JSONResponse({"message": "Downtime logged", "data": downtime})
-
-
-
-
 
 @router.get("/active")
 def get_active_downtime(user=Depends(get_current_user)):
@@ -266,16 +367,28 @@ def resolve_downtime(
             "resolved_at": datetime.utcnow().isoformat(),   # FIXED
             "resolution_notes": notes,
             "updated_at": datetime.utcnow().isoformat(),    # optional
-        }).eq("id", id).execute()
+        }).eq("id", id).eq("status", "open").execute()
 
         if not res.data:
-            raise HTTPException(400, "No record updated. Wrong ID?")
+            # a retry or a manager got there first: nothing to count again
+            existing = supabase.table("downtime_logs").select("*").eq("id", id).execute()
+            if not existing.data:
+                raise HTTPException(400, "No record updated. Wrong ID?")
+            return {
+                "message": "Downtime already resolved",
+                "downtime": existing.data[0]
+            }
+
+        summary_store.mark_dirty()
+        from_thread.run(live_counters.downtime_resolved, res.data[0])
 
         return {
             "message": "Downtime resolved",
             "downtime": res.data[0]
         }
 
+    except HTTPException:
+        raise
     except Exception as e:
         print("Resolve error:", e)
         raise HTTPException(500, f"Failed to resolve downtime: {str(e)}")
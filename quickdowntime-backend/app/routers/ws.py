@@ -1,9 +1,14 @@
 # app/routers/ws.py
-from fastapi import APIRouter, WebSocket, WebSocketDisconnect
-from jose import jwt, JWTError
-from typing import Optional
+import hmac
+
+from fastapi import APIRouter, Header, HTTPException, WebSocket
+from jose import JWTError
+from typing import Optional, Tuple
+from app.auth.security import adecode_token
 from app.config import settings
 from app.services.websocket_manager import ws_manager
+from app.services.live_counters import live_counters
+from app.services.ws_topics import Subscription
 
 router = APIRouter(prefix="/api/ws", tags=["WebSockets"])
 
@@ -17,12 +22,24 @@ async def _decode_token_from_ws(websocket: WebSocket) -> Optional[dict]:
         return None
 
     try:
-        payload = jwt.decode(token, settings.SECRET_KEY, algorithms=["HS256"])
-        return payload
+        return await adecode_token(token)
     except JWTError:
         return None
 
 
+def _resume_params(websocket: WebSocket) -> Tuple[Optional[int], Optional[str]]:
+    """
+    last_seq / epoch sent by a reconnecting client, so missed broadcasts
+    can be replayed instead of refetching everything.
+    """
+    raw = websocket.query_params.get("last_seq")
+    try:
+        last_seq = int(raw) if raw is not None else None
+    except ValueError:
+        last_seq = None
+    return last_seq, websocket.query_params.get("epoch")
+
+
 # ------------------------------------------------------
 # MANAGER WEBSOCKET (Receives: machine down, alerts, etc.)
 # ------------------------------------------------------
@@ -37,15 +54,18 @@ async def manager_ws(websocket: WebSocket):
         await websocket.close(code=4003)
         return
 
-    await ws_manager.connect_role(websocket, "manager")
+    # Optional filters: ?machines=M1,M2&min_severity=high&types=new_downtime
+    await ws_manager.connect_role(
+        websocket, "manager", *_resume_params(websocket),
+        subscription=Subscription.from_params(websocket.query_params),
+    )
+    # KPI counters to apply kpi_delta messages to; replaces polling
+    await live_counters.send_snapshot(websocket)
 
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(websocket)
-        # optional logging
-        print("Manager disconnected")
+    # returns once the client is gone or evicted as idle
+    await ws_manager.listen(websocket)
+    # optional logging
+    print("Manager disconnected")
 
 
 # ------------------------------------------------------
@@ -62,14 +82,15 @@ async def operator_ws(websocket: WebSocket):
         await websocket.close(code=4003)
         return
 
-    await ws_manager.connect_role(websocket, "operator")
+    # Operators only hear about their own downtimes
+    await ws_manager.connect_role(
+        websocket, "operator", *_resume_params(websocket),
+        subscription=Subscription.from_params(websocket.query_params, operator=user.get("sub")),
+    )
+    await live_counters.send_snapshot(websocket, operator_id=user.get("sub"))
 
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(websocket)
-        print("Operator disconnected")
+    await ws_manager.listen(websocket)
+    print("Operator disconnected")
 
 
 # ------------------------------------------------------
@@ -85,11 +106,31 @@ async def machine_ws(websocket: WebSocket, machine_id: str):
         await websocket.close(code=4001)
         return
 
-    await ws_manager.join_channel(websocket, machine_id)
+    await ws_manager.join_channel(
+        websocket, machine_id, *_resume_params(websocket),
+        subscription=Subscription.from_params(websocket.query_params),
+    )
 
-    try:
-        while True:
-            await websocket.receive_text()
-    except WebSocketDisconnect:
-        ws_manager.disconnect(websocket)
-        print(f"Machine channel disconnected: {machine_id}")
+    await ws_manager.listen(websocket)
+    print(f"Machine channel disconnected: {machine_id}")
+
+
+# ------------------------------------------------------
+# GRACEFUL DRAIN (call from a deploy pre-stop hook)
+# Every worker closes its sockets in waves with staggered reconnect delays,
+# ahead of the server's own shutdown which would drop them all at once.
+# Ops only: needs WS_DRAIN_TOKEN, not a user login.
+# ------------------------------------------------------
+@router.post("/drain")
+async def drain_websockets(
+    seconds: Optional[float] = None,
+    spread: Optional[float] = None,
+    x_drain_token: Optional[str] = Header(None),
+):
+    if not settings.WS_DRAIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    if not x_drain_token or not hmac.compare_digest(x_drain_token, settings.WS_DRAIN_TOKEN):
+        raise HTTPException(status_code=403, detail="Invalid drain token")
+
+    await ws_manager.request_drain(seconds, spread)
+    return {"requested": True, "stats": ws_manager.stats()["drain"]}
@@ -0,0 +1,182 @@
+## app/services/ai_analysis_store.py
+
+import asyncio
+import hashlib
+import os
+from typing import Any, Dict, List, Optional
+
+from app.config import settings, supabase
+from app.services.ai_cache import PROMPT_VERSION
+from app.services.ai_engine import FAILED_ROOT_CAUSES, ai_engine, is_failed_analysis
+from app.services.kv_store import PersistentLRU
+
+
+# Fields whose change makes a stored analysis describe a different event
+EVENT_FIELDS = ("machine_id", "reason", "category", "description")
+
+
+def analysis_version() -> str:
+    return f"{PROMPT_VERSION}:{ai_engine.model_name}"
+
+
+def event_hash(event: Dict[str, Any]) -> str:
+    raw = "\x1f".join(str(event.get(f) or "").strip().lower() for f in EVENT_FIELDS)
+    return hashlib.sha1(raw.encode("utf-8")).hexdigest()
+
+
+def _as_list(value: Any) -> List[str]:
+    if isinstance(value, list):
+        return value
+    if not value:
+        return []
+    return [part.strip() for part in str(value).split(", ") if part.strip()]
+
+
+class AIAnalysisStore:
+    """
+    Read-through access to persisted ai_analysis rows.
+
+    The ai_analysis table has no version columns, so the metadata needed to
+    judge freshness (analysis version, hash of the analysed event fields,
+    is_maintenance_required which the table doesn't keep) lives in a local
+    SQLite-backed store keyed by downtime id. Rows without metadata were
+    written by an older build and are treated as stale.
+    """
+
+    FRESH = "fresh"
+    STALE = "stale"
+    CHANGED = "changed"
+
+    def __init__(self, meta: PersistentLRU):
+        self.meta = meta
+        self._refreshing = set()
+        self._tasks = set()
+
+        self.served_stored = 0
+        self.recomputed = 0
+        self.background_refreshes = 0
+
+    # -----------------------------------------------
+    # Writes
+    # -----------------------------------------------
+    def remember(self, event: Dict[str, Any], ai_result: Dict[str, Any]):
+        """Record version metadata for an analysis that was just stored."""
+        self.meta.put(str(event["id"]), {
+            "version": analysis_version(),
+            "event_hash": event_hash(event),
+            "is_maintenance_required": ai_result.get("is_maintenance_required", False),
+        })
+
+    def save(self, event: Dict[str, Any], ai_result: Dict[str, Any]):
+        """Upsert the ai_analysis row for an event and record its metadata."""
+        row = {
+            "root_cause": ai_result.get("root_cause"),
+            "immediate_actions": ", ".join(ai_result.get("recommended_actions", [])),
+            "preventive_measures": ", ".join(ai_result.get("preventive_measures", [])),
+            "severity": ai_result.get("severity"),
+            "predicted_next_failure": ai_result.get("predicted_next_failure"),
+            "confidence_score": ai_result.get("confidence_score"),
+        }
+
+        res = supabase.table("ai_analysis").update(row).eq("downtime_id", event["id"]).execute()
+        if not res.data:
+            supabase.table("ai_analysis").insert({"downtime_id": event["id"], **row}).execute()
+
+        self.remember(event, ai_result)
+
+    # -----------------------------------------------
+    # Reads
+    # -----------------------------------------------
+    def load(self, event: Dict[str, Any]) -> Optional[tuple]:
+        """
+        Return (analysis, freshness) for the stored analysis of an event, or
+        None if there isn't one. analysis has the analyze_downtime shape plus
+        the analysis_version it was produced with (None if unknown). A row
+        holding a failed call's placeholder (written by older builds) counts
+        as missing.
+        """
+        # operator_log used to insert, so there may be several rows; the latest wins
+        res = supabase.table("ai_analysis") \
+            .select("*") \
+            .eq("downtime_id", event["id"]) \
+            .order("id", desc=True) \
+            .limit(1) \
+            .execute()
+        rows = res.data or []
+        if not rows:
+            return None
+
+        row = rows[0]
+        if row.get("root_cause") in FAILED_ROOT_CAUSES:
+            return None
+        meta = self.meta.get(str(event["id"])) or {}
+
+        if meta.get("event_hash") and meta["event_hash"] != event_hash(event):
+            freshness = self.CHANGED
+        elif meta.get("version") != analysis_version():
+            freshness = self.STALE
+        else:
+            freshness = self.FRESH
+
+        analysis = {
+            "root_cause": row.get("root_cause") or "",
+            "is_maintenance_required": meta.get("is_maintenance_required", False),
+            "recommended_actions": _as_list(row.get("immediate_actions")),
+            "preventive_measures": _as_list(row.get("preventive_measures")),
+            "severity": row.get("severity") or "unknown",
+            "predicted_next_failure": row.get("predicted_next_failure") or "unknown",
+            "confidence_score": row.get("confidence_score") or 0.0,
+            "analysis_version": meta.get("version"),
+        }
+        return analysis, freshness
+
+    # -----------------------------------------------
+    # Recompute
+    # -----------------------------------------------
+    async def recompute(
+        self, event: Dict[str, Any], history: List[Dict[str, Any]], use_cache: bool = True
+    ) -> Dict[str, Any]:
+        """Analyse the event again and store the result; use_cache=False forces a model call."""
+        ai_result = await ai_engine.analyze_downtime(event, history, use_cache=use_cache)
+        self.recomputed += 1
+        if not is_failed_analysis(ai_result):
+            await asyncio.to_thread(self.save, event, ai_result)
+        return ai_result
+
+    def refresh_in_background(self, event: Dict[str, Any], history: List[Dict[str, Any]]):
+        """Lazily bring a stale analysis up to date; one refresh per event at a time."""
+        key = event["id"]
+        if key in self._refreshing:
+            return
+        self._refreshing.add(key)
+
+        async def run():
+            try:
+                await self.recompute(event, history)
+                self.background_refreshes += 1
+            except Exception as e:
+                print("Background AI refresh failed:", e)
+            finally:
+                self._refreshing.discard(key)
+
+        task = asyncio.create_task(run())
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "served_stored": self.served_stored,
+            "recomputed": self.recomputed,
+            "background_refreshes": self.background_refreshes,
+            "refreshing": len(self._refreshing),
+        }
+
+
+ai_analysis_store = AIAnalysisStore(
+    meta=PersistentLRU(
+        db_path=os.path.join(settings.DATA_DIR, "ai_analysis_meta.sqlite3"),
+        table="ai_analysis_meta",
+        max_entries=10000,
+        ttl_seconds=365 * 24 * 3600,
+    ),
+)
@@ -0,0 +1,66 @@
+## app/services/ai_cache.py
+
+import hashlib
+import json
+import os
+import re
+from collections import Counter
+from typing import Any, Dict, List
+
+from app.config import settings
+from app.services.kv_store import PersistentLRU
+
+
+# Bump when the analysis prompt changes so old answers stop matching
+PROMPT_VERSION = "2"
+
+# How many of a machine's most frequent (reason, root_cause) pairs feed the digest
+HISTORY_DIGEST_TOP_N = 5
+
+
+def _norm(value: Any) -> str:
+    text = str(value or "").lower()
+    text = re.sub(r"[^\w\s]", " ", text)
+    return " ".join(text.split())
+
+
+def history_digest(event: Dict[str, Any], history: List[Dict[str, Any]]) -> str:
+    """
+    Compact summary of the history that matters for this event: the most
+    frequent (reason, root_cause) pairs on the same machine, with counts
+    bucketed to powers of two so one extra incident doesn't bust the cache.
+    """
+    machine = _norm(event.get("machine_id"))
+    event_id = event.get("id")
+
+    pairs = Counter(
+        (_norm(row.get("reason")), _norm(row.get("root_cause")))
+        for row in history
+        if _norm(row.get("machine_id")) == machine and row.get("id") != event_id
+    )
+
+    top = sorted(pairs.items(), key=lambda x: (-x[1], x[0]))[:HISTORY_DIGEST_TOP_N]
+    return json.dumps([[r, rc, count.bit_length()] for (r, rc), count in sorted(top)])
+
+
+def event_fingerprint(event: Dict[str, Any], history: List[Dict[str, Any]], model_name: str) -> str:
+    """Stable cache key for an event + its relevant history."""
+    parts = [
+        PROMPT_VERSION,
+        model_name,
+        _norm(event.get("machine_id")),
+        _norm(event.get("reason")),
+        _norm(event.get("category")),
+        _norm(event.get("description")),
+        history_digest(event, history),
+    ]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+# Read with aget() from async code; writes are already written behind
+ai_cache = PersistentLRU(
+    db_path=os.path.join(settings.DATA_DIR, "ai_cache.sqlite3"),
+    table="ai_results",
+    max_entries=settings.AI_CACHE_MAX_ENTRIES,
+    ttl_seconds=settings.AI_CACHE_TTL_SECONDS,
+)
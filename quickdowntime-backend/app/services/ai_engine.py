@@ -1,31 +1,99 @@
 import asyncio
 import json
 import re
-from typing import Dict, List, Any
-import google.generativeai as genai
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import AsyncIterator, Dict, Iterator, List, Any
+
+from app.config import settings
+from app.services.ai_cache import ai_cache, event_fingerprint
+from app.services.circuit_breaker import CircuitBreaker
+from app.services.model_backends import ModelBackend, create_backend
+from app.services.prompt_compaction import (
+    compact_json, estimate_tokens, project_event, summarize_history,
+)
 
 MODEL_NAME = "models/gemini-2.5-flash"
 ATTACHMENT_LOCAL_PATH = "/mnt/data/QuickDowntime.pptx.pdf"
 
+# Floor for the history block even when the rest of the prompt is large
+MIN_HISTORY_TOKENS = 80
+
+SUMMARY_UNAVAILABLE_PREFIX = "⚠️ AI analysis temporarily unavailable."
+
+# root_cause of the placeholder returned when the model call fails
+CALL_FAILED_ROOT_CAUSE = "AI call failed"
+UNPARSEABLE_ROOT_CAUSE = "AI returned unparseable JSON"
+FAILED_ROOT_CAUSES = (CALL_FAILED_ROOT_CAUSE, UNPARSEABLE_ROOT_CAUSE)
+
+
+def is_failed_analysis(result: Dict[str, Any]) -> bool:
+    """True for the placeholder of a failed or unparseable model call."""
+    return "error" in result or "raw" in result
+
 
 class AIEngine:
-    def __init__(self, model_name: str = MODEL_NAME):
-        self.model_name = model_name
-        try:
-            self.model = genai.GenerativeModel(self.model_name)
-        except Exception:
-            self.model = None
+    def __init__(self, model_name: str = MODEL_NAME, cache=ai_cache, backend: ModelBackend = None):
+        self.set_backend(backend or create_backend(model_name))
+        self.cache = cache if settings.AI_CACHE_ENABLED else None
+        self.prompt_token_budget = settings.AI_PROMPT_TOKEN_BUDGET
+
+        # Micro-batching (window 0 = one call per event)
+        self.batch_window = settings.AI_BATCH_WINDOW_MS / 1000
+        self.batch_max_size = max(1, settings.AI_BATCH_MAX_SIZE)
+        self._batch: List[tuple] = []
+        self._batch_timer = None
+        self._batch_tasks = set()
+        self.batches_sent = 0
+        self.batched_events = 0
+
+        # Model calls get their own bounded pool so a slow provider can't
+        # exhaust the default executor that serves every sync route
+        self.max_concurrency = max(1, settings.AI_MAX_CONCURRENCY)
+        self.max_queue = settings.AI_MAX_QUEUE
+        self.call_timeout = settings.AI_CALL_TIMEOUT_SECONDS
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.max_concurrency, thread_name_prefix="ai-model"
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._queued = 0
+        self._in_flight = 0
+        self.timeouts = 0
+        self.streams = 0
+        self.last_ttft_ms = None
+        self._ttft_samples = deque(maxlen=100)
+        self.breaker = CircuitBreaker(
+            failure_threshold=settings.AI_BREAKER_FAILURE_THRESHOLD,
+            reset_timeout=settings.AI_BREAKER_RESET_SECONDS,
+        )
+
+    def set_backend(self, backend: ModelBackend):
+        """Swap the model backend; the model name feeds cache keys."""
+        self.backend = backend
+        self.model_name = backend.model_name
+
+    def _history_budget(self, prompt_without_history: str) -> int:
+        """Tokens left for the history block after the fixed parts of the prompt."""
+        return max(
+            MIN_HISTORY_TOKENS,
+            self.prompt_token_budget - estimate_tokens(prompt_without_history),
+        )
 
     def _build_prompt(self, event: Dict[str, Any], history: List[Dict[str, Any]]) -> str:
-        history_snippet = json.dumps(history[-20:], indent=2, default=str)
+        current = compact_json(project_event(event))
+        budget = self._history_budget(self._render_prompt(current, ""))
+        return self._render_prompt(current, summarize_history(event, history, budget))
 
+    def _render_prompt(self, current: str, history_snippet: str) -> str:
         return f"""
 You are an expert manufacturing engineer. 
 Analyze the downtime and RETURN STRICT JSON ONLY.
 ** confidence score shoud be in 1-100 %.
 
 Current Event:
-{json.dumps(event, indent=2, default=str)}
+{current}
 
 History:
 {history_snippet}
@@ -51,11 +119,71 @@ ONLY JSON.
 """
 
     def _call_model_sync(self, prompt: str) -> str:
-        if self.model:
-            resp = self.model.generate_content(prompt)
-            return resp.text
-        resp = genai.generate_text(model=self.model_name, prompt=prompt)
-        return resp.text
+        return self.backend.generate(prompt)
+
+    async def _admit(self):
+        """
+        Admission for every model call: queue limit, circuit breaker, then
+        a concurrency slot. The slot is given back by _submit's job.
+        """
+        if self._queued >= self.max_queue:
+            raise RuntimeError("AI queue is full")
+
+        self.breaker.check()
+
+        self._queued += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self._queued -= 1
+        self._in_flight += 1
+
+    def _release(self):
+        self._in_flight -= 1
+        self._semaphore.release()
+
+    def _submit(self, fn, *args) -> Future:
+        """
+        Run an admitted job on the AI pool. Its slot is freed when the job
+        actually finishes, not when the caller stops waiting, so timed-out
+        calls still count against max_concurrency while their thread runs.
+        """
+        loop = asyncio.get_running_loop()
+        try:
+            future = self._executor.submit(fn, *args)
+        except Exception:
+            self._release()
+            raise
+
+        def done(_):
+            try:
+                loop.call_soon_threadsafe(self._release)
+            except RuntimeError:
+                # loop already closed (shutdown)
+                pass
+
+        future.add_done_callback(done)
+        return future
+
+    async def _run_model(self, prompt: str) -> str:
+        """
+        Call the model on the dedicated AI pool with a concurrency cap,
+        queue limit, per-call timeout and circuit breaker.
+        """
+        await self._admit()
+        future = self._submit(self._call_model_sync, prompt)
+        try:
+            raw = await asyncio.wait_for(asyncio.wrap_future(future), timeout=self.call_timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            self.breaker.record_failure()
+            raise TimeoutError(f"AI call timed out after {self.call_timeout}s")
+        except Exception:
+            self.breaker.record_failure()
+            raise
+
+        self.breaker.record_success()
+        return raw
 
     def _extract_json(self, text: str) -> Dict[str, Any]:
         text = text.strip()
@@ -80,15 +208,141 @@ ONLY JSON.
         # 4️⃣ Fallback
         raise ValueError("Could not parse AI JSON output")
 
-    async def analyze_downtime(self, event: Dict[str, Any], history: List[Dict[str, Any]]):
+    def _build_batch_prompt(self, items: List[tuple]) -> str:
+        # Events in a burst mostly share history; summarize it once per
+        # affected machine instead of once per event
+        batch_ids = {event.get("id") for event, _ in items}
+        merged = {}
+        for _, history in items:
+            for row in history:
+                if row.get("id") is not None and row.get("id") in batch_ids:
+                    continue
+                merged.setdefault(row.get("id", id(row)), row)
+        history = list(merged.values())
+
+        events = [
+            {"index": idx, **project_event(event)}
+            for idx, (event, _) in enumerate(items)
+        ]
+        current = compact_json(events)
+
+        machines = []
+        for event, _ in items:
+            if event.get("machine_id") not in machines:
+                machines.append(event.get("machine_id"))
+
+        budget = self._history_budget(self._render_batch_prompt(len(items), current, ""))
+        per_machine = max(MIN_HISTORY_TOKENS, budget // len(machines))
+        history_snippet = "\n\n".join(
+            summarize_history({"machine_id": m}, history, per_machine)
+            for m in machines
+        )
+
+        return self._render_batch_prompt(len(items), current, history_snippet)
+
+    def _render_batch_prompt(self, count: int, current: str, history_snippet: str) -> str:
+        return f"""
+You are an expert manufacturing engineer.
+Analyze EACH downtime event below and RETURN A STRICT JSON ARRAY ONLY.
+The array must contain exactly {count} objects, in the same order as the events,
+each with the "index" of the event it answers.
+** confidence score shoud be in 1-100 %.
+
+Current Events:
+{current}
+
+History:
+{history_snippet}
+
+Attached report:
+{ATTACHMENT_LOCAL_PATH}
+
+Return EXACT JSON format:
+[
+  {{
+    "index": 0,
+    "root_cause": "",
+    "is_maintenance_required": true/false,
+    "recommended_actions": [""],
+    "preventive_measures": [""],
+    "severity": "low|medium|high|critical",
+    "predicted_next_failure": "",
+    "confidence_score": 0%
+  }}
+]
+
+NO MARKDOWN
+NO ```
+NO extra explanation
+ONLY JSON.
+"""
+
+    def _extract_json_array(self, text: str) -> List[Dict[str, Any]]:
+        text = text.strip().replace("```json", "").replace("```", "").strip()
+
+        try:
+            parsed = json.loads(text)
+        except ValueError:
+            start, end = text.find("["), text.rfind("]")
+            if start == -1 or end <= start:
+                raise ValueError("Could not parse AI JSON array output")
+            parsed = json.loads(text[start:end + 1])
+
+        if not isinstance(parsed, list):
+            raise ValueError("AI output is not a JSON array")
+        return parsed
+
+    def _result_from_parsed(self, parsed: Dict[str, Any]) -> Dict[str, Any]:
+        return {
+            "root_cause": parsed.get("root_cause", ""),
+            "is_maintenance_required": parsed.get("is_maintenance_required", False),
+            "recommended_actions": parsed.get("recommended_actions", []),
+            "preventive_measures": parsed.get("preventive_measures", []),
+            "severity": parsed.get("severity", "unknown"),
+            "predicted_next_failure": parsed.get("predicted_next_failure", "unknown"),
+            "confidence_score": parsed.get("confidence_score", 0.0),
+        }
+
+    async def analyze_downtime(
+        self, event: Dict[str, Any], history: List[Dict[str, Any]], use_cache: bool = True
+    ):
+        """
+        use_cache=False skips the fingerprint cache lookup (and the stale
+        fallback) so the model is asked again; the new answer is still cached.
+        """
+        cache_key = None
+        if self.cache is not None:
+            cache_key = event_fingerprint(event, history, self.model_name)
+            # memory hit inline; a miss reads SQLite off the event loop
+            cached = await self.cache.aget(cache_key) if use_cache else None
+            if cached is not None:
+                return dict(cached)
+
+        if self.batch_window > 0:
+            result = await self._enqueue_for_batch(event, history)
+        else:
+            result = await self._analyze_single(event, history)
+
+        # Only successful analyses are cached; failures should be retried
+        if cache_key is not None and not is_failed_analysis(result):
+            self.cache.put(cache_key, result)
+        elif use_cache and cache_key is not None and self.breaker.state != CircuitBreaker.CLOSED:
+            # Provider degraded: an expired answer beats a placeholder
+            stale = await self.cache.aget(cache_key, allow_expired=True)
+            if stale is not None:
+                return dict(stale, stale=True)
+
+        return result
+
+    async def _analyze_single(self, event: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
         prompt = self._build_prompt(event, history)
 
         # Run model in background thread
         try:
-            raw = await asyncio.to_thread(self._call_model_sync, prompt)
+            raw = await self._run_model(prompt)
         except Exception as e:
             return {
-                "root_cause": "AI call failed",
+                "root_cause": CALL_FAILED_ROOT_CAUSE,
                 "is_maintenance_required": False,
                 "recommended_actions": [],
                 "preventive_measures": [],
@@ -103,7 +357,7 @@ ONLY JSON.
             parsed = self._extract_json(raw)
         except Exception:
             return {
-                "root_cause": "AI returned unparseable JSON",
+                "root_cause": UNPARSEABLE_ROOT_CAUSE,
                 "is_maintenance_required": False,
                 "recommended_actions": [],
                 "preventive_measures": [],
@@ -113,21 +367,125 @@ ONLY JSON.
                 "raw": raw
             }
 
+        return self._result_from_parsed(parsed)
+
+    # -----------------------------------------------
+    # Micro-batching: events arriving within batch_window seconds share
+    # one model call; each caller awaits its own future. With no call in
+    # flight an event goes out at once, so a lone event never waits for
+    # the window; events arriving while a call runs are batched and sent
+    # when it finishes or the window closes, whichever is first.
+    # -----------------------------------------------
+    async def _enqueue_for_batch(self, event: Dict[str, Any], history: List[Dict[str, Any]]) -> Dict[str, Any]:
+        future = asyncio.get_running_loop().create_future()
+        self._batch.append((event, history, future))
+
+        if len(self._batch) >= self.batch_max_size or not self._batch_tasks:
+            self._start_flush()
+        elif self._batch_timer is None:
+            self._batch_timer = asyncio.create_task(self._flush_after_window())
+
+        return await future
+
+    async def _flush_after_window(self):
+        await asyncio.sleep(self.batch_window)
+        self._batch_timer = None
+        self._start_flush()
+
+    def _start_flush(self):
+        if self._batch_timer is not None:
+            self._batch_timer.cancel()
+            self._batch_timer = None
+
+        batch, self._batch = self._batch, []
+        if batch:
+            task = asyncio.create_task(self._run_batch(batch))
+            self._batch_tasks.add(task)
+            task.add_done_callback(self._batch_tasks.discard)
+
+    async def _run_batch(self, batch: List[tuple]):
+        try:
+            if len(batch) == 1:
+                event, history, future = batch[0]
+                results = [await self._analyze_single(event, history)]
+            else:
+                results = await self._analyze_batch([(e, h) for e, h, _ in batch])
+        except Exception as e:
+            results = [e] * len(batch)
+
+        for (_, _, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+        # this task is still registered; if it was the only one, the events
+        # that queued up behind it needn't wait out the rest of the window
+        if self._batch and len(self._batch_tasks) <= 1:
+            self._start_flush()
+
+    async def _analyze_batch(self, items: List[tuple]) -> List[Dict[str, Any]]:
+        prompt = self._build_batch_prompt(items)
+        self.batches_sent += 1
+        self.batched_events += len(items)
+
+        try:
+            raw = await self._run_model(prompt)
+            parsed = self._extract_json_array(raw)
+        except Exception as e:
+            print("Batched AI call failed, falling back to single calls:", e)
+            parsed = []
+
+        by_index = {}
+        for pos, obj in enumerate(parsed):
+            if isinstance(obj, dict):
+                by_index[obj.get("index", pos)] = obj
+
+        # Anything the model skipped or mangled gets its own call, all at once
+        missing = [idx for idx in range(len(items)) if idx not in by_index]
+        singles = await asyncio.gather(*(self._analyze_single(*items[idx]) for idx in missing))
+        fallback = dict(zip(missing, singles))
+
+        return [
+            self._result_from_parsed(by_index[idx]) if idx in by_index else fallback[idx]
+            for idx in range(len(items))
+        ]
+
+    def stats(self) -> Dict[str, Any]:
         return {
-            "root_cause": parsed.get("root_cause", ""),
-            "is_maintenance_required": parsed.get("is_maintenance_required", False),
-            "recommended_actions": parsed.get("recommended_actions", []),
-            "preventive_measures": parsed.get("preventive_measures", []),
-            "severity": parsed.get("severity", "unknown"),
-            "predicted_next_failure": parsed.get("predicted_next_failure", "unknown"),
-            "confidence_score": parsed.get("confidence_score", 0.0),
+            "model": self.model_name,
+            "backend": self.backend.name,
+            "cache": self.cache.stats() if self.cache is not None else None,
+            "executor": {
+                "max_concurrency": self.max_concurrency,
+                "in_flight": self._in_flight,
+                "queue_depth": self._queued,
+                "max_queue": self.max_queue,
+                "timeout_seconds": self.call_timeout,
+                "timeouts": self.timeouts,
+            },
+            "breaker": self.breaker.stats(),
+            "streaming": {
+                "streams": self.streams,
+                "last_ttft_ms": self.last_ttft_ms,
+                "avg_ttft_ms": (
+                    round(sum(self._ttft_samples) / len(self._ttft_samples), 1)
+                    if self._ttft_samples else None
+                ),
+            },
+            "batching": {
+                "window_ms": int(self.batch_window * 1000),
+                "max_size": self.batch_max_size,
+                "pending": len(self._batch),
+                "batches_sent": self.batches_sent,
+                "batched_events": self.batched_events,
+            },
         }
 
-    async def analyze_downtime_summary(self, summary_text: str, events: List[Dict[str, Any]]) -> str:
-        """
-        Analyze a summary of multiple downtime events for JSW Steel
-        """
-        prompt = f"""
+    def _build_summary_prompt(self, summary_text: str) -> str:
+        return f"""
 You are an AI manufacturing analyst for JSW Steel plant.
 
 Analyze the following downtime data and provide actionable insights:
@@ -148,12 +506,95 @@ NO MARKDOWN. NO ```
 Just plain text analysis.
 """
 
+    def _summary_unavailable(self, error: Exception) -> str:
+        return f"{SUMMARY_UNAVAILABLE_PREFIX} Error: {str(error)}\n\nPlease review the downtime data manually and contact support if this persists."
+
+    async def analyze_downtime_summary(self, summary_text: str, events: List[Dict[str, Any]]) -> str:
+        """
+        Analyze a summary of multiple downtime events for JSW Steel
+        """
+        prompt = self._build_summary_prompt(summary_text)
+
         try:
             # Run model in background thread
-            raw = await asyncio.to_thread(self._call_model_sync, prompt)
+            raw = await self._run_model(prompt)
             return raw.strip()
         except Exception as e:
-            return f"⚠️ AI analysis temporarily unavailable. Error: {str(e)}\n\nPlease review the downtime data manually and contact support if this persists."
+            return self._summary_unavailable(e)
+
+    # -----------------------------------------------
+    # Streaming summaries
+    # -----------------------------------------------
+    def _stream_model_sync(self, prompt: str) -> Iterator[str]:
+        return self.backend.stream(prompt)
+
+    async def stream_downtime_summary(self, summary_text: str) -> AsyncIterator[str]:
+        """
+        Same analysis as analyze_downtime_summary, yielded as text chunks as
+        the model produces them. Admitted like any other model call (queue
+        limit, breaker, concurrency slot); each chunk must arrive within
+        call_timeout.
+        """
+        prompt = self._build_summary_prompt(summary_text)
+        started = time.perf_counter()
+        got_first = False
+
+        try:
+            await self._admit()
+        except Exception as e:
+            yield self._summary_unavailable(e)
+            return
+
+        loop = asyncio.get_running_loop()
+        queue: asyncio.Queue = asyncio.Queue()
+        stop = threading.Event()
+        end = object()
+
+        def produce():
+            try:
+                for text in self._stream_model_sync(prompt):
+                    if stop.is_set():
+                        break
+                    loop.call_soon_threadsafe(queue.put_nowait, text)
+            except Exception as e:
+                loop.call_soon_threadsafe(queue.put_nowait, e)
+            finally:
+                loop.call_soon_threadsafe(queue.put_nowait, end)
+
+        self.streams += 1
+        # the slot stays taken until produce() returns, even if we stop reading
+        self._submit(produce)
+        try:
+            while True:
+                try:
+                    item = await asyncio.wait_for(queue.get(), timeout=self.call_timeout)
+                except asyncio.TimeoutError:
+                    self.timeouts += 1
+                    self.breaker.record_failure()
+                    yield self._summary_unavailable(
+                        TimeoutError(f"AI stream stalled for {self.call_timeout}s")
+                    )
+                    return
+
+                if item is end:
+                    self.breaker.record_success()
+                    return
+                if isinstance(item, Exception):
+                    self.breaker.record_failure()
+                    prefix = "\n\n" if got_first else ""
+                    yield prefix + self._summary_unavailable(item)
+                    return
+
+                if not got_first:
+                    got_first = True
+                    self._record_ttft((time.perf_counter() - started) * 1000)
+                yield item
+        finally:
+            stop.set()
+
+    def _record_ttft(self, ms: float):
+        self.last_ttft_ms = round(ms, 1)
+        self._ttft_samples.append(ms)
 
 
 ai_engine = AIEngine()
\ No newline at end of file
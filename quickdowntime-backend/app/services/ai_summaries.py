@@ -0,0 +1,351 @@
+## app/services/ai_summaries.py
+
+import asyncio
+import hashlib
+import os
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.config import settings, supabase
+from app.services.ai_engine import ai_engine, SUMMARY_UNAVAILABLE_PREFIX
+from app.services.kv_store import PersistentLRU, SQLiteLease
+
+
+# ---------------------------
+# Helper function
+# ---------------------------
+def calculate_duration(start_time, end_time):
+    """Calculate duration between start and end time"""
+    if not start_time:
+        return "Unknown"
+    
+    if not end_time:
+        return "Ongoing"
+    
+    try:
+        start = datetime.fromisoformat(start_time.replace('Z', '+00:00'))
+        end = datetime.fromisoformat(end_time.replace('Z', '+00:00'))
+        delta = end - start
+        
+        hours = delta.seconds // 3600
+        minutes = (delta.seconds % 3600) // 60
+        
+        if hours > 0:
+            return f"{hours}h {minutes}m"
+        else:
+            return f"{minutes}m"
+    except:
+        return "Unknown"
+
+
+# ---------------------------
+# Summary inputs: (rows, summary_text, payload)
+# summary_text is None when there is nothing for the model to analyse
+# ---------------------------
+def daily_context():
+    # Get today's downtimes only
+    today_start = datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    today_start_str = today_start.isoformat()
+
+    res = supabase.table("downtime_logs") \
+        .select("*") \
+        .gte("start_time", today_start_str) \
+        .order("start_time", desc=True) \
+        .execute()
+
+    rows = res.data or []
+
+    if not rows:
+        return rows, None, {
+            "analysis": "✅ No downtimes recorded today. Excellent performance! All machines are running smoothly.",
+            "total_incidents": 0
+        }
+
+    # Prepare summary data for AI
+    summary_text = f"Today's JSW Steel Downtime Analysis ({len(rows)} incidents):\n\n"
+    
+    for idx, event in enumerate(rows, 1):
+        duration = calculate_duration(event.get("start_time"), event.get("end_time"))
+        summary_text += f"{idx}. Machine: {event.get('machine_id')}\n"
+        summary_text += f"   Root Cause: {event.get('root_cause')} - {event.get('sub_category')}\n"
+        summary_text += f"   Duration: {duration}\n"
+        summary_text += f"   Description: {event.get('description', 'N/A')}\n\n"
+
+    return rows, summary_text, {
+        "total_incidents": len(rows),
+        "events": rows
+    }
+
+
+def weekly_context():
+    # Get last 7 days of downtimes
+    week_start = datetime.now() - timedelta(days=7)
+    week_start_str = week_start.isoformat()
+
+    res = supabase.table("downtime_logs") \
+        .select("*") \
+        .gte("start_time", week_start_str) \
+        .order("start_time", desc=True) \
+        .execute()
+
+    rows = res.data or []
+
+    if not rows:
+        return rows, None, {
+            "analysis": "✅ No downtimes recorded in the last 7 days. Outstanding performance!",
+            "total_incidents": 0,
+            "machine_stats": {},
+            "cause_stats": {}
+        }
+
+    # Group by machine and cause
+    machine_stats = {}
+    cause_stats = {}
+    
+    for event in rows:
+        machine = event.get('machine_id', 'Unknown')
+        cause = event.get('root_cause', 'Unknown')
+        
+        machine_stats[machine] = machine_stats.get(machine, 0) + 1
+        cause_stats[cause] = cause_stats.get(cause, 0) + 1
+
+    # Prepare summary for AI
+    summary_text = f"Weekly JSW Steel Downtime Analysis (Last 7 days - {len(rows)} total incidents):\n\n"
+    
+    summary_text += "Top Affected Machines:\n"
+    for machine, count in sorted(machine_stats.items(), key=lambda x: x[1], reverse=True)[:5]:
+        summary_text += f"  - {machine}: {count} incidents\n"
+    
+    summary_text += "\nTop Root Causes:\n"
+    for cause, count in sorted(cause_stats.items(), key=lambda x: x[1], reverse=True)[:5]:
+        summary_text += f"  - {cause}: {count} incidents\n"
+    
+    summary_text += "\nRecent Events:\n"
+    for idx, event in enumerate(rows[:10], 1):
+        duration = calculate_duration(event.get("start_time"), event.get("end_time"))
+        summary_text += f"{idx}. {event.get('machine_id')} - {event.get('root_cause')}, Duration: {duration}\n"
+
+    return rows, summary_text, {
+        "total_incidents": len(rows),
+        "machine_stats": machine_stats,
+        "cause_stats": cause_stats,
+        "events": rows
+    }
+
+
+CONTEXTS = {
+    "daily": daily_context,
+    "weekly": weekly_context,
+}
+
+
+def _signature(kind: str, rows: List[Dict[str, Any]]) -> str:
+    """Changes whenever a downtime in the window is added, resolved or re-analysed."""
+    parts = [kind, datetime.now().date().isoformat()]
+    parts.extend(
+        f"{r.get('id')}:{r.get('status')}:{r.get('root_cause')}"
+        for r in sorted(rows, key=lambda r: str(r.get("id")))
+    )
+    return hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()
+
+
+class SummaryStore:
+    """
+    Latest daily / weekly AI summary for the plant.
+
+    A background loop recomputes a summary only when the rows in its window
+    changed since the last run (new, resolved or re-analysed downtimes), so
+    page views are served instantly from the store with generated_at.
+    Writers call mark_dirty() to get a refresh sooner than the poll interval.
+
+    Every worker on the host reads the same SQLite file (no per-worker
+    memory copy), and generating a summary takes a lease on its kind: one
+    worker calls the model, the others wait for and reuse its result.
+    """
+
+    # how often a worker waiting on another's lease checks for the result
+    LEASE_POLL_SECONDS = 0.5
+
+    def __init__(
+        self,
+        cache: PersistentLRU,
+        lease: SQLiteLease,
+        refresh_seconds: int = 300,
+        min_interval: int = 30,
+        lease_seconds: float = 120.0,
+    ):
+        self.cache = cache
+        self.lease = lease
+        self.refresh_seconds = refresh_seconds
+        self.min_interval = min_interval
+        self.lease_seconds = lease_seconds
+
+        self._locks = {kind: asyncio.Lock() for kind in CONTEXTS}
+        self._dirty: Optional[asyncio.Event] = None
+        self._event_loop: Optional[asyncio.AbstractEventLoop] = None
+        self._task: Optional[asyncio.Task] = None
+        self._generated_at: Dict[str, Optional[str]] = {}
+
+        self.recomputed = 0
+        self.skipped = 0
+        self.waited = 0
+
+    def _seen(self, kind: str, entry: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+        summary = entry["summary"] if entry else None
+        if summary is not None:
+            self._generated_at[kind] = summary.get("generated_at")
+        return summary
+
+    def get(self, kind: str) -> Optional[Dict[str, Any]]:
+        """Blocking (reads SQLite): from async code use aget()."""
+        return self._seen(kind, self.cache.get(kind))
+
+    async def aget(self, kind: str) -> Optional[Dict[str, Any]]:
+        return self._seen(kind, await self.cache.aget(kind))
+
+    def save(self, kind: str, rows: List[Dict[str, Any]], summary: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Store a freshly generated summary. A failed analysis is kept for
+        display but without a signature, so the next run retries it.
+        """
+        summary = {**summary, "generated_at": datetime.utcnow().isoformat()}
+        failed = str(summary.get("analysis", "")).startswith(SUMMARY_UNAVAILABLE_PREFIX)
+        self.cache.put(kind, {
+            "signature": None if failed else _signature(kind, rows),
+            "summary": summary,
+        })
+        self._generated_at[kind] = summary["generated_at"]
+        return summary
+
+    @asynccontextmanager
+    async def generating(self, kind: str, rows: List[Dict[str, Any]], force: bool = False):
+        """
+        Take the right to generate the kind's summary for these rows: its
+        lock in this worker and its lease across workers. Yields the stored
+        summary when that is already current (or another worker produced it
+        while we waited); otherwise yields None and the caller generates
+        and save()s it before leaving the block.
+        """
+        signature = _signature(kind, rows)
+        async with self._locks[kind]:
+            entry = await self.cache.aget(kind)
+            if not force and entry and entry["signature"] == signature:
+                self.skipped += 1
+                yield self._seen(kind, entry)
+                return
+
+            name = f"summary:{kind}"
+            while not await asyncio.to_thread(self.lease.acquire, name, self.lease_seconds):
+                # another worker is generating it: take its result
+                self.waited += 1
+                await asyncio.sleep(self.LEASE_POLL_SECONDS)
+                entry = await self.cache.aget(kind)
+                if entry and entry["signature"] == signature:
+                    yield self._seen(kind, entry)
+                    return
+
+            try:
+                # it may have landed between our check and the lease
+                entry = await self.cache.aget(kind)
+                if not force and entry and entry["signature"] == signature:
+                    self.skipped += 1
+                    yield self._seen(kind, entry)
+                    return
+
+                yield None
+                self.recomputed += 1
+                # on disk before the next worker can take the lease
+                await asyncio.to_thread(self.cache.flush)
+            finally:
+                await asyncio.to_thread(self.lease.release, name)
+
+    async def refresh(self, kind: str, force: bool = False) -> Dict[str, Any]:
+        rows, summary_text, payload = await asyncio.to_thread(CONTEXTS[kind])
+
+        async with self.generating(kind, rows, force) as current:
+            if current is not None:
+                return current
+
+            if summary_text is None:
+                summary = payload
+            else:
+                analysis = await ai_engine.analyze_downtime_summary(summary_text, rows)
+                summary = {"analysis": analysis, **payload}
+
+            return self.save(kind, rows, summary)
+
+    async def serve(self, kind: str, force: bool = False) -> Dict[str, Any]:
+        if not force:
+            summary = await self.aget(kind)
+            if summary is not None:
+                return summary
+        return await self.refresh(kind, force=force)
+
+    # -----------------------------------------------
+    # Background refresh
+    # -----------------------------------------------
+    def mark_dirty(self):
+        """Safe to call from sync routes running in the threadpool."""
+        if self._dirty is None:
+            return
+        try:
+            running = asyncio.get_running_loop()
+        except RuntimeError:
+            running = None
+        if running is self._event_loop:
+            self._dirty.set()
+        else:
+            self._event_loop.call_soon_threadsafe(self._dirty.set)
+
+    async def _loop(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._dirty.wait(), timeout=self.refresh_seconds)
+            except asyncio.TimeoutError:
+                pass
+            self._dirty.clear()
+
+            for kind in CONTEXTS:
+                try:
+                    await self.refresh(kind)
+                except Exception as e:
+                    print(f"AI {kind} summary refresh failed:", e)
+
+            # debounce bursts of writes into one recompute
+            await asyncio.sleep(self.min_interval)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._event_loop = asyncio.get_running_loop()
+            self._dirty = asyncio.Event()
+            self._dirty.set()  # warm the store at startup
+            self._task = asyncio.create_task(self._loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "recomputed": self.recomputed,
+            "skipped_unchanged": self.skipped,
+            "waited_for_other_worker": self.waited,
+            # as last read or written by this worker
+            "generated_at": {kind: self._generated_at.get(kind) for kind in CONTEXTS},
+        }
+
+
+summary_store = SummaryStore(
+    cache=PersistentLRU(
+        db_path=os.path.join(settings.DATA_DIR, "ai_summaries.sqlite3"),
+        table="ai_summaries",
+        # no memory tier: another worker may have written a newer one
+        max_entries=0,
+        ttl_seconds=7 * 24 * 3600,
+    ),
+    lease=SQLiteLease(os.path.join(settings.DATA_DIR, "ai_summaries.sqlite3"), "ai_summary_leases"),
+    refresh_seconds=settings.AI_SUMMARY_REFRESH_SECONDS,
+    min_interval=settings.AI_SUMMARY_MIN_INTERVAL_SECONDS,
+)
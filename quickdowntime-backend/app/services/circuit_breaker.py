@@ -0,0 +1,85 @@
+## app/services/circuit_breaker.py
+
+import time
+from typing import Any, Dict
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a provider that is known to be degraded."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker:
+    - closed:    calls go through; consecutive failures are counted
+    - open:      calls fail fast until reset_timeout has passed
+    - half_open: a single probe call is let through; success closes the
+                 breaker, failure re-opens it
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half_open"
+
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        self._probe_started = 0.0
+
+        self.total_failures = 0
+        self.total_rejected = 0
+        self.times_opened = 0
+
+    def allow(self) -> bool:
+        if self.state == self.CLOSED:
+            return True
+
+        if self.state == self.OPEN:
+            if time.monotonic() - self.opened_at < self.reset_timeout:
+                self.total_rejected += 1
+                return False
+            self.state = self.HALF_OPEN
+
+        # half-open: one probe at a time (a probe that never reported back,
+        # e.g. cancelled while queued, is given up on after reset_timeout)
+        now = time.monotonic()
+        if self._probe_in_flight and now - self._probe_started < self.reset_timeout:
+            self.total_rejected += 1
+            return False
+        self._probe_in_flight = True
+        self._probe_started = now
+        return True
+
+    def check(self):
+        if not self.allow():
+            raise CircuitOpenError("AI provider circuit is open")
+
+    def record_success(self):
+        self.state = self.CLOSED
+        self.consecutive_failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self):
+        self.total_failures += 1
+        self.consecutive_failures += 1
+        self._probe_in_flight = False
+
+        if self.state == self.HALF_OPEN or self.consecutive_failures >= self.failure_threshold:
+            if self.state != self.OPEN:
+                self.times_opened += 1
+            self.state = self.OPEN
+            self.opened_at = time.monotonic()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "state": self.state,
+            "consecutive_failures": self.consecutive_failures,
+            "total_failures": self.total_failures,
+            "total_rejected": self.total_rejected,
+            "times_opened": self.times_opened,
+        }
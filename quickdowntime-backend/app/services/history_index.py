@@ -0,0 +1,335 @@
+## app/services/history_index.py
+
+import asyncio
+import math
+import time
+from collections import Counter, OrderedDict
+from datetime import datetime, timedelta
+from typing import Any, Dict, List, Optional
+
+from app.config import settings, supabase
+from app.services.text_features import hashed_features
+
+
+TEXT_FIELDS = ("reason", "category", "description", "root_cause")
+
+# Columns kept per indexed row (enough for prompt compaction)
+STORED_FIELDS = (
+    "id", "machine_id", "reason", "category", "description", "root_cause",
+    "severity", "status", "duration_minutes", "created_at",
+)
+
+
+def _features(row: Dict[str, Any]) -> Counter:
+    return hashed_features(row, TEXT_FIELDS)
+
+
+class _MachinePartition:
+    def __init__(self):
+        # doc id -> (term frequencies, stored row); insertion order = age
+        self.docs: "OrderedDict[Any, tuple[Counter, Dict[str, Any]]]" = OrderedDict()
+        self.norms: Dict[Any, float] = {}
+        self.postings: Dict[int, set] = {}
+
+    def add(self, doc_id, tf: Counter, norm: float, row: Dict[str, Any]):
+        self.docs[doc_id] = (tf, row)
+        self.norms[doc_id] = norm
+        for feature in tf:
+            self.postings.setdefault(feature, set()).add(doc_id)
+
+    def remove(self, doc_id) -> Optional[Counter]:
+        entry = self.docs.pop(doc_id, None)
+        if entry is None:
+            return None
+        self.norms.pop(doc_id, None)
+        tf = entry[0]
+        for feature in tf:
+            ids = self.postings.get(feature)
+            if ids is not None:
+                ids.discard(doc_id)
+                if not ids:
+                    del self.postings[feature]
+        return tf
+
+
+class HistoryIndex:
+    """
+    In-memory TF-IDF retrieval over past downtimes, partitioned by machine.
+
+    Rows are vectorized with hashed word uni/bi-grams over reason, category,
+    description and root cause. Queries only score documents that share at
+    least one feature with the event (via per-machine postings lists), so a
+    lookup touches a handful of rows instead of the whole table.
+
+    Each worker keeps its own index: it is backfilled once, then every
+    refresh_seconds (on the next lookup, in the background) rows with
+    id > the highest id seen so far are pulled in, plus rows whose
+    updated_at moved since the last refresh (root cause / severity from
+    an analysis, resolution), so changes made through other workers show
+    up too.
+    """
+
+    # rows fetched per query when catching up
+    PAGE_SIZE = 1000
+    # updated_at is stamped by whichever worker wrote the row: look back a
+    # little further than the last refresh to allow for clock skew
+    UPDATE_OVERLAP_SECONDS = 30
+
+    def __init__(self, max_docs_per_machine: int = 2000, refresh_seconds: float = 60.0):
+        self.max_docs_per_machine = max_docs_per_machine
+        self.refresh_seconds = refresh_seconds
+        self._partitions: Dict[str, _MachinePartition] = {}
+        self._df: Counter = Counter()
+        self._n_docs = 0
+
+        self._loaded = False
+        self._load_lock: Optional[asyncio.Lock] = None
+
+        # highest downtime id read from the table (rows added locally don't
+        # count: another worker may still commit a lower one)
+        self._last_id: Optional[int] = None
+        # updated_at (ISO, UTC) from which the next refresh re-reads rows
+        self._updated_since: Optional[str] = None
+        self._refreshed_at = 0.0
+        self._refresh_task: Optional[asyncio.Task] = None
+        self.refreshes = 0
+        self.refreshed_rows = 0
+
+    # -----------------------------------------------
+    # Loading
+    # -----------------------------------------------
+    def _fetch_recent(self, limit: int) -> List[Dict[str, Any]]:
+        return (
+            supabase.table("downtime_logs")
+            .select(",".join(STORED_FIELDS))
+            .order("created_at", desc=True)
+            .limit(limit)
+            .execute()
+        ).data or []
+
+    def _fetch_since(self, last_id: Optional[int], limit: int) -> List[Dict[str, Any]]:
+        """Rows with id > last_id, oldest first, at most limit of them."""
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < limit:
+            query = supabase.table("downtime_logs").select(",".join(STORED_FIELDS))
+            if last_id is not None:
+                query = query.gt("id", last_id)
+            page = query.order("id").limit(min(self.PAGE_SIZE, limit - len(rows))).execute().data or []
+            rows.extend(page)
+            if len(page) < self.PAGE_SIZE:
+                break
+            last_id = page[-1]["id"]
+        return rows
+
+    def _fetch_updated(self, since: str, limit: int) -> List[Dict[str, Any]]:
+        """Rows with updated_at > since, oldest change first, at most limit of them."""
+        rows: List[Dict[str, Any]] = []
+        while len(rows) < limit:
+            size = min(self.PAGE_SIZE, limit - len(rows))
+            page = (
+                supabase.table("downtime_logs")
+                .select(",".join(STORED_FIELDS))
+                .gt("updated_at", since)
+                .order("updated_at")
+                .range(len(rows), len(rows) + size - 1)
+                .execute()
+            ).data or []
+            rows.extend(page)
+            if len(page) < size:
+                break
+        return rows
+
+    def _next_updated_since(self, started: datetime) -> str:
+        return (started - timedelta(seconds=self.UPDATE_OVERLAP_SECONDS)).isoformat()
+
+    def _ingest(self, rows: List[Dict[str, Any]]):
+        # on the event loop, so lookups never see a half-updated index
+        for row in rows:
+            self.add(row)
+            doc_id = row.get("id")
+            if isinstance(doc_id, int) and (self._last_id is None or doc_id > self._last_id):
+                self._last_id = doc_id
+
+    async def ensure_loaded(self):
+        """
+        Backfill from downtime_logs once per process; after that, start a
+        catch-up in the background when the last one is refresh_seconds old.
+        """
+        if self._loaded:
+            if (
+                time.monotonic() - self._refreshed_at >= self.refresh_seconds
+                and (self._refresh_task is None or self._refresh_task.done())
+            ):
+                self._refresh_task = asyncio.create_task(self.refresh())
+            return
+        if self._load_lock is None:
+            self._load_lock = asyncio.Lock()
+
+        async with self._load_lock:
+            if self._loaded:
+                return
+            try:
+                started = datetime.utcnow()
+                rows = await asyncio.to_thread(self._fetch_recent, settings.AI_HISTORY_INDEX_BACKFILL)
+                # oldest first so per-machine eviction keeps the newest rows
+                self._ingest(list(reversed(rows)))
+                self._updated_since = self._next_updated_since(started)
+                self._refreshed_at = time.monotonic()
+                self._loaded = True
+            except Exception as e:
+                print("History index backfill failed:", e)
+
+    async def refresh(self):
+        """Pull in rows written or updated since the last load (by any worker)."""
+        started = datetime.utcnow()
+        self._refreshed_at = time.monotonic()
+        limit = settings.AI_HISTORY_INDEX_BACKFILL
+        try:
+            rows = await asyncio.to_thread(self._fetch_since, self._last_id, limit)
+            if self._updated_since is not None:
+                # after the new rows, so a row in both ends up as its latest version
+                rows += await asyncio.to_thread(self._fetch_updated, self._updated_since, limit)
+        except Exception as e:
+            print("History index refresh failed:", e)
+            return
+        self._ingest(rows)
+        self._updated_since = self._next_updated_since(started)
+        self.refreshes += 1
+        self.refreshed_rows += len(rows)
+
+    # -----------------------------------------------
+    # Incremental updates
+    # -----------------------------------------------
+    def add(self, row: Dict[str, Any]):
+        """Insert or replace a downtime row (call again after root_cause is set)."""
+        doc_id = row.get("id")
+        machine = row.get("machine_id")
+        if doc_id is None or not machine:
+            return
+
+        self.remove(doc_id)
+
+        partition = self._partitions.setdefault(machine, _MachinePartition())
+        tf = _features(row)
+        self._df.update(tf.keys())
+        self._n_docs += 1
+        norm = math.sqrt(sum(w * w for w in self._weights(tf).values())) or 1.0
+        partition.add(doc_id, tf, norm, {k: row.get(k) for k in STORED_FIELDS})
+
+        while len(partition.docs) > self.max_docs_per_machine:
+            oldest = next(iter(partition.docs))
+            self._forget(partition, oldest)
+
+    def remove(self, doc_id):
+        for partition in self._partitions.values():
+            if doc_id in partition.docs:
+                self._forget(partition, doc_id)
+                return
+
+    def _forget(self, partition: _MachinePartition, doc_id):
+        tf = partition.remove(doc_id)
+        if tf is None:
+            return
+        self._n_docs -= 1
+        for feature in tf:
+            self._df[feature] -= 1
+            if self._df[feature] <= 0:
+                del self._df[feature]
+
+    # -----------------------------------------------
+    # Query
+    # -----------------------------------------------
+    def _idf(self, feature: int) -> float:
+        return math.log((self._n_docs + 1) / (1 + self._df.get(feature, 0))) + 1
+
+    def _weights(self, tf: Counter) -> Dict[int, float]:
+        return {f: (1 + math.log(count)) * self._idf(f) for f, count in tf.items()}
+
+    def similar(self, event: Dict[str, Any], k: int = 10) -> List[Dict[str, Any]]:
+        """
+        Top-k most similar past incidents on the event's machine, most
+        similar first. Padded with the machine's most recent incidents when
+        fewer than k rows share any terms.
+        """
+        partition = self._partitions.get(event.get("machine_id"))
+        if partition is None:
+            return []
+
+        event_id = event.get("id")
+        query = {
+            f: (w, self._idf(f))
+            for f, w in self._weights(_features(event)).items()
+        }
+        q_norm = math.sqrt(sum(w * w for w, _ in query.values())) or 1.0
+
+        candidates = set()
+        for feature in query:
+            candidates |= partition.postings.get(feature, set())
+        candidates.discard(event_id)
+
+        # idf is only needed for the query's own features; document norms
+        # are computed at insert time (slight drift as df changes is fine)
+        scored = []
+        for doc_id in candidates:
+            tf, row = partition.docs[doc_id]
+            dot = sum(
+                w * (1 + math.log(tf[f])) * idf
+                for f, (w, idf) in query.items() if f in tf
+            )
+            scored.append((dot / (q_norm * partition.norms[doc_id]), doc_id, row))
+
+        scored.sort(key=lambda x: x[0], reverse=True)
+        results = [row for _, _, row in scored[:k]]
+
+        if len(results) < k:
+            chosen = {row.get("id") for row in results}
+            for doc_id in reversed(partition.docs):
+                if len(results) >= k:
+                    break
+                if doc_id in chosen or doc_id == event_id:
+                    continue
+                results.append(partition.docs[doc_id][1])
+
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._loaded,
+            "last_id": self._last_id,
+            "refreshes": self.refreshes,
+            "refreshed_rows": self.refreshed_rows,
+            "documents": self._n_docs,
+            "machines": len(self._partitions),
+            "features": len(self._df),
+        }
+
+
+async def retrieve_history(event: Dict[str, Any], k: Optional[int] = None) -> List[Dict[str, Any]]:
+    """
+    AI context for an event: the k most similar incidents on the same
+    machine, or the plant-wide most recent rows if the index has nothing.
+    """
+    k = k or settings.AI_HISTORY_TOP_K
+    await history_index.ensure_loaded()
+
+    rows = history_index.similar(event, k)
+    if rows:
+        return rows
+
+    return await asyncio.to_thread(_recent_rows, k)
+
+
+def _recent_rows(k: int) -> List[Dict[str, Any]]:
+    return (
+        supabase.table("downtime_logs")
+        .select("*")
+        .order("created_at", desc=True)
+        .limit(k)
+        .execute()
+    ).data or []
+
+
+history_index = HistoryIndex(
+    max_docs_per_machine=settings.AI_HISTORY_INDEX_MAX_PER_MACHINE,
+    refresh_seconds=settings.AI_HISTORY_INDEX_REFRESH_SECONDS,
+)
@@ -0,0 +1,126 @@
+## app/services/http_pools.py
+
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, Dict, Optional
+
+from app.config import settings
+
+if TYPE_CHECKING:
+    import httpx
+
+
+class HttpPools:
+    """
+    Shared httpx connection pools, one per upstream (e.g. "supabase"),
+    sized from settings. A pool is created on first use; the app lifespan
+    warms the ones it knows about at startup and closes them all on
+    shutdown. HTTP/2 is used when enabled and the h2 package is installed,
+    so one warm connection can carry many concurrent requests.
+    """
+
+    def __init__(
+        self,
+        max_connections: int = 20,
+        max_keepalive_connections: int = 10,
+        keepalive_expiry: float = 30.0,
+        http2: bool = True,
+        connect_timeout: float = 10.0,
+        read_timeout: float = 20.0,
+        write_timeout: float = 10.0,
+        pool_timeout: float = 30.0,
+        warm_connections: int = 2,
+        warmup_timeout: float = 5.0,
+    ):
+        self.max_connections = max_connections
+        self.max_keepalive_connections = max_keepalive_connections
+        self.keepalive_expiry = keepalive_expiry
+        self.http2 = http2 and importlib.util.find_spec("h2") is not None
+        if http2 and not self.http2:
+            print("HTTP/2 requested but the h2 package is missing; using HTTP/1.1")
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.write_timeout = write_timeout
+        self.pool_timeout = pool_timeout
+        self.warm_connections = warm_connections
+        self.warmup_timeout = warmup_timeout
+
+        self._clients: Dict[str, "httpx.Client"] = {}
+        self._lock = threading.Lock()
+
+    def client(self, name: str) -> "httpx.Client":
+        """The shared client for an upstream, created on first use."""
+        client = self._clients.get(name)
+        if client is None:
+            with self._lock:
+                client = self._clients.get(name)
+                if client is None:
+                    client = self._clients[name] = self._create()
+        return client
+
+    def _create(self) -> "httpx.Client":
+        import httpx
+
+        return httpx.Client(
+            timeout=httpx.Timeout(
+                connect=self.connect_timeout,
+                read=self.read_timeout,
+                write=self.write_timeout,
+                pool=self.pool_timeout,
+            ),
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive_connections,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            http2=self.http2,
+        )
+
+    def warm(self, name: str, url: str, headers: Optional[Dict[str, str]] = None) -> int:
+        """
+        Open connections to url ahead of real traffic (DNS, TCP, TLS and
+        the HTTP/2 handshake); returns how many requests got a response.
+        Blocking: call it from a thread. Failures are logged, not raised.
+        """
+        if self.warm_connections <= 0:
+            return 0
+        # HTTP/2 multiplexes, so a single connection is enough
+        count = 1 if self.http2 else min(self.warm_connections, self.max_keepalive_connections)
+
+        client = self.client(name)
+
+        def head():
+            try:
+                client.head(url, headers=headers, timeout=self.warmup_timeout)
+                return True
+            except Exception as e:
+                print(f"HTTP warmup for {name} failed:", e)
+                return False
+
+        # concurrent requests, so each one opens its own connection
+        with ThreadPoolExecutor(max_workers=count) as pool:
+            return sum(pool.map(lambda _: head(), range(count)))
+
+    def close(self):
+        with self._lock:
+            clients, self._clients = self._clients, {}
+        for name, client in clients.items():
+            try:
+                client.close()
+            except Exception as e:
+                print(f"Closing HTTP pool {name} failed:", e)
+
+
+http_pools = HttpPools(
+    max_connections=settings.HTTP_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.HTTP_MAX_KEEPALIVE_CONNECTIONS,
+    keepalive_expiry=settings.HTTP_KEEPALIVE_EXPIRY_SECONDS,
+    http2=settings.HTTP2_ENABLED,
+    connect_timeout=settings.HTTP_CONNECT_TIMEOUT_SECONDS,
+    read_timeout=settings.HTTP_READ_TIMEOUT_SECONDS,
+    write_timeout=settings.HTTP_WRITE_TIMEOUT_SECONDS,
+    pool_timeout=settings.HTTP_POOL_TIMEOUT_SECONDS,
+    warm_connections=settings.HTTP_WARMUP_CONNECTIONS,
+    warmup_timeout=settings.HTTP_WARMUP_TIMEOUT_SECONDS,
+)
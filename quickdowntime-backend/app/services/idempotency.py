@@ -0,0 +1,109 @@
+## app/services/idempotency.py
+
+import asyncio
+import os
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, Dict, Optional
+
+from app.config import settings
+from app.services.kv_store import PersistentLRU, SQLiteLease
+
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyStore(PersistentLRU):
+    """
+    Bounded dedup index for client retries.
+
+    Stored responses live in the in-memory LRU and are mirrored to SQLite,
+    so a retry arriving after a restart, or at another worker on the same
+    host, still gets the original response.
+    """
+
+    # how often a request waiting on another worker's lease checks for its response
+    LEASE_POLL_SECONDS = 0.2
+
+    def __init__(
+        self,
+        db_path: str,
+        max_entries: int = 10000,
+        ttl_seconds: int = 86400,
+        lease_seconds: float = 120.0,
+    ):
+        super().__init__(db_path, "idempotency_keys", max_entries, ttl_seconds)
+        self.lease = SQLiteLease(db_path, "idempotency_leases")
+        self.lease_seconds = lease_seconds
+        self._locks: Dict[str, asyncio.Lock] = {}
+        self._waiters: Dict[str, int] = {}
+
+        self.waited_for_other_worker = 0
+
+    @asynccontextmanager
+    async def guard(self, key: str):
+        """
+        Serialize concurrent requests carrying the same key, so a retry that
+        races the original waits for it and then sees its stored response.
+
+        Within a worker an asyncio.Lock orders them; across workers the key
+        is reserved with a lease in the shared SQLite file before the handler
+        runs. A request that finds the key reserved waits until the holder's
+        response is stored (or its lease runs out, if it crashed).
+        """
+        lock = self._locks.setdefault(key, asyncio.Lock())
+        self._waiters[key] = self._waiters.get(key, 0) + 1
+        try:
+            async with lock:
+                leased = False
+                if await self.aget(key) is None:
+                    leased = await asyncio.to_thread(self.lease.acquire, key, self.lease_seconds)
+                    while not leased:
+                        self.waited_for_other_worker += 1
+                        await asyncio.sleep(self.LEASE_POLL_SECONDS)
+                        if await self.aget(key) is not None:
+                            break
+                        leased = await asyncio.to_thread(self.lease.acquire, key, self.lease_seconds)
+                try:
+                    yield
+                finally:
+                    if leased:
+                        # the response must be on disk before another worker can take the key
+                        await asyncio.to_thread(self.flush)
+                        await asyncio.to_thread(self.lease.release, key)
+        finally:
+            self._waiters[key] -= 1
+            if self._waiters[key] == 0:
+                del self._waiters[key]
+                self._locks.pop(key, None)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**super().stats(), "waited_for_other_worker": self.waited_for_other_worker}
+
+
+def uuid_key(raw_key: Optional[str]) -> Optional[str]:
+    """
+    Canonical form of a client key that has to be a UUID, for endpoints
+    with no authenticated user to scope keys by. None when no key was
+    sent; raises ValueError for anything else that isn't a UUID.
+    """
+    if raw_key is None or not raw_key.strip():
+        return None
+    return str(uuid.UUID(raw_key.strip()))
+
+
+def scoped_key(raw_key: Optional[str], scope: Any) -> Optional[str]:
+    """Namespace a client-supplied key so two users can't collide."""
+    if not raw_key:
+        return None
+    raw_key = raw_key.strip()[:200]
+    if not raw_key:
+        return None
+    return f"{scope}:{raw_key}"
+
+
+idempotency_store = IdempotencyStore(
+    db_path=os.path.join(settings.DATA_DIR, "idempotency.sqlite3"),
+    max_entries=settings.IDEMPOTENCY_MAX_ENTRIES,
+    ttl_seconds=settings.IDEMPOTENCY_TTL_SECONDS,
+)
@@ -0,0 +1,283 @@
+## app/services/kv_store.py
+
+import asyncio
+import atexit
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Tuple
+
+
+_MISSING = object()
+
+
+class PersistentLRU:
+    """
+    Two-tier key/value store: an in-memory LRU (bounded by max_entries) in
+    front of a SQLite table, both expiring entries after ttl_seconds.
+
+    Values must be JSON-serializable. Reads fall through memory -> disk and
+    promote disk hits back into memory, so entries survive restarts.
+
+    Only the memory tier is touched inline. Writes are applied to SQLite
+    by a single writer thread (write-behind); until one lands, reads see it
+    from a pending map. Async code reads with aget(), which does the disk
+    read-through in a thread instead of on the event loop.
+    """
+
+    def __init__(self, db_path: str, table: str, max_entries: int = 10000, ttl_seconds: int = 86400):
+        self.db_path = db_path
+        self.table = table
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+
+        self._entries: "OrderedDict[str, Tuple[float, Any]]" = OrderedDict()
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+        # write-behind: key -> entry (None = delete) not yet on disk
+        self._pending: Dict[str, Optional[Tuple[float, Any]]] = {}
+        self._pending_lock = threading.Lock()
+        self._writes: "queue.Queue[tuple]" = queue.Queue()
+        self._writer: Optional[threading.Thread] = None
+
+        self.hits_memory = 0
+        self.hits_disk = 0
+        self.misses = 0
+
+    # -----------------------------------------------
+    # SQLite backing
+    # -----------------------------------------------
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " key TEXT PRIMARY KEY,"
+                " value TEXT NOT NULL,"
+                " created_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def _db_get(self, key: str) -> Optional[Tuple[float, Any]]:
+        try:
+            with self._db_lock:
+                row = self._db().execute(
+                    f"SELECT created_at, value FROM {self.table} WHERE key = ?",
+                    (key,),
+                ).fetchone()
+        except sqlite3.Error as e:
+            print(f"{self.table} read error:", e)
+            return None
+
+        if not row:
+            return None
+        return row[0], json.loads(row[1])
+
+    def _db_put(self, key: str, created_at: float, text: str):
+        try:
+            with self._db_lock:
+                conn = self._db()
+                conn.execute(
+                    f"INSERT OR REPLACE INTO {self.table} (key, value, created_at) VALUES (?, ?, ?)",
+                    (key, text, created_at),
+                )
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE created_at < ?",
+                    (created_at - self.ttl_seconds,),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"{self.table} write error:", e)
+
+    def _db_delete(self, key: str):
+        try:
+            with self._db_lock:
+                conn = self._db()
+                conn.execute(f"DELETE FROM {self.table} WHERE key = ?", (key,))
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"{self.table} delete error:", e)
+
+    # -----------------------------------------------
+    # Write-behind (one writer thread per store)
+    # -----------------------------------------------
+    def _write_behind(self, key: str, entry: Optional[Tuple[float, Any]], text: Optional[str] = None):
+        with self._pending_lock:
+            self._pending[key] = entry
+        self._writes.put((key, entry, text))
+
+        if self._writer is None:
+            with self._pending_lock:
+                if self._writer is None:
+                    self._writer = threading.Thread(
+                        target=self._write_loop, name=f"{self.table}-writer", daemon=True
+                    )
+                    self._writer.start()
+                    atexit.register(self.flush)
+
+    def _write_loop(self):
+        while True:
+            key, entry, text = self._writes.get()
+            try:
+                if entry is None:
+                    self._db_delete(key)
+                else:
+                    self._db_put(key, entry[0], text)
+            finally:
+                with self._pending_lock:
+                    # unless a newer write for the key is queued behind this one
+                    if self._pending.get(key, _MISSING) is entry:
+                        del self._pending[key]
+                self._writes.task_done()
+
+    def flush(self):
+        """Block until every queued write is on disk."""
+        if self._writer is not None:
+            self._writes.join()
+
+    def _read_through(self, key: str) -> Optional[Tuple[float, Any]]:
+        with self._pending_lock:
+            if key in self._pending:
+                return self._pending[key]
+        return self._db_get(key)
+
+    # -----------------------------------------------
+    # Public API
+    # -----------------------------------------------
+    def get(self, key: str, allow_expired: bool = False) -> Optional[Any]:
+        """
+        Return the stored value for key, or None if unseen/expired.
+        allow_expired returns a stale entry that hasn't been purged yet
+        (used as a last resort when the upstream is down). A memory miss
+        reads SQLite inline: from async code use aget().
+        """
+        entry = self._entries.get(key)
+        if entry is not None:
+            return self._found(key, entry, allow_expired, from_disk=False)
+        return self._found(key, self._read_through(key), allow_expired, from_disk=True)
+
+    async def aget(self, key: str, allow_expired: bool = False) -> Optional[Any]:
+        """get() for the event loop: memory inline, disk in a worker thread."""
+        entry = self._entries.get(key)
+        if entry is not None:
+            return self._found(key, entry, allow_expired, from_disk=False)
+        entry = await asyncio.to_thread(self._read_through, key)
+        return self._found(key, entry, allow_expired, from_disk=True)
+
+    def _found(
+        self, key: str, entry: Optional[Tuple[float, Any]], allow_expired: bool, from_disk: bool
+    ) -> Optional[Any]:
+        if entry is None:
+            self.misses += 1
+            return None
+        if from_disk:
+            self._remember(key, entry)
+
+        created_at, value = entry
+        if time.time() - created_at > self.ttl_seconds and not allow_expired:
+            self._entries.pop(key, None)
+            self.misses += 1
+            return None
+
+        if key in self._entries:
+            self._entries.move_to_end(key)
+        if from_disk:
+            self.hits_disk += 1
+        else:
+            self.hits_memory += 1
+        return value
+
+    def put(self, key: str, value: Any):
+        """Store in memory now; the SQLite write happens on the writer thread."""
+        entry = (time.time(), value)
+        self._remember(key, entry)
+        # serialise now, so later changes to value don't leak into the row
+        self._write_behind(key, entry, json.dumps(value, default=str))
+
+    def delete(self, key: str):
+        self._entries.pop(key, None)
+        self._write_behind(key, None)
+
+    def _remember(self, key: str, entry: Tuple[float, Any]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, Any]:
+        lookups = self.hits_memory + self.hits_disk + self.misses
+        hits = self.hits_memory + self.hits_disk
+        return {
+            "entries_in_memory": len(self._entries),
+            "pending_writes": len(self._pending),
+            "hits_memory": self.hits_memory,
+            "hits_disk": self.hits_disk,
+            "misses": self.misses,
+            "hit_rate": round(hits / lookups, 4) if lookups else 0.0,
+        }
+
+
+class SQLiteLease:
+    """
+    Named leases in a SQLite file shared by the workers on one host: at
+    most one owner holds a name until it releases it or the lease runs
+    out, so a crashed holder doesn't block the others for long.
+    """
+
+    def __init__(self, db_path: str, table: str = "leases"):
+        self.db_path = db_path
+        self.table = table
+        self.owner = f"{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._db_lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _db(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(self.db_path) or ".", exist_ok=True)
+            self._conn = sqlite3.connect(self.db_path, check_same_thread=False, timeout=5.0)
+            self._conn.execute(
+                f"CREATE TABLE IF NOT EXISTS {self.table} ("
+                " name TEXT PRIMARY KEY,"
+                " owner TEXT NOT NULL,"
+                " expires_at REAL NOT NULL)"
+            )
+            self._conn.commit()
+        return self._conn
+
+    def acquire(self, name: str, seconds: float) -> bool:
+        """Take or renew the lease; False while another owner holds it. Blocking."""
+        now = time.time()
+        try:
+            with self._db_lock:
+                conn = self._db()
+                cur = conn.execute(
+                    f"INSERT INTO {self.table} (name, owner, expires_at) VALUES (?, ?, ?)"
+                    " ON CONFLICT(name) DO UPDATE SET owner = excluded.owner, expires_at = excluded.expires_at"
+                    f" WHERE {self.table}.owner = excluded.owner OR {self.table}.expires_at < ?",
+                    (name, self.owner, now + seconds, now),
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            # can't coordinate: act alone rather than not at all
+            print(f"{self.table} lease error:", e)
+            return True
+        return cur.rowcount == 1
+
+    def release(self, name: str):
+        try:
+            with self._db_lock:
+                conn = self._db()
+                conn.execute(
+                    f"DELETE FROM {self.table} WHERE name = ? AND owner = ?", (name, self.owner)
+                )
+                conn.commit()
+        except sqlite3.Error as e:
+            print(f"{self.table} lease error:", e)
@@ -0,0 +1,257 @@
+## app/services/live_counters.py
+
+import asyncio
+import threading
+from datetime import datetime
+from typing import Any, Callable, Dict, Optional
+
+from app.config import supabase
+from app.services.websocket_manager import WebSocketManager, ws_manager
+
+
+KPI_DELTA = "kpi_delta"
+KPI_SNAPSHOT = "kpi_snapshot"
+
+# Counters that reset at midnight (UTC, same as /dashboard/kpis)
+TODAY_FIELDS = ("today_downtimes", "resolved_today", "high_priority")
+
+# PostgREST caps a response at 1000 rows; page through anything larger
+PAGE_SIZE = 1000
+
+
+def _today() -> str:
+    return datetime.utcnow().date().isoformat()
+
+
+def _is_today(timestamp: Optional[str], day: str) -> bool:
+    return bool(timestamp) and str(timestamp)[:10] == day
+
+
+class LiveCounters:
+    """
+    Dashboard counters kept in memory and pushed to clients as deltas, so
+    badges and KPI cards follow events instead of polling Supabase.
+
+    Counters are seeded from downtime_logs once, on first use, with exact
+    count queries (off the event loop). Changes are
+    published as kpi_delta broadcasts and applied when the broadcast is
+    delivered, so every worker behind the backplane applies each delta
+    exactly once. Clients get a kpi_snapshot when they connect and apply
+    deltas on top.
+    """
+
+    def __init__(self, manager: WebSocketManager):
+        self.manager = manager
+        self._lock = threading.Lock()
+        self.seeded = False
+        self.day = _today()
+        self.values: Dict[str, int] = {
+            "unseen_alerts": 0,
+            "open_downtimes": 0,
+            **{field: 0 for field in TODAY_FIELDS},
+        }
+        self.open_by_operator: Dict[str, int] = {}
+        self.deltas_published = 0
+        self.deltas_applied = 0
+        self.seed_errors = 0
+
+        manager.add_listener("managers", KPI_DELTA, self._apply)
+
+    # -----------------------------------------------
+    # Seeding
+    # -----------------------------------------------
+    @staticmethod
+    def _count(where: Callable[[Any], Any]) -> int:
+        """Exact row count of downtime_logs matching where(query); no rows fetched."""
+        query = supabase.table("downtime_logs").select("id", count="exact", head=True)
+        return where(query).execute().count or 0
+
+    @staticmethod
+    def _open_by_operator() -> Dict[str, int]:
+        counts: Dict[str, int] = {}
+        start = 0
+        while True:
+            res = (
+                supabase.table("downtime_logs")
+                .select("id, operator_id")
+                .eq("status", "open")
+                .order("id")
+                .range(start, start + PAGE_SIZE - 1)
+                .execute()
+            )
+            rows = res.data or []
+            for row in rows:
+                operator = row.get("operator_id")
+                if operator is not None:
+                    counts[str(operator)] = counts.get(str(operator), 0) + 1
+            if len(rows) < PAGE_SIZE:
+                return counts
+            start += PAGE_SIZE
+
+    def _seed(self):
+        """Count queries against downtime_logs (blocking); callers hold the lock."""
+        day = _today()
+        values = {
+            # like /dashboard/kpis, a row with seen unset counts as unseen
+            "unseen_alerts": self._count(lambda q: q.or_("seen.is.null,seen.eq.false")),
+            "open_downtimes": self._count(lambda q: q.eq("status", "open")),
+            "today_downtimes": self._count(lambda q: q.gte("created_at", day)),
+            "resolved_today": self._count(
+                lambda q: q.gte("created_at", day).not_.is_("resolved_at", "null")
+            ),
+            "high_priority": self._count(
+                lambda q: q.gte("created_at", day).eq("severity", "high")
+            ),
+        }
+
+        self.values = values
+        self.open_by_operator = self._open_by_operator()
+        self.day = day
+        self.seeded = True
+
+    def _ensure_seeded(self) -> bool:
+        if self.seeded:
+            return True
+        with self._lock:
+            if not self.seeded:
+                try:
+                    self._seed()
+                except Exception as e:
+                    self.seed_errors += 1
+                    print("Live counters seed failed:", e)
+        return self.seeded
+
+    def _roll_day(self):
+        day = _today()
+        if day != self.day:
+            self.day = day
+            for field in TODAY_FIELDS:
+                self.values[field] = 0
+
+    # -----------------------------------------------
+    # Snapshots (sent on connect)
+    # -----------------------------------------------
+    def snapshot(self, operator_id: Optional[str] = None) -> Optional[dict]:
+        """Current counters for one client; operators only see their own."""
+        if not self._ensure_seeded():
+            return None
+
+        with self._lock:
+            self._roll_day()
+            if operator_id is not None:
+                kpis = {"open_downtimes": self.open_by_operator.get(str(operator_id), 0)}
+            else:
+                kpis = dict(self.values)
+
+        return {"type": KPI_SNAPSHOT, "day": self.day, "kpis": kpis}
+
+    async def send_snapshot(self, websocket, operator_id: Optional[str] = None):
+        # the first snapshot seeds from Supabase: keep that off the event loop
+        if not self.seeded:
+            await asyncio.to_thread(self._ensure_seeded)
+        message = self.snapshot(operator_id)
+        if message is not None:
+            self.manager.send_to(websocket, message)
+
+    # -----------------------------------------------
+    # Applying deltas (on every worker, via the backplane)
+    # -----------------------------------------------
+    def _apply(self, message: dict):
+        if not self.seeded:
+            # the seed will read this change from the table
+            return
+
+        delta = message.get("delta") or {}
+        operator = message.get("operator_id")
+
+        with self._lock:
+            self._roll_day()
+            for field, change in delta.items():
+                if field not in self.values:
+                    continue
+                if field in TODAY_FIELDS and message.get("day") != self.day:
+                    continue
+                self.values[field] = max(0, self.values[field] + change)
+
+            if operator is not None and "open_downtimes" in delta:
+                key = str(operator)
+                count = max(0, self.open_by_operator.get(key, 0) + delta["open_downtimes"])
+                if count:
+                    self.open_by_operator[key] = count
+                else:
+                    self.open_by_operator.pop(key, None)
+
+            self.deltas_applied += 1
+
+    async def _publish(self, delta: Dict[str, int], operator_id: Optional[Any] = None):
+        delta = {field: change for field, change in delta.items() if change}
+        if not delta:
+            return
+
+        self.deltas_published += 1
+        message = {"type": KPI_DELTA, "day": _today(), "delta": delta}
+        if operator_id is not None:
+            message["operator_id"] = str(operator_id)
+
+        try:
+            await self.manager.broadcast_managers(message)
+
+            # operators are subscribed to their own operator_id, so the
+            # per-operator part only reaches that operator's sockets
+            if operator_id is not None and "open_downtimes" in delta:
+                await self.manager.broadcast_operators({
+                    "type": KPI_DELTA,
+                    "day": message["day"],
+                    "operator_id": message["operator_id"],
+                    "delta": {"open_downtimes": delta["open_downtimes"]},
+                })
+        except Exception as e:
+            print("KPI delta broadcast error:", e)
+
+    # -----------------------------------------------
+    # Events
+    # -----------------------------------------------
+    async def downtime_created(self, row: dict):
+        today = _is_today(row.get("created_at"), _today())
+        await self._publish(
+            {
+                "unseen_alerts": 0 if row.get("seen") else 1,
+                "open_downtimes": 1 if row.get("status", "open") == "open" else 0,
+                "today_downtimes": 1 if today else 0,
+                "high_priority": 1 if today and row.get("severity") == "high" else 0,
+            },
+            row.get("operator_id"),
+        )
+
+    async def downtime_resolved(self, row: dict):
+        """row is the resolved record as returned by the update."""
+        await self._publish(
+            {
+                "open_downtimes": -1,
+                "resolved_today": 1 if _is_today(row.get("created_at"), _today()) else 0,
+            },
+            row.get("operator_id"),
+        )
+
+    async def severity_changed(self, row: dict, old: Optional[str], new: Optional[str]):
+        if not _is_today(row.get("created_at"), _today()):
+            return
+        change = (new == "high") - (old == "high")
+        await self._publish({"high_priority": change})
+
+    async def alerts_seen(self, count: int):
+        await self._publish({"unseen_alerts": -count})
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "seeded": self.seeded,
+            "day": self.day,
+            **self.values,
+            "operators_with_open": len(self.open_by_operator),
+            "deltas_published": self.deltas_published,
+            "deltas_applied": self.deltas_applied,
+            "seed_errors": self.seed_errors,
+        }
+
+
+live_counters = LiveCounters(ws_manager)
@@ -0,0 +1,249 @@
+## app/services/local_classifier.py
+
+import asyncio
+import math
+import multiprocessing
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Optional
+
+from app.config import settings, supabase
+from app.services.text_features import hashed_features, hashed_token
+
+
+INPUT_FIELDS = ("reason", "category", "description")
+
+SEVERITIES = ("low", "medium", "high", "critical")
+
+# Laplace smoothing
+ALPHA = 1.0
+
+# downtime ids per ai_analysis lookup (they go in the query string)
+LABEL_CHUNK = 200
+
+
+def _features(row: Dict[str, Any]) -> Counter:
+    tf = hashed_features(row, INPUT_FIELDS)
+    tf[hashed_token("machine", row.get("machine_id"))] += 2
+    tf[hashed_token("category", row.get("category"))] += 1
+    return tf
+
+
+# -----------------------------------------------
+# Training (pure functions, run in a worker process)
+# -----------------------------------------------
+def _fit(samples: List[tuple], min_class_count: int) -> Optional[Dict[str, Any]]:
+    """Multinomial naive Bayes over hashed features. samples = [(features, label)]."""
+    label_counts = Counter(label for _, label in samples)
+    labels = {label for label, n in label_counts.items() if n >= min_class_count}
+    if len(labels) < 2:
+        return None
+
+    feature_counts: Dict[str, Counter] = defaultdict(Counter)
+    for tf, label in samples:
+        if label in labels:
+            feature_counts[label].update(tf)
+
+    vocab = set()
+    for counts in feature_counts.values():
+        vocab.update(counts)
+    vocab_size = max(1, len(vocab))
+
+    total = sum(label_counts[label] for label in labels)
+    classes = {}
+    for label in labels:
+        counts = feature_counts[label]
+        denom = sum(counts.values()) + ALPHA * vocab_size
+        classes[label] = {
+            "prior": math.log(label_counts[label] / total),
+            "log_probs": {f: math.log((c + ALPHA) / denom) for f, c in counts.items()},
+            "unseen": math.log(ALPHA / denom),
+        }
+    return {"classes": classes, "samples": total}
+
+
+def train_model(rows: List[Dict[str, Any]], min_class_count: int = 3) -> Dict[str, Any]:
+    """Build severity and root-cause models from labelled downtime rows."""
+    severity_samples = []
+    cause_samples = []
+
+    for row in rows:
+        tf = _features(row)
+        severity = str(row.get("severity") or "").strip().lower()
+        if severity in SEVERITIES:
+            severity_samples.append((tf, severity))
+        cause = str(row.get("root_cause") or "").strip()
+        if cause:
+            cause_samples.append((tf, cause))
+
+    return {
+        "severity": _fit(severity_samples, min_class_count),
+        "root_cause": _fit(cause_samples, min_class_count),
+        "trained_at": time.time(),
+        "rows": len(rows),
+    }
+
+
+def _predict(model: Optional[Dict[str, Any]], tf: Counter) -> Optional[tuple]:
+    if not model:
+        return None
+
+    scores = {}
+    for label, params in model["classes"].items():
+        log_probs = params["log_probs"]
+        unseen = params["unseen"]
+        scores[label] = params["prior"] + sum(
+            count * log_probs.get(f, unseen) for f, count in tf.items()
+        )
+
+    best = max(scores, key=scores.get)
+    # softmax probability of the winner
+    top = scores[best]
+    confidence = 1.0 / sum(math.exp(s - top) for s in scores.values())
+    return best, confidence
+
+
+class LocalClassifier:
+    """
+    In-process fast path for severity / root cause, trained on our own
+    resolved downtimes. Predictions are provisional; the LLM refines them.
+
+    Labels come from the ai_analysis rows, never from downtime_logs: there
+    severity / root_cause may still be this classifier's own guess (when
+    the LLM refinement failed), and training on those would reinforce its
+    mistakes.
+    """
+
+    def __init__(self, min_confidence: float = 0.5, retrain_seconds: int = 3600):
+        self.min_confidence = min_confidence
+        self.retrain_seconds = retrain_seconds
+        self.model: Optional[Dict[str, Any]] = None
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._task: Optional[asyncio.Task] = None
+
+        self.predictions = 0
+        self.last_error: Optional[str] = None
+
+    def predict(self, event: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        """
+        Return {"severity", "root_cause", "confidence"} or None if no model is
+        trained yet. root_cause is None when the model isn't confident enough.
+        """
+        model = self.model
+        if model is None or model.get("severity") is None:
+            return None
+
+        tf = _features(event)
+        severity, severity_conf = _predict(model["severity"], tf)
+        cause = _predict(model.get("root_cause"), tf)
+
+        root_cause = None
+        cause_conf = 0.0
+        if cause is not None and cause[1] >= self.min_confidence:
+            root_cause, cause_conf = cause
+
+        self.predictions += 1
+        return {
+            "severity": severity,
+            "root_cause": root_cause,
+            "confidence": round(100 * (cause_conf if root_cause else severity_conf), 1),
+        }
+
+    # -----------------------------------------------
+    # Background retraining
+    # -----------------------------------------------
+    def _fetch_training_rows(self) -> List[Dict[str, Any]]:
+        """Resolved downtimes labelled with their LLM analysis (unanalysed ones are skipped)."""
+        # imported here: the training process imports this module and
+        # shouldn't build an AI engine
+        from app.services.ai_engine import FAILED_ROOT_CAUSES
+
+        events = (
+            supabase.table("downtime_logs")
+            .select("id, machine_id, reason, category, description")
+            .eq("status", "resolved")
+            .order("created_at", desc=True)
+            .limit(settings.LOCAL_CLASSIFIER_TRAINING_ROWS)
+            .execute()
+        ).data or []
+
+        labels: Dict[Any, Dict[str, Any]] = {}
+        ids = [event["id"] for event in events]
+        for start in range(0, len(ids), LABEL_CHUNK):
+            analyses = (
+                supabase.table("ai_analysis")
+                .select("downtime_id, severity, root_cause")
+                .in_("downtime_id", ids[start:start + LABEL_CHUNK])
+                .order("id")
+                .execute()
+            ).data or []
+            # ascending id: the latest analysis of a downtime wins
+            for analysis in analyses:
+                if analysis.get("root_cause") not in FAILED_ROOT_CAUSES:
+                    labels[analysis["downtime_id"]] = analysis
+
+        rows = []
+        for event in events:
+            label = labels.get(event["id"])
+            if label is not None:
+                rows.append({
+                    **event,
+                    "severity": label.get("severity"),
+                    "root_cause": label.get("root_cause"),
+                })
+        return rows
+
+    async def retrain(self):
+        rows = await asyncio.to_thread(self._fetch_training_rows)
+
+        if self._executor is None:
+            # spawn, not fork: forking a process that runs an event loop and
+            # HTTP pool threads can copy held locks into the child
+            self._executor = ProcessPoolExecutor(
+                max_workers=1, mp_context=multiprocessing.get_context("spawn")
+            )
+
+        loop = asyncio.get_running_loop()
+        self.model = await loop.run_in_executor(
+            self._executor, train_model, rows, settings.LOCAL_CLASSIFIER_MIN_CLASS_COUNT
+        )
+
+    async def _retrain_loop(self):
+        while True:
+            try:
+                await self.retrain()
+                self.last_error = None
+            except Exception as e:
+                self.last_error = str(e)
+                print("Local classifier retrain failed:", e)
+            await asyncio.sleep(self.retrain_seconds)
+
+    def start(self):
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._retrain_loop())
+
+    def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> Dict[str, Any]:
+        model = self.model or {}
+        return {
+            "trained": model.get("severity") is not None,
+            "trained_at": model.get("trained_at"),
+            "training_rows": model.get("rows", 0),
+            "root_cause_classes": len((model.get("root_cause") or {}).get("classes", {})),
+            "predictions": self.predictions,
+            "last_error": self.last_error,
+        }
+
+
+local_classifier = LocalClassifier(
+    min_confidence=settings.LOCAL_CLASSIFIER_MIN_CONFIDENCE,
+    retrain_seconds=settings.LOCAL_CLASSIFIER_RETRAIN_SECONDS,
+)
@@ -0,0 +1,247 @@
+## app/services/model_backends.py
+
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from typing import Iterator, List
+
+from app.config import settings
+
+
+class ModelBackend:
+    """
+    What AIEngine needs from a text model: a blocking generate() and a
+    blocking stream() of text chunks. Both run on the AI thread pool.
+    """
+
+    name = "base"
+
+    def __init__(self, model_name: str):
+        self.model_name = model_name
+
+    def generate(self, prompt: str) -> str:
+        raise NotImplementedError
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        yield self.generate(prompt)
+
+
+# -----------------------------------------------
+# Gemini (production)
+# -----------------------------------------------
+class GeminiBackend(ModelBackend):
+    name = "gemini"
+
+    def __init__(self, model_name: str, api_key: str = ""):
+        super().__init__(model_name)
+        self.api_key = api_key
+        self._genai = None
+        self.model = None
+        self._lock = threading.Lock()
+
+    def _client(self):
+        """Import and configure the SDK on the first call, not at app import."""
+        if self._genai is None:
+            with self._lock:
+                if self._genai is None:
+                    # Imported here so the local stand-in runs without the SDK
+                    import google.generativeai as genai
+
+                    genai.configure(api_key=self.api_key)
+                    try:
+                        self.model = genai.GenerativeModel(self.model_name)
+                    except Exception:
+                        self.model = None
+                    self._genai = genai
+        return self._genai
+
+    def generate(self, prompt: str) -> str:
+        genai = self._client()
+        if self.model:
+            return self.model.generate_content(prompt).text
+        return genai.generate_text(model=self.model_name, prompt=prompt).text
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        self._client()
+        if self.model:
+            for chunk in self.model.generate_content(prompt, stream=True):
+                text = getattr(chunk, "text", "")
+                if text:
+                    yield text
+            return
+        yield self.generate(prompt)
+
+
+# -----------------------------------------------
+# Local stand-in (benchmarks, load tests, offline dev)
+# -----------------------------------------------
+_BATCH_COUNT = re.compile(r"exactly (\d+) objects")
+
+_CAUSES = [
+    "Bearing wear on main drive",
+    "Hydraulic seal degradation",
+    "Loose sensor connector",
+    "Conveyor belt misalignment",
+    "Supply voltage sag",
+    "Lubrication starvation",
+]
+
+_ACTIONS = [
+    "Isolate and lock out the affected unit",
+    "Inspect and replace worn components",
+    "Verify sensor wiring and connectors",
+    "Check lubrication levels and flow",
+    "Review drive current trends for the last shift",
+    "Re-align and re-tension the conveyor",
+]
+
+_MEASURES = [
+    "Add the component to the weekly inspection round",
+    "Install condition monitoring on the drive",
+    "Stock critical spares at the line",
+    "Schedule vibration analysis every two weeks",
+    "Train operators on early warning signs",
+]
+
+_SUMMARY_SENTENCES = [
+    "Downtime is concentrated on a small number of machines.",
+    "Mechanical and electrical faults dominate the period.",
+    "Repeat incidents point to unresolved root causes.",
+    "Preventive maintenance on the top machines would recover the most time.",
+    "Open incidents should be triaged by duration before the next shift.",
+]
+
+SEVERITIES = ("low", "medium", "high", "critical")
+
+
+class LocalModelBackend(ModelBackend):
+    """
+    Deterministic offline stand-in for the hosted model.
+
+    Answers are derived from a hash of the prompt, so the same prompt always
+    gets the same answer, and follow the shape the prompt asks for (single
+    JSON object, JSON array for batch prompts, plain text for summaries).
+    Latency is latency_ms +/- jitter_ms; failure_rate is the probability a
+    call raises. output_chars pads answers to roughly that size. Latency
+    and failures come from a seeded RNG, so runs are reproducible.
+    """
+
+    name = "local"
+
+    # Share of the latency spent before the first streamed chunk
+    STREAM_TTFT_FRACTION = 0.25
+    STREAM_CHUNK_CHARS = 48
+
+    def __init__(
+        self,
+        latency_ms: float = 800.0,
+        jitter_ms: float = 200.0,
+        failure_rate: float = 0.0,
+        output_chars: int = 600,
+        seed: int = 0,
+    ):
+        super().__init__("local-standin")
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+        self.output_chars = output_chars
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+        self.calls = 0
+        self.failures = 0
+
+    def _draw(self) -> tuple:
+        """(latency seconds, should fail) for the next call."""
+        with self._lock:
+            self.calls += 1
+            jitter = self._rng.uniform(-self.jitter_ms, self.jitter_ms) if self.jitter_ms else 0.0
+            fail = self._rng.random() < self.failure_rate
+            if fail:
+                self.failures += 1
+        return max(0.0, self.latency_ms + jitter) / 1000, fail
+
+    def _answer(self, prompt: str) -> str:
+        digest = hashlib.sha256(prompt.encode("utf-8")).digest()
+
+        match = _BATCH_COUNT.search(prompt)
+        if match:
+            count = int(match.group(1))
+            return json.dumps([
+                {"index": idx, **self._analysis(digest, idx)} for idx in range(count)
+            ])
+        if "Return EXACT JSON format" in prompt:
+            return json.dumps(self._analysis(digest, 0))
+        return self._summary(digest)
+
+    def _pick(self, options: List[str], digest: bytes, offset: int, count: int) -> List[str]:
+        start = digest[offset % len(digest)]
+        return [options[(start + i) % len(options)] for i in range(count)]
+
+    def _analysis(self, digest: bytes, idx: int) -> dict:
+        base = digest[idx % len(digest)]
+        result = {
+            "root_cause": _CAUSES[base % len(_CAUSES)],
+            "is_maintenance_required": base % 3 != 0,
+            "recommended_actions": self._pick(_ACTIONS, digest, idx + 1, 2),
+            "preventive_measures": self._pick(_MEASURES, digest, idx + 2, 2),
+            "severity": SEVERITIES[base % len(SEVERITIES)],
+            "predicted_next_failure": f"within {7 + base % 60} days",
+            "confidence_score": 50 + base % 50,
+        }
+
+        # Pad with more actions until the answer reaches output_chars
+        n = 2
+        while len(json.dumps(result)) < self.output_chars and n < 50:
+            n += 1
+            result["recommended_actions"] = self._pick(_ACTIONS, digest, idx + 1, n)
+        return result
+
+    def _summary(self, digest: bytes) -> str:
+        sentences = []
+        i = 0
+        while sum(len(s) + 1 for s in sentences) < self.output_chars:
+            sentences.append(self._pick(_SUMMARY_SENTENCES, digest, i, 1)[0])
+            i += 1
+        return " ".join(sentences)
+
+    def generate(self, prompt: str) -> str:
+        delay, fail = self._draw()
+        time.sleep(delay)
+        if fail:
+            raise RuntimeError("Local stand-in model failure")
+        return self._answer(prompt)
+
+    def stream(self, prompt: str) -> Iterator[str]:
+        delay, fail = self._draw()
+        text = self._answer(prompt)
+        chunks = [
+            text[i:i + self.STREAM_CHUNK_CHARS]
+            for i in range(0, len(text), self.STREAM_CHUNK_CHARS)
+        ] or [""]
+
+        time.sleep(delay * self.STREAM_TTFT_FRACTION)
+        if fail:
+            raise RuntimeError("Local stand-in model failure")
+
+        per_chunk = delay * (1 - self.STREAM_TTFT_FRACTION) / len(chunks)
+        for i, chunk in enumerate(chunks):
+            if i:
+                time.sleep(per_chunk)
+            yield chunk
+
+
+def create_backend(model_name: str) -> ModelBackend:
+    """Backend selected by AI_BACKEND ("gemini" or "local")."""
+    if settings.AI_BACKEND == "local":
+        return LocalModelBackend(
+            latency_ms=settings.AI_STANDIN_LATENCY_MS,
+            jitter_ms=settings.AI_STANDIN_JITTER_MS,
+            failure_rate=settings.AI_STANDIN_FAILURE_RATE,
+            output_chars=settings.AI_STANDIN_OUTPUT_CHARS,
+            seed=settings.AI_STANDIN_SEED,
+        )
+    return GeminiBackend(model_name, api_key=settings.GEMINI_API_KEY)
@@ -0,0 +1,111 @@
+## app/services/prompt_compaction.py
+
+import json
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+
+# Only what the model needs to reason about a downtime. Media paths,
+# emails, ids and bookkeeping timestamps are dropped.
+EVENT_FIELDS = (
+    "machine_id",
+    "reason",
+    "category",
+    "sub_category",
+    "description",
+    "severity",
+    "root_cause",
+    "status",
+    "duration_minutes",
+)
+
+# Recent incidents on the same machine that are listed individually
+RECENT_SAME_MACHINE = 5
+
+TOP_N = 5
+
+MAX_DESCRIPTION_CHARS = 160
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (~4 chars per token for English/JSON)."""
+    return (len(text) + 3) // 4
+
+
+def compact_json(value: Any) -> str:
+    return json.dumps(value, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def project_event(event: Dict[str, Any]) -> Dict[str, Any]:
+    """Keep only analysis-relevant, non-empty fields."""
+    out = {}
+    for field in EVENT_FIELDS:
+        value = event.get(field)
+        if value in (None, "", "unknown", "Unknown"):
+            continue
+        if field == "description" and isinstance(value, str) and len(value) > MAX_DESCRIPTION_CHARS:
+            value = value[:MAX_DESCRIPTION_CHARS] + "…"
+        out[field] = value
+    return out
+
+
+def _incident_line(row: Dict[str, Any]) -> str:
+    parts = [str(row.get("reason") or "?")]
+    if row.get("root_cause"):
+        parts.append(f"cause={row['root_cause']}")
+    if row.get("severity"):
+        parts.append(f"sev={row['severity']}")
+    if row.get("duration_minutes"):
+        parts.append(f"{row['duration_minutes']}min")
+    return "- " + " | ".join(parts)
+
+
+def summarize_history(
+    event: Dict[str, Any],
+    history: List[Dict[str, Any]],
+    budget_tokens: Optional[int] = None,
+) -> str:
+    """
+    Aggregate history into frequency summaries instead of raw rows:
+    - incidents per machine (plant-wide)
+    - causes on this machine
+    - the last few incidents on this machine, one line each
+
+    Lines are dropped from the end until the block fits budget_tokens.
+    """
+    machine = event.get("machine_id")
+    event_id = event.get("id")
+    rows = [r for r in history if r.get("id") is None or r.get("id") != event_id]
+
+    if not rows:
+        return "(no history)"
+
+    per_machine = Counter(r.get("machine_id") or "Unknown" for r in rows)
+    same_machine = [r for r in rows if r.get("machine_id") == machine]
+    per_cause = Counter(
+        r.get("root_cause") or r.get("reason") or "Unknown" for r in same_machine
+    )
+
+    lines = [f"{len(rows)} past incidents; {len(same_machine)} on {machine}."]
+
+    if per_cause:
+        lines.append(f"Causes on {machine}: " + ", ".join(
+            f"{cause} x{count}" for cause, count in per_cause.most_common(TOP_N)
+        ))
+
+    lines.append("Incidents per machine: " + ", ".join(
+        f"{m} x{count}" for m, count in per_machine.most_common(TOP_N)
+    ))
+
+    if same_machine:
+        lines.append(f"Recent on {machine}:")
+        lines.extend(_incident_line(r) for r in same_machine[:RECENT_SAME_MACHINE])
+
+    text = "\n".join(lines)
+    if budget_tokens is not None:
+        while len(lines) > 1 and estimate_tokens(text) > budget_tokens:
+            lines.pop()
+            if lines[-1].endswith(":"):
+                lines.pop()
+            text = "\n".join(lines)
+    return text
@@ -0,0 +1,35 @@
+## app/services/text_features.py
+
+import re
+import zlib
+from collections import Counter
+from typing import Any, Dict, Iterable
+
+
+# Hashed feature space (word unigrams + bigrams)
+N_FEATURES = 1 << 18
+
+STOPWORDS = {
+    "the", "a", "an", "and", "or", "of", "on", "in", "at", "to", "for",
+    "by", "is", "was", "with", "near", "from", "it", "be", "this", "that",
+}
+
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+def _hash(gram: str) -> int:
+    return zlib.crc32(gram.encode("utf-8")) % N_FEATURES
+
+
+def hashed_features(row: Dict[str, Any], fields: Iterable[str]) -> Counter:
+    """Term counts of hashed word uni/bi-grams over the given row fields."""
+    text = " ".join(str(row.get(f) or "") for f in fields).lower()
+    words = [w for w in _TOKEN_RE.findall(text) if len(w) > 1 and w not in STOPWORDS]
+
+    grams = words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+    return Counter(_hash(g) for g in grams)
+
+
+def hashed_token(prefix: str, value: Any) -> int:
+    """Single categorical feature, e.g. hashed_token("machine", "Plate Mill")."""
+    return _hash(f"{prefix}={str(value or '').strip().lower()}")
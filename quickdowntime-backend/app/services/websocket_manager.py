@@ -1,105 +1,790 @@
 
 ## app/service/websocket_manager.py
 
-from typing import List, Dict
-from fastapi import WebSocket
+import asyncio
+import json
+import math
+import os
+import random
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Dict, Iterable, List, Optional, Set, Union
+from fastapi import WebSocket, WebSocketDisconnect
+
+from app.config import settings
+from app.services.ws_backplane import Backplane, InProcessBackplane, create_backplane
+from app.services.ws_codecs import JSON_TEXT, Codec, build_codecs, negotiate
+from app.services.ws_topics import Subscription, TopicIndex, message_topics
+
+try:
+    import orjson
+except ImportError:  # optional, falls back to the stdlib encoder
+    orjson = None
+
+
+DROP_OLDEST = "drop_oldest"
+COALESCE = "coalesce"
+DISCONNECT = "disconnect"
+
+# Backplane target for manager-to-manager commands (never sent to sockets)
+CONTROL = "_control"
+
+
+def encode_message(message: dict) -> str:
+    """JSON text frame for a message, encoded the same way as send_json."""
+    if orjson is not None:
+        return orjson.dumps(message, default=str).decode("utf-8")
+    return json.dumps(message, separators=(",", ":"), ensure_ascii=False, default=str)
+
+
+def _stamp(frame: str, seq: int) -> str:
+    """Prefix an encoded JSON object with its sequence number."""
+    if frame == "{}":
+        return f'{{"seq":{seq}}}'
+    return f'{{"seq":{seq},' + frame[1:]
+
+
+def _batch(frames: List[str]) -> str:
+    """One frame carrying several already-encoded (and stamped) messages."""
+    return '{"type":"batch","events":[' + ",".join(frames) + "]}"
+
+
+def _audience(kind: str, name: str) -> str:
+    return f"channel:{name}" if kind == "channel" else name
+
+
+def _coalesce_key(message: dict) -> Optional[tuple]:
+    """Messages about the same record supersede each other while queued."""
+    if message.get("id") is None:
+        return None
+    return (message.get("type"), message.get("id"))
+
+
+class _Outbox:
+    """
+    Bounded outbound queue for one socket, drained by its own writer task
+    so a slow client only ever delays itself.
+    """
+
+    def __init__(self, websocket: WebSocket, manager: "WebSocketManager", codec: Codec = JSON_TEXT):
+        self.websocket = websocket
+        self.manager = manager
+        self.codec = codec
+        self.queue: deque = deque()
+        # future the idle writer sleeps on; a bare future is much cheaper
+        # per broadcast than an asyncio.Event at thousands of sockets
+        self._wakeup: Optional[asyncio.Future] = None
+        self.dropped = 0
+        self.coalesced = 0
+        self.sent = 0
+        self.bytes_sent = 0
+        self.sending_since: Optional[float] = None
+        # keepalive: last frame received from the client / last ping sent
+        self.last_seen = time.monotonic()
+        self.last_ping = self.last_seen
+        self.task = asyncio.create_task(self._writer())
+
+    def send(self, frame: str, key: Optional[tuple] = None) -> bool:
+        """Encode a JSON frame for this socket's codec and enqueue it."""
+        return self.push(self.codec.encode(frame), key)
+
+    def push(self, frame: Union[str, bytes], key: Optional[tuple]) -> bool:
+        """
+        Enqueue a frame already encoded for this socket's codec, without
+        blocking. key is the coalesce key of the message. False means the
+        socket should be dropped.
+        """
+        manager = self.manager
+
+        if len(self.queue) >= manager.queue_size:
+            if manager.overflow_policy == DISCONNECT:
+                return False
+
+            if manager.overflow_policy == COALESCE:
+                if key is not None:
+                    for idx, (queued_key, _) in enumerate(self.queue):
+                        if queued_key == key:
+                            del self.queue[idx]
+                            self.coalesced += 1
+                            break
+
+            # drop_oldest, and coalesce when nothing matched
+            if len(self.queue) >= manager.queue_size:
+                self.queue.popleft()
+                self.dropped += 1
+
+        self.queue.append((key, frame))
+        wakeup = self._wakeup
+        if wakeup is not None:
+            self._wakeup = None
+            if not wakeup.done():
+                wakeup.set_result(None)
+        return True
+
+    async def _writer(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            if not self.queue:
+                self._wakeup = loop.create_future()
+                await self._wakeup
+            while self.queue:
+                _, frame = self.queue.popleft()
+                # Stalls are caught by the manager's watchdog; a timer per
+                # frame would cost more than the send itself
+                self.sending_since = time.monotonic()
+                try:
+                    if isinstance(frame, str):
+                        await self.websocket.send_text(frame)
+                    else:
+                        await self.websocket.send_bytes(frame)
+                    self.sent += 1
+                    self.bytes_sent += len(frame)
+                    self.sending_since = None
+                except Exception:
+                    # Dead or stalled client: stop writing to it
+                    self.manager.evict(self.websocket)
+                    return
+
+    def close(self):
+        if self.task is not asyncio.current_task():
+            self.task.cancel()
+        self.queue.clear()
 
 
 class WebSocketManager:
-    def __init__(self):
+    def __init__(
+        self,
+        queue_size: int = 256,
+        overflow_policy: str = DROP_OLDEST,
+        send_timeout: float = 10.0,
+        backplane: Optional[Backplane] = None,
+        replay_size: int = 500,
+        ping_interval: float = 25.0,
+        idle_timeout: float = 0.0,
+        coalesce_window: float = 0.0,
+        codecs: Optional[Dict[str, Codec]] = None,
+        drain_seconds: float = 5.0,
+        drain_spread: float = 20.0,
+    ):
         # Global connections (old behavior)
-        self.active_connections: List[WebSocket] = []
+        self.active_connections: Set[WebSocket] = set()
 
         # Role-based connections
-        self.managers: List[WebSocket] = []
-        self.operators: List[WebSocket] = []
+        self.managers: Set[WebSocket] = set()
+        self.operators: Set[WebSocket] = set()
+
+        # Channel-based (machine-specific); empty channels are dropped
+        self.channels: Dict[str, Set[WebSocket]] = {}
+
+        # Reverse index: socket -> the groups / channels it belongs to, so
+        # disconnect only touches those
+        self._groups = {
+            "all": self.active_connections,
+            "managers": self.managers,
+            "operators": self.operators,
+        }
+        self._memberships: Dict[WebSocket, Set[tuple]] = {}
+
+        # Delivery index per audience, honouring per-socket filters
+        self._indexes: Dict[str, TopicIndex] = {}
+
+        # Outbound queue per socket
+        self.queue_size = max(1, queue_size)
+        self.overflow_policy = overflow_policy
+        self.send_timeout = send_timeout
+        self._outboxes: Dict[WebSocket, _Outbox] = {}
+        self.overflow_disconnects = 0
+        self.frames_encoded = 0
+        self.stalled_disconnects = 0
+        self._watchdog: Optional[asyncio.Task] = None
+
+        # Keepalive: half-open sockets never fail a send on their own, so
+        # quiet ones are pinged and dropped after idle_timeout (0 = off)
+        self.ping_interval = ping_interval
+        self.idle_timeout = idle_timeout
+        self.pings_sent = 0
+        self.idle_disconnects = 0
+
+        # Burst coalescing: the first broadcast to an audience goes out at
+        # once and opens a window; anything else for that audience during
+        # the window is sent as one batch frame when it closes
+        self.coalesce_window = coalesce_window
+        self._pending: Dict[str, list] = {}
+        self._flush_timers: Dict[str, asyncio.TimerHandle] = {}
+        self.batches_sent = 0
+        self.events_batched = 0
+
+        # Every delivered frame is stamped with a per-audience sequence number
+        # and kept in a ring buffer so reconnecting clients can catch up.
+        # The epoch changes on restart; a client from another epoch resyncs.
+        self.epoch = uuid.uuid4().hex[:12]
+        self.replay_size = max(0, replay_size)
+        self._seq: Dict[str, int] = {}
+        self._replay: Dict[str, deque] = {}
+        self.replayed = 0
+        self.resyncs = 0
+        self.loss_resyncs = 0
+        self._loss_resync_at = 0.0
+
+        # (target, message type) -> callbacks run on every delivery, so
+        # in-memory state derived from broadcasts stays in step on all workers
+        self._listeners: Dict[tuple, List[Callable[[dict], None]]] = {}
+
+        # Wire encodings clients can negotiate (Sec-WebSocket-Protocol);
+        # everyone else gets JSON text
+        self.codecs = codecs if codecs is not None else build_codecs()
+        self.frames_transcoded = 0
+
+        # Graceful drain on deploy: close in waves and hand each client a
+        # different reconnect delay, so they don't all hit the next instance
+        # at once. New sockets are turned away until _drain_until, so a
+        # worker that isn't stopped after all starts accepting again.
+        self.drain_seconds = drain_seconds
+        self.drain_spread = drain_spread
+        self._drain_until = 0.0
+        self.drained = 0
+        self.drain_requests = 0
+        self._drain_task: Optional[asyncio.Task] = None
+
+        # Broadcasts go through the backplane so every worker fans them out
+        self.backplane = backplane or InProcessBackplane()
+        self.backplane.attach(self._deliver, self._on_backplane_loss)
+
+    @property
+    def draining(self) -> bool:
+        return time.monotonic() < self._drain_until
+
+    async def start(self):
+        await self.backplane.start()
+
+    async def stop(self):
+        for timer in self._flush_timers.values():
+            timer.cancel()
+        self._flush_timers.clear()
+        self._pending.clear()
+        await self.backplane.stop()
+
+    async def _accept(self, websocket: WebSocket):
+        """Accept the handshake, agreeing on a wire encoding if offered."""
+        offered = getattr(websocket, "scope", {}).get("subprotocols")
+        subprotocol = negotiate(offered, self.codecs)
+        if subprotocol is None:
+            await websocket.accept()
+            self._open_outbox(websocket)
+        else:
+            await websocket.accept(subprotocol=subprotocol)
+            self._open_outbox(websocket, self.codecs[subprotocol])
+
+    def _open_outbox(self, websocket: WebSocket, codec: Codec = JSON_TEXT):
+        if websocket not in self._outboxes:
+            self._outboxes[websocket] = _Outbox(websocket, self, codec)
+        if self._watchdog is None or self._watchdog.done():
+            self._watchdog = asyncio.create_task(self._watch_connections())
+
+    async def _watch_connections(self):
+        """
+        Evict sockets whose current send has taken longer than send_timeout
+        or that have been silent for idle_timeout; ping the quiet ones.
+        """
+        tick = self.send_timeout / 2
+        if self.idle_timeout:
+            tick = min(tick, self.ping_interval / 2)
+
+        while self._outboxes:
+            await asyncio.sleep(tick)
+            now = time.monotonic()
+            stalled = now - self.send_timeout
+            for websocket, outbox in list(self._outboxes.items()):
+                if outbox.sending_since is not None and outbox.sending_since < stalled:
+                    self.stalled_disconnects += 1
+                    self.evict(websocket)
+                    continue
+
+                if not self.idle_timeout:
+                    continue
+                if now - outbox.last_seen > self.idle_timeout:
+                    self.idle_disconnects += 1
+                    self.evict(websocket, code=1001)
+                elif now - max(outbox.last_seen, outbox.last_ping) >= self.ping_interval:
+                    outbox.last_ping = now
+                    self.pings_sent += 1
+                    outbox.send(encode_message({"type": "ping"}))
+
+    async def listen(self, websocket: WebSocket):
+        """
+        Read from a connected socket until it goes away, answering client
+        pings and recording activity for the idle check. Disconnects it on
+        the way out.
+        """
+        try:
+            while True:
+                text = await websocket.receive_text()
+                outbox = self._outboxes.get(websocket)
+                if outbox is None:
+                    # evicted while we were waiting
+                    return
+                outbox.last_seen = time.monotonic()
+
+                if '"ping"' in text:
+                    try:
+                        message = json.loads(text)
+                    except ValueError:
+                        continue
+                    if isinstance(message, dict) and message.get("type") == "ping":
+                        outbox.send(encode_message({"type": "pong", "ts": message.get("ts")}))
+        except WebSocketDisconnect:
+            pass
+        except Exception as e:
+            # receive after we closed it ourselves is expected; anything else isn't
+            if websocket in self._outboxes:
+                print("WS receive error:", e)
+        finally:
+            self.disconnect(websocket)
+
+    def _join(
+        self,
+        websocket: WebSocket,
+        kind: str,
+        name: str,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
+        subscription: Optional[Subscription] = None,
+    ):
+        if kind == "channel":
+            self.channels.setdefault(name, set()).add(websocket)
+        else:
+            self._groups[name].add(websocket)
+        self._memberships.setdefault(websocket, set()).add((kind, name))
+        self._indexes.setdefault(_audience(kind, name), TopicIndex()).add(websocket, subscription)
+        self._open_outbox(websocket)
 
-        # Channel-based (machine-specific)
-        self.channels: Dict[str, List[WebSocket]] = {}
+        # Same event-loop step as the join, so nothing falls between the
+        # replay and the first live frame
+        self._catch_up(websocket, _audience(kind, name), last_seq, epoch)
+
+        if self.draining:
+            # shutting down: send it on to another instance after a pause
+            retry_ms = int(random.uniform(0, self.drain_spread) * 1000)
+            self.evict(websocket, code=1012, reason=f"retry={retry_ms}")
+
+    def _catch_up(self, websocket: WebSocket, audience: str, last_seq: Optional[int], epoch: Optional[str]):
+        """
+        Send hello with the current position, then either the missed frames
+        or a resync notice when they are no longer buffered.
+        """
+        outbox = self._outboxes[websocket]
+        # frames still waiting in a coalescing window reach this socket when
+        # the window closes, so they are neither counted nor replayed here
+        current = self._seq.get(audience, 0) - len(self._pending.get(audience) or ())
+        outbox.send(encode_message({
+            "type": "hello", "epoch": self.epoch, "seq": current, "encoding": outbox.codec.name,
+        }))
+
+        if last_seq is None or last_seq >= current and epoch == self.epoch:
+            return
+
+        buffer = self._replay.get(audience) or ()
+        oldest = buffer[0][0] if buffer else current + 1
+        missed = current - last_seq
+        if epoch != self.epoch or last_seq < 0 or oldest > last_seq + 1 or missed > self.queue_size:
+            self.resyncs += 1
+            outbox.send(encode_message({"type": "resync", "epoch": self.epoch, "seq": current}))
+            return
+
+        subscription = self._indexes[audience].subscription(websocket)
+        for seq, frame, key, topics in buffer:
+            if seq <= last_seq:
+                continue
+            if seq > current:
+                break
+            if subscription is not None and not subscription.matches(topics):
+                continue
+            outbox.send(frame, key)
+            self.replayed += 1
+
+    def send_to(self, websocket: WebSocket, message: dict):
+        """Queue a message for one socket only; not sequenced or replayed."""
+        outbox = self._outboxes.get(websocket)
+        if outbox is not None:
+            outbox.send(encode_message(message))
+
+    def add_listener(self, target: str, message_type: str, callback: Callable[[dict], None]):
+        self._listeners.setdefault((target, message_type), []).append(callback)
+
+    def _leave(self, websocket: WebSocket, kind: str, name: str):
+        audience = _audience(kind, name)
+        index = self._indexes.get(audience)
+        if index is not None:
+            index.remove(websocket)
+            if not len(index):
+                del self._indexes[audience]
+
+        if kind == "channel":
+            members = self.channels.get(name)
+            if members is not None:
+                members.discard(websocket)
+                if not members:
+                    del self.channels[name]
+        else:
+            self._groups[name].discard(websocket)
 
     # -----------------------------------------------
     # Global Connect
     # -----------------------------------------------
-    async def connect(self, websocket: WebSocket):
-        await websocket.accept()
-        self.active_connections.append(websocket)
+    async def connect(
+        self,
+        websocket: WebSocket,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
+        subscription: Optional[Subscription] = None,
+    ):
+        await self._accept(websocket)
+        self._join(websocket, "group", "all", last_seq, epoch, subscription)
 
     # -----------------------------------------------
     # Role-based connect
     # -----------------------------------------------
-    async def connect_role(self, websocket: WebSocket, role: str):
-        await websocket.accept()
+    async def connect_role(
+        self,
+        websocket: WebSocket,
+        role: str,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
+        subscription: Optional[Subscription] = None,
+    ):
+        await self._accept(websocket)
 
         if role == "manager":
-            self.managers.append(websocket)
+            self._join(websocket, "group", "managers", last_seq, epoch, subscription)
         elif role == "operator":
-            self.operators.append(websocket)
+            self._join(websocket, "group", "operators", last_seq, epoch, subscription)
 
     # -----------------------------------------------
     # Machine/channel connect
     # -----------------------------------------------
-    async def join_channel(self, websocket: WebSocket, channel: str):
-        await websocket.accept()
-
-        if channel not in self.channels:
-            self.channels[channel] = []
+    async def join_channel(
+        self,
+        websocket: WebSocket,
+        channel: str,
+        last_seq: Optional[int] = None,
+        epoch: Optional[str] = None,
+        subscription: Optional[Subscription] = None,
+    ):
+        await self._accept(websocket)
+        self._join(websocket, "channel", channel, last_seq, epoch, subscription)
 
-        self.channels[channel].append(websocket)
+    def leave_channel(self, websocket: WebSocket, channel: str):
+        memberships = self._memberships.get(websocket)
+        if memberships is not None:
+            memberships.discard(("channel", channel))
+        self._leave(websocket, "channel", channel)
 
     # -----------------------------------------------
-    # Remove from all lists
+    # Remove from every group / channel it joined
     # -----------------------------------------------
     def disconnect(self, websocket: WebSocket):
-        for group in [self.active_connections, self.managers, self.operators]:
-            if websocket in group:
-                group.remove(websocket)
+        for kind, name in self._memberships.pop(websocket, ()):
+            self._leave(websocket, kind, name)
+
+        outbox = self._outboxes.pop(websocket, None)
+        if outbox is not None:
+            outbox.close()
+
+    def _send(self, connections: Iterable[WebSocket], frame: str, key: Optional[tuple]):
+        """Queue a pre-encoded frame on each socket; never waits on the network."""
+        # one wire encoding per codec in use, shared by its sockets
+        payloads: Dict[str, Union[str, bytes]] = {}
+
+        # copy: evicting a socket mutates the set
+        for connection in list(connections):
+            outbox = self._outboxes.get(connection)
+            if outbox is None:
+                continue
+
+            codec = outbox.codec
+            payload = payloads.get(codec.name)
+            if payload is None:
+                payload = payloads[codec.name] = codec.encode(frame)
+                if codec is not JSON_TEXT:
+                    self.frames_transcoded += 1
+
+            if not outbox.push(payload, key):
+                self.overflow_disconnects += 1
+                self.evict(connection)
+
+    async def _publish(self, target: str, message: dict, channel: Optional[str] = None):
+        """
+        Encode once and hand the frame to the backplane, which delivers it
+        to this worker and every other one.
+        """
+        frame = encode_message(message)
+        self.frames_encoded += 1
+        await self.backplane.publish(
+            target, channel, frame, _coalesce_key(message), message_topics(message)
+        )
+
+    def _deliver(
+        self,
+        target: str,
+        channel: Optional[str],
+        frame: str,
+        key: Optional[tuple],
+        topics: Dict[str, Any],
+    ):
+        if target == CONTROL:
+            self._on_control(topics)
+            return
+
+        audience = _audience("channel", channel) if target == "channel" else target
+
+        listeners = self._listeners.get((target, topics.get("type")))
+        if listeners:
+            message = json.loads(frame)
+            for callback in listeners:
+                try:
+                    callback(message)
+                except Exception as e:
+                    print("WS listener error:", e)
+
+        seq = self._seq.get(audience, 0) + 1
+        self._seq[audience] = seq
+        frame = _stamp(frame, seq)
+
+        if self.replay_size:
+            buffer = self._replay.get(audience)
+            if buffer is None:
+                buffer = self._replay[audience] = deque(maxlen=self.replay_size)
+            buffer.append((seq, frame, key, topics))
 
-        for channel in self.channels.values():
-            if websocket in channel:
-                channel.remove(websocket)
+        if self.coalesce_window:
+            pending = self._pending.get(audience)
+            if pending is not None:
+                # window open: hold it for the batch
+                pending.append((frame, key, topics))
+                return
+            self._open_window(audience)
+
+        index = self._indexes.get(audience)
+        if index is not None:
+            self._send(index.match(topics), frame, key)
+
+    def _on_backplane_loss(self):
+        """
+        Broadcasts from another worker never arrived, so they are in no
+        replay buffer either: tell every socket here to refetch (at most
+        once a second, a backlog overflow loses many in a row).
+        """
+        now = time.monotonic()
+        if now - self._loss_resync_at < 1.0:
+            return
+        self._loss_resync_at = now
+        self.loss_resyncs += 1
+
+        for websocket, memberships in list(self._memberships.items()):
+            for kind, name in memberships:
+                audience = _audience(kind, name)
+                current = self._seq.get(audience, 0) - len(self._pending.get(audience) or ())
+                self.send_to(websocket, {"type": "resync", "epoch": self.epoch, "seq": current})
+
+    def _open_window(self, audience: str):
+        self._pending[audience] = []
+        self._flush_timers[audience] = asyncio.get_running_loop().call_later(
+            self.coalesce_window, self._flush, audience
+        )
+
+    def _flush(self, audience: str):
+        """Close a coalescing window, sending whatever queued up during it."""
+        self._flush_timers.pop(audience, None)
+        pending = self._pending.pop(audience, None)
+        if not pending:
+            # quiet window: the next broadcast goes out immediately again
+            return
+
+        # still busy: keep batching
+        self._open_window(audience)
+
+        index = self._indexes.get(audience)
+        if index is None:
+            return
+
+        if len(pending) == 1:
+            frame, key, topics = pending[0]
+            self._send(index.match(topics), frame, key)
+            return
+
+        # Filtered sockets may want different subsets; encode one batch per
+        # distinct subset rather than one per socket
+        wanted: Dict[WebSocket, List[int]] = {}
+        for i, (_, _, topics) in enumerate(pending):
+            for websocket in index.match(topics):
+                wanted.setdefault(websocket, []).append(i)
+
+        groups: Dict[tuple, List[WebSocket]] = {}
+        for websocket, positions in wanted.items():
+            groups.setdefault(tuple(positions), []).append(websocket)
+
+        for positions, sockets in groups.items():
+            if len(positions) == 1:
+                frame, key, _ = pending[positions[0]]
+            else:
+                frame, key = _batch([pending[i][0] for i in positions]), None
+                self.batches_sent += 1
+                self.events_batched += len(positions)
+            self._send(sockets, frame, key)
+
+    def evict(self, websocket: WebSocket, code: int = 1013, reason: str = ""):
+        """Disconnect and close a socket that can't keep up (or went quiet)."""
+        self.disconnect(websocket)
+        asyncio.create_task(self._close_quietly(websocket, code, reason))
+
+    async def _close_quietly(self, websocket: WebSocket, code: int = 1013, reason: str = ""):
+        try:
+            # 1013: try again later, 1001: going away, 1012: service restart
+            await websocket.close(code=code, reason=reason or None)
+        except Exception:
+            pass
+
+    async def drain(self, duration: Optional[float] = None, spread: Optional[float] = None) -> int:
+        """
+        Close every socket with 1012 (service restart) in waves over
+        duration seconds. Each close carries "retry=<ms>" in its reason,
+        staggered evenly over spread seconds, which the client waits
+        before reconnecting. Sockets that connect meanwhile are sent
+        away the same way. Returns how many sockets were closed.
+        """
+        duration = self.drain_seconds if duration is None else duration
+        spread = self.drain_spread if spread is None else spread
+        # late joiners are sent away for the drain plus the reconnect spread
+        self._drain_until = max(self._drain_until, time.monotonic() + duration + spread)
+
+        sockets = list(self._outboxes)
+        total = len(sockets)
+        if not total:
+            return 0
+
+        # at most one wave per 100 ms
+        waves = max(1, min(total, int(duration * 10)))
+        per_wave = math.ceil(total / waves)
+        waves = math.ceil(total / per_wave)
+        for start in range(0, total, per_wave):
+            for position, websocket in enumerate(sockets[start:start + per_wave], start):
+                if websocket in self._outboxes:
+                    retry_ms = int(spread * 1000 * position / total)
+                    self.evict(websocket, code=1012, reason=f"retry={retry_ms}")
+                    self.drained += 1
+            if start + per_wave < total:
+                await asyncio.sleep(duration / waves)
+        return total
+
+    async def request_drain(self, duration: Optional[float] = None, spread: Optional[float] = None):
+        """Drain every worker: the request goes out over the backplane."""
+        command = {"type": "drain", "seconds": duration, "spread": spread}
+        await self.backplane.publish(CONTROL, None, encode_message(command), None, command)
+
+    def _on_control(self, command: Dict[str, Any]):
+        if command.get("type") == "drain":
+            self.drain_requests += 1
+            # keep a reference so the task isn't collected mid-drain
+            self._drain_task = asyncio.create_task(
+                self.drain(command.get("seconds"), command.get("spread"))
+            )
 
     # -------------------------------------------------
     # Broadcast to ALL connections (old behavior)
     # -------------------------------------------------
     async def broadcast(self, message: dict):
-        for connection in list(self.active_connections):
-            try:
-                await connection.send_json(message)
-            except:
-                self.disconnect(connection)
+        await self._publish("all", message)
 
     # -------------------------------------------------
     # Broadcast to managers only
     # -------------------------------------------------
     async def broadcast_managers(self, message: dict):
-        for connection in list(self.managers):
-            try:
-                await connection.send_json(message)
-            except:
-                self.disconnect(connection)
+        await self._publish("managers", message)
 
     # -------------------------------------------------
     # Broadcast to operators only
     # -------------------------------------------------
     async def broadcast_operators(self, message: dict):
-        for connection in list(self.operators):
-            try:
-                await connection.send_json(message)
-            except:
-                self.disconnect(connection)
+        await self._publish("operators", message)
 
     # -------------------------------------------------
     # Broadcast to channel (e.g., machine_id)
     # -------------------------------------------------
     async def broadcast_channel(self, channel: str, message: dict):
-        if channel not in self.channels:
-            return
+        await self._publish("channel", message, channel)
 
-        for connection in list(self.channels[channel]):
-            try:
-                await connection.send_json(message)
-            except:
-                self.disconnect(connection)
+    def stats(self) -> Dict[str, Any]:
+        outboxes = list(self._outboxes.values())
+        return {
+            "connections": len(outboxes),
+            "managers": len(self.managers),
+            "operators": len(self.operators),
+            "channels": len(self.channels),
+            "queue_size": self.queue_size,
+            "overflow_policy": self.overflow_policy,
+            "queued": sum(len(o.queue) for o in outboxes),
+            "max_queued": max((len(o.queue) for o in outboxes), default=0),
+            "dropped": sum(o.dropped for o in outboxes),
+            "coalesced": sum(o.coalesced for o in outboxes),
+            "overflow_disconnects": self.overflow_disconnects,
+            "stalled_disconnects": self.stalled_disconnects,
+            "frames_encoded": self.frames_encoded,
+            "keepalive": {
+                "ping_interval": self.ping_interval,
+                "idle_timeout": self.idle_timeout,
+                "pings_sent": self.pings_sent,
+                "idle_disconnects": self.idle_disconnects,
+            },
+            "coalescing": {
+                "window": self.coalesce_window,
+                "open_windows": len(self._pending),
+                "batches_sent": self.batches_sent,
+                "events_batched": self.events_batched,
+            },
+            "encoder": "orjson" if orjson is not None else "json",
+            "encodings": {
+                name: sum(1 for o in outboxes if o.codec.name == name)
+                for name in {o.codec.name for o in outboxes}
+            },
+            "frames_transcoded": self.frames_transcoded,
+            "bytes_sent": sum(o.bytes_sent for o in outboxes),
+            "backplane": self.backplane.stats(),
+            "drain": {
+                "draining": self.draining,
+                "seconds": self.drain_seconds,
+                "spread": self.drain_spread,
+                "drained": self.drained,
+                "requests": self.drain_requests,
+            },
+            "replay": {
+                "epoch": self.epoch,
+                "buffer_size": self.replay_size,
+                "audiences": len(self._replay),
+                "replayed": self.replayed,
+                "resyncs": self.resyncs,
+                "loss_resyncs": self.loss_resyncs,
+            },
+        }
 
 
-ws_manager = WebSocketManager()
+ws_manager = WebSocketManager(
+    queue_size=settings.WS_SEND_QUEUE_SIZE,
+    overflow_policy=settings.WS_OVERFLOW_POLICY,
+    send_timeout=settings.WS_SEND_TIMEOUT_SECONDS,
+    replay_size=settings.WS_REPLAY_BUFFER_SIZE,
+    ping_interval=settings.WS_PING_INTERVAL_SECONDS,
+    idle_timeout=settings.WS_IDLE_TIMEOUT_SECONDS,
+    coalesce_window=settings.WS_COALESCE_WINDOW_MS / 1000,
+    codecs=build_codecs(
+        level=settings.WS_DEFLATE_LEVEL,
+        window_bits=settings.WS_DEFLATE_WINDOW_BITS,
+        min_bytes=settings.WS_DEFLATE_MIN_BYTES,
+    ),
+    drain_seconds=settings.WS_DRAIN_SECONDS,
+    drain_spread=settings.WS_DRAIN_RECONNECT_SPREAD_SECONDS,
+    backplane=create_backplane(
+        settings.WS_BACKPLANE,
+        settings.WS_BACKPLANE_DIR or os.path.join(settings.DATA_DIR, "ws-backplane"),
+    ),
+)
@@ -0,0 +1,293 @@
+## app/services/ws_backplane.py
+
+import asyncio
+import errno
+import json
+import os
+import socket
+import time
+import uuid
+from collections import deque
+from typing import Any, Callable, Deque, Dict, Optional
+
+
+# deliver(target, channel, frame, key, topics) fans a pre-encoded frame out
+# to the sockets this worker holds; topics drive subscription filters
+Deliver = Callable[[str, Optional[str], str, Optional[tuple], Dict[str, Any]], None]
+
+# on_loss() is called when broadcasts from another worker went missing, so
+# the sockets here can be told to resync
+OnLoss = Callable[[], None]
+
+
+class Backplane:
+    """
+    Carries broadcasts between workers. publish() must result in deliver()
+    being called once on every worker, including the publishing one, or in
+    on_loss() on a worker that missed it.
+    """
+
+    name = "base"
+
+    def __init__(self):
+        self.deliver: Optional[Deliver] = None
+        self.on_loss: Optional[OnLoss] = None
+        self.published = 0
+        self.received = 0
+
+    def attach(self, deliver: Deliver, on_loss: Optional[OnLoss] = None):
+        self.deliver = deliver
+        self.on_loss = on_loss
+
+    async def start(self):
+        pass
+
+    async def stop(self):
+        pass
+
+    async def publish(
+        self,
+        target: str,
+        channel: Optional[str],
+        frame: str,
+        key: Optional[tuple],
+        topics: Dict[str, Any],
+    ):
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": self.name,
+            "published": self.published,
+            "received": self.received,
+        }
+
+
+# -----------------------------------------------
+# Single worker (default)
+# -----------------------------------------------
+class InProcessBackplane(Backplane):
+    name = "inprocess"
+
+    async def publish(self, target, channel, frame, key, topics):
+        self.published += 1
+        self.deliver(target, channel, frame, key, topics)
+
+
+# -----------------------------------------------
+# Workers on one host: Unix datagram sockets
+# -----------------------------------------------
+class UnixSocketBackplane(Backplane):
+    """
+    Every worker binds <directory>/<pid>.sock and publishes by sending one
+    datagram to each other socket in the directory. Sockets left behind by
+    dead workers are removed on the first failed send. Local delivery
+    happens directly, without a round trip through the socket.
+
+    A peer whose receive queue is full doesn't lose the datagram: it waits
+    in a per-peer backlog that is retried with backoff, keeping order.
+    Datagrams carry the sender's id and a sequence number; if a backlog
+    overflows (its oldest entries are dropped), the receiver sees the gap
+    and reports it through on_loss.
+    """
+
+    name = "unix"
+
+    # Linux default max datagram on AF_UNIX is ~200 KiB; keep well under it
+    MAX_DATAGRAM = 64 * 1024
+
+    # New workers are picked up within this many seconds
+    PEER_REFRESH_SECONDS = 1.0
+
+    # Datagrams held per peer while its receive queue is full
+    MAX_BACKLOG = 1024
+    RETRY_SECONDS = 0.005
+    MAX_RETRY_SECONDS = 0.2
+
+    def __init__(self, directory: str):
+        super().__init__()
+        self.directory = directory
+        self.path = os.path.join(directory, f"{os.getpid()}.sock")
+        self._sock: Optional[socket.socket] = None
+        self._peer_cache: list = []
+        self._peers_listed_at = 0.0
+        self.peer_errors = 0
+        self.oversized = 0
+
+        # sender side: id + sequence on every datagram, backlog per slow peer
+        self._sender_id = uuid.uuid4().hex[:12]
+        self._out_seq = 0
+        self._backlog: Dict[str, Deque[bytes]] = {}
+        self._retry_delay = self.RETRY_SECONDS
+        self._retry_handle: Optional[asyncio.TimerHandle] = None
+        self.deferred = 0
+        self.dropped = 0
+
+        # receiver side: last sequence seen per sender
+        self._in_seq: Dict[str, int] = {}
+        self.lost = 0
+
+    async def start(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if os.path.exists(self.path):
+            os.unlink(self.path)
+
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_DGRAM)
+        sock.setblocking(False)
+        sock.bind(self.path)
+        self._sock = sock
+        asyncio.get_running_loop().add_reader(sock.fileno(), self._on_readable)
+
+    async def stop(self):
+        if self._sock is None:
+            return
+        if self._retry_handle is not None:
+            self._retry_handle.cancel()
+            self._retry_handle = None
+        self._backlog.clear()
+        asyncio.get_running_loop().remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        try:
+            os.unlink(self.path)
+        except FileNotFoundError:
+            pass
+
+    def _on_readable(self):
+        while True:
+            try:
+                data = self._sock.recv(self.MAX_DATAGRAM)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as e:
+                print("Backplane receive error:", e)
+                return
+            try:
+                sender, seq, target, channel, frame, key, topics = json.loads(data)
+            except ValueError:
+                continue
+
+            last = self._in_seq.get(sender)
+            self._in_seq[sender] = seq
+            if last is not None and seq > last + 1:
+                # the sender had to drop some of ours
+                self.lost += seq - last - 1
+                if self.on_loss is not None:
+                    self.on_loss()
+
+            self.received += 1
+            self.deliver(target, channel, frame, tuple(key) if key else None, topics)
+
+    def _peers(self):
+        now = time.monotonic()
+        if now - self._peers_listed_at < self.PEER_REFRESH_SECONDS:
+            return self._peer_cache
+
+        try:
+            names = os.listdir(self.directory)
+        except FileNotFoundError:
+            names = []
+        self._peer_cache = [
+            os.path.join(self.directory, name)
+            for name in names
+            if name.endswith(".sock") and os.path.join(self.directory, name) != self.path
+        ]
+        self._peers_listed_at = now
+        return self._peer_cache
+
+    async def publish(self, target, channel, frame, key, topics):
+        self.published += 1
+        self.deliver(target, channel, frame, key, topics)
+
+        if self._sock is None:
+            return
+
+        self._out_seq += 1
+        data = json.dumps(
+            [self._sender_id, self._out_seq, target, channel, frame, key, topics]
+        ).encode("utf-8")
+        if len(data) > self.MAX_DATAGRAM:
+            self.oversized += 1
+            print("Backplane message too large to forward:", len(data))
+            return
+
+        for peer in self._peers():
+            # behind a backlog: queue so the peer still gets them in order
+            if peer in self._backlog or not self._send(peer, data):
+                self._defer(peer, data)
+
+    def _send(self, peer: str, data: bytes) -> bool:
+        """False when the peer can't take it right now (retry later)."""
+        try:
+            self._sock.sendto(data, peer)
+        except (BlockingIOError, InterruptedError):
+            # peer's receive queue is full
+            return False
+        except (ConnectionRefusedError, FileNotFoundError):
+            # worker is gone
+            self.peer_errors += 1
+            self._peers_listed_at = 0.0
+            self._backlog.pop(peer, None)
+            try:
+                os.unlink(peer)
+            except OSError:
+                pass
+        except OSError as e:
+            if e.errno == errno.ENOBUFS:
+                return False
+            self.peer_errors += 1
+            print("Backplane send error:", peer, e)
+        return True
+
+    def _defer(self, peer: str, data: bytes):
+        backlog = self._backlog.setdefault(peer, deque())
+        if len(backlog) >= self.MAX_BACKLOG:
+            # the peer will see the gap in our sequence and resync
+            backlog.popleft()
+            self.dropped += 1
+        backlog.append(data)
+        self.deferred += 1
+        if self._retry_handle is None:
+            self._retry_handle = asyncio.get_running_loop().call_later(
+                self._retry_delay, self._retry
+            )
+
+    def _retry(self):
+        self._retry_handle = None
+        if self._sock is None:
+            return
+
+        for peer, backlog in list(self._backlog.items()):
+            while backlog and self._send(peer, backlog[0]):
+                if peer not in self._backlog:
+                    # gone; its backlog was discarded
+                    break
+                backlog.popleft()
+            if not backlog:
+                self._backlog.pop(peer, None)
+
+        if self._backlog:
+            self._retry_delay = min(self._retry_delay * 2, self.MAX_RETRY_SECONDS)
+            self._retry_handle = asyncio.get_running_loop().call_later(
+                self._retry_delay, self._retry
+            )
+        else:
+            self._retry_delay = self.RETRY_SECONDS
+
+    def stats(self):
+        return {
+            **super().stats(),
+            "peers": len(self._peers()),
+            "peer_errors": self.peer_errors,
+            "oversized": self.oversized,
+            "backlog": sum(len(b) for b in self._backlog.values()),
+            "deferred": self.deferred,
+            "dropped": self.dropped,
+            "lost": self.lost,
+        }
+
+
+def create_backplane(kind: str, directory: str) -> Backplane:
+    if kind == "unix":
+        return UnixSocketBackplane(directory)
+    return InProcessBackplane()
@@ -0,0 +1,112 @@
+## app/services/ws_codecs.py
+
+import json
+import zlib
+from typing import Dict, Iterable, Optional, Union
+
+try:
+    import msgpack
+except ImportError:  # optional, clients fall back to JSON
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+# Sec-WebSocket-Protocol values a client can offer, best first. Clients that
+# offer none of them (or only ones we can't serve) get JSON text frames.
+MSGPACK_DEFLATE = "quickdowntime.msgpack+deflate"
+MSGPACK = "quickdowntime.msgpack"
+JSON_DEFLATE = "quickdowntime.json+deflate"
+JSON = "quickdowntime.json"
+
+# First byte of every binary frame
+FLAG_PLAIN = b"\x00"
+FLAG_DEFLATE = b"\x01"
+
+
+def _loads(frame: str):
+    if orjson is not None:
+        return orjson.loads(frame)
+    return json.loads(frame)
+
+
+class Codec:
+    """
+    Turns an encoded JSON frame (what the manager stamps, buffers for replay
+    and sends over the backplane) into what goes on the wire for one socket.
+    The default sends it unchanged as a text frame.
+    """
+
+    name = "json"
+
+    def encode(self, frame: str) -> Union[str, bytes]:
+        return frame
+
+
+class BinaryCodec(Codec):
+    """
+    Binary frames: one flag byte, then the body (MessagePack or UTF-8 JSON),
+    raw-deflated when that makes it smaller.
+
+    Frames are shared by every socket on the same codec, so each is
+    compressed on its own (no context takeover between messages). A small
+    window keeps the compressor cheap; for alert-sized payloads it costs
+    nothing in ratio.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        packed: bool,
+        deflate: bool,
+        level: int = 6,
+        window_bits: int = 12,
+        min_bytes: int = 200,
+    ):
+        self.name = name
+        self.packed = packed
+        self.deflate = deflate
+        self.level = level
+        self.window_bits = window_bits
+        self.min_bytes = min_bytes
+
+    def encode(self, frame: str) -> bytes:
+        if self.packed:
+            body = msgpack.packb(_loads(frame), use_bin_type=True)
+        else:
+            body = frame.encode("utf-8")
+
+        if self.deflate and len(body) >= self.min_bytes:
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, -self.window_bits, 8)
+            compressed = compressor.compress(body) + compressor.flush()
+            if len(compressed) < len(body):
+                return FLAG_DEFLATE + compressed
+
+        return FLAG_PLAIN + body
+
+
+JSON_TEXT = Codec()
+
+
+def build_codecs(level: int = 6, window_bits: int = 12, min_bytes: int = 200) -> Dict[str, Codec]:
+    """Subprotocol -> codec for everything this server can speak."""
+    window_bits = min(15, max(9, window_bits))
+    codecs: Dict[str, Codec] = {
+        JSON: JSON_TEXT,
+        JSON_DEFLATE: BinaryCodec("json+deflate", False, True, level, window_bits, min_bytes),
+    }
+    if msgpack is not None:
+        codecs[MSGPACK] = BinaryCodec("msgpack", True, False, level, window_bits, min_bytes)
+        codecs[MSGPACK_DEFLATE] = BinaryCodec("msgpack+deflate", True, True, level, window_bits, min_bytes)
+    return codecs
+
+
+def negotiate(offered: Iterable[str], codecs: Dict[str, Codec]) -> Optional[str]:
+    """The first subprotocol in the client's preference order we support."""
+    for subprotocol in offered or ():
+        if subprotocol in codecs:
+            return subprotocol
+    return None
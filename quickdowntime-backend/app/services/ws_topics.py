@@ -0,0 +1,165 @@
+## app/services/ws_topics.py
+
+from typing import Any, Dict, Iterable, Optional, Set
+
+
+SEVERITY_LEVELS = {"low": 1, "medium": 2, "high": 3, "critical": 4}
+
+# Index dimensions, most selective first: a filtered socket is indexed
+# under the first one it filters on and checked against the rest on match
+DIMENSIONS = ("operator", "machine", "type", "severity")
+
+
+def severity_level(value: Any) -> Optional[int]:
+    return SEVERITY_LEVELS.get(str(value or "").strip().lower())
+
+
+def _csv(value: Optional[str]) -> Optional[Set[str]]:
+    if not value:
+        return None
+    items = {part.strip() for part in value.split(",") if part.strip()}
+    return items or None
+
+
+def message_topics(message: dict) -> Dict[str, Any]:
+    """What subscriptions can filter on, pulled from a broadcast message."""
+    downtime = message.get("downtime") if isinstance(message.get("downtime"), dict) else {}
+    operator = message.get("operator_id") or downtime.get("operator_id")
+    return {
+        "type": message.get("type"),
+        "machine": message.get("machine_id") or downtime.get("machine_id"),
+        "operator": str(operator) if operator is not None else None,
+        "severity": severity_level(message.get("severity") or downtime.get("severity")),
+    }
+
+
+class Subscription:
+    """
+    Per-socket filter. Each set dimension only excludes events that carry
+    that attribute; an event without a machine_id, say, still reaches a
+    socket filtered by machine.
+    """
+
+    def __init__(
+        self,
+        types: Optional[Set[str]] = None,
+        machines: Optional[Set[str]] = None,
+        operator: Optional[str] = None,
+        min_severity: Optional[int] = None,
+    ):
+        self.values = {
+            "type": types,
+            "machine": machines,
+            "operator": {operator} if operator else None,
+            "severity": min_severity,
+        }
+
+    @classmethod
+    def from_params(cls, params, operator: Optional[str] = None) -> Optional["Subscription"]:
+        """Build from ws query params (types, machines, min_severity)."""
+        sub = cls(
+            types=_csv(params.get("types")),
+            machines=_csv(params.get("machines")),
+            operator=operator,
+            min_severity=severity_level(params.get("min_severity")),
+        )
+        return None if sub.is_empty() else sub
+
+    def is_empty(self) -> bool:
+        return all(v is None for v in self.values.values())
+
+    def primary(self) -> str:
+        return next(d for d in DIMENSIONS if self.values[d] is not None)
+
+    def matches(self, topics: Dict[str, Any]) -> bool:
+        for dim, wanted in self.values.items():
+            if wanted is None:
+                continue
+            value = topics.get(dim)
+            if value is None:
+                continue
+            if dim == "severity":
+                if value < wanted:
+                    return False
+            elif value not in wanted:
+                return False
+        return True
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            dim: sorted(v) if isinstance(v, set) else v
+            for dim, v in self.values.items() if v is not None
+        }
+
+
+class TopicIndex:
+    """
+    Subscribers of one audience, indexed so an event only touches sockets
+    that might want it: unfiltered sockets, plus filtered sockets indexed
+    under the event's value in their primary dimension.
+    """
+
+    def __init__(self):
+        self.unfiltered: Set[Any] = set()
+        self._by_dim: Dict[str, Dict[Any, Set[Any]]] = {d: {} for d in DIMENSIONS}
+        self._subs: Dict[Any, Subscription] = {}
+
+    def __len__(self):
+        return len(self.unfiltered) + len(self._subs)
+
+    def add(self, websocket, sub: Optional[Subscription]):
+        self.remove(websocket)
+        if sub is None:
+            self.unfiltered.add(websocket)
+            return
+
+        self._subs[websocket] = sub
+        dim = sub.primary()
+        keys = [sub.values[dim]] if dim == "severity" else sub.values[dim]
+        index = self._by_dim[dim]
+        for key in keys:
+            index.setdefault(key, set()).add(websocket)
+
+    def remove(self, websocket):
+        self.unfiltered.discard(websocket)
+        sub = self._subs.pop(websocket, None)
+        if sub is None:
+            return
+
+        dim = sub.primary()
+        keys = [sub.values[dim]] if dim == "severity" else sub.values[dim]
+        index = self._by_dim[dim]
+        for key in keys:
+            members = index.get(key)
+            if members is not None:
+                members.discard(websocket)
+                if not members:
+                    del index[key]
+
+    def _candidates(self, dim: str, value) -> Iterable[Any]:
+        index = self._by_dim[dim]
+        if not index:
+            return ()
+        if value is None:
+            # event doesn't carry this attribute: nobody is excluded by it
+            return {ws for members in index.values() for ws in members}
+        if dim == "severity":
+            return [ws for level, members in index.items() if level <= value for ws in members]
+        return index.get(value, ())
+
+    def match(self, topics: Dict[str, Any]) -> Iterable[Any]:
+        if not self._subs:
+            return self.unfiltered
+
+        # A filtered socket sits in exactly one dimension's index, and
+        # under one key per value, so there are no duplicates to remove
+        targets = list(self.unfiltered)
+        for dim in DIMENSIONS:
+            targets.extend(
+                ws for ws in self._candidates(dim, topics.get(dim))
+                if self._subs[ws].matches(topics)
+            )
+        return targets
+
+    def subscription(self, websocket) -> Optional[Subscription]:
+        return self._subs.get(websocket)
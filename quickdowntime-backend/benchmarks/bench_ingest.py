@@ -0,0 +1,151 @@
+# benchmarks/bench_ingest.py
+"""
+End-to-end ingest latency and throughput of operator_log under burst load,
+fully offline: the model is the local stand-in backend and Supabase is an
+in-memory table (benchmarks/memory_db.py).
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_ingest
+    python -m benchmarks.bench_ingest --bursts 5 --burst-size 50 --latency-ms 1200
+    python -m benchmarks.bench_ingest --failure-rate 0.2 --local-classifier
+
+"ack" is the time until operator_log returns its response; "analysed" is
+the time until the AI analysis is stored (the same thing unless the local
+classifier answers first and the LLM refines in the background).
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import benchmarks.offline_env  # noqa: F401  (must precede app imports)
+from app.routers import operator
+from app.services import ai_analysis_store, ai_summaries, history_index, local_classifier
+from app.services.ai_engine import ai_engine
+from app.services.model_backends import LocalModelBackend
+from benchmarks.fixtures import make_downtime, make_history
+from benchmarks.memory_db import MemoryDB
+
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def install_db(db):
+    for module in (operator, ai_analysis_store, ai_summaries, history_index, local_classifier):
+        module.supabase = db
+
+
+async def one_request(i, rng, acks, started_at):
+    row = make_downtime(100000 + i, rng)
+    user = {"id": f"bench-{i % 40}", "email": f"operator{i % 40}@plant.example"}
+
+    start = time.perf_counter()
+    body = await operator._log_downtime(
+        user, row["machine_id"], row["reason"], row["category"], row["description"],
+        None, None, None, None,
+    )
+    acks.append((time.perf_counter() - start) * 1000)
+    started_at[body["data"]["id"]] = start
+
+
+def track_analyses(stored_at):
+    """Record when each downtime's ai_analysis row is written."""
+    store = ai_analysis_store.ai_analysis_store
+    original = store.remember
+
+    def remember(event, ai_result):
+        original(event, ai_result)
+        stored_at[event["id"]] = time.perf_counter()
+
+    store.remember = remember
+
+
+async def run(args):
+    history = make_history(args.history)
+    db = MemoryDB(latency_ms=args.db_latency_ms, seed_rows=history)
+    install_db(db)
+
+    backend = LocalModelBackend(
+        latency_ms=args.latency_ms,
+        jitter_ms=args.jitter_ms,
+        failure_rate=args.failure_rate,
+        output_chars=args.output_chars,
+        seed=args.seed,
+    )
+    ai_engine.set_backend(backend)
+    if not args.cache:
+        ai_engine.cache = None
+    if args.batch_window_ms is not None:
+        ai_engine.batch_window = args.batch_window_ms / 1000
+
+    if args.local_classifier:
+        local_classifier.local_classifier.model = local_classifier.train_model(history)
+    else:
+        local_classifier.local_classifier.model = None
+
+    stored_at = {}
+    track_analyses(stored_at)
+
+    rng = random.Random(args.seed)
+    acks = []
+    started_at = {}
+    started = time.perf_counter()
+    for burst in range(args.bursts):
+        await asyncio.gather(*[
+            one_request(burst * args.burst_size + i, rng, acks, started_at)
+            for i in range(args.burst_size)
+        ])
+        if burst < args.bursts - 1:
+            await asyncio.sleep(args.gap_ms / 1000)
+    acked = time.perf_counter() - started
+
+    # Background refinements (local classifier mode) finish after the ack
+    if operator._background_tasks:
+        await asyncio.wait(list(operator._background_tasks), timeout=args.timeout_s)
+    elapsed = time.perf_counter() - started
+
+    analysed = [
+        (stored_at[i] - start) * 1000
+        for i, start in started_at.items() if i in stored_at
+    ]
+
+    total = args.bursts * args.burst_size
+    print(f"requests={total} backend latency={args.latency_ms:.0f}±{args.jitter_ms:.0f}ms "
+          f"failure_rate={args.failure_rate} local_classifier={args.local_classifier}")
+    print(f"ack       p50={percentile(acks, 50):>8.1f}ms p95={percentile(acks, 95):>8.1f}ms "
+          f"p99={percentile(acks, 99):>8.1f}ms")
+    if analysed:
+        print(f"analysed  p50={percentile(analysed, 50):>8.1f}ms p95={percentile(analysed, 95):>8.1f}ms "
+              f"p99={percentile(analysed, 99):>8.1f}ms ({len(analysed)}/{total} stored)")
+    print(f"throughput {total / acked:.1f} req/s acked, {len(analysed) / elapsed:.1f} req/s analysed; "
+          f"model calls={backend.calls} failures={backend.failures} "
+          f"batches={ai_engine.batches_sent}")
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--bursts", type=int, default=3)
+    parser.add_argument("--burst-size", type=int, default=20)
+    parser.add_argument("--gap-ms", type=float, default=500.0, help="pause between bursts")
+    parser.add_argument("--history", type=int, default=500, help="rows already in downtime_logs")
+    parser.add_argument("--latency-ms", type=float, default=800.0)
+    parser.add_argument("--jitter-ms", type=float, default=200.0)
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--output-chars", type=int, default=600)
+    parser.add_argument("--db-latency-ms", type=float, default=0.0, help="simulated Supabase round trip")
+    parser.add_argument("--batch-window-ms", type=float, default=None, help="override AI_BATCH_WINDOW_MS")
+    parser.add_argument("--local-classifier", action="store_true", help="answer from the trained local model first")
+    parser.add_argument("--cache", action="store_true", help="keep the AI result cache enabled")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--timeout-s", type=float, default=120.0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+# benchmarks/bench_login_storm.py
+"""
+Shift-change login storm: a burst of concurrent /auth/login password checks
+alongside a steady trickle of ordinary sync requests on the request
+threadpool. Compares bcrypt inline in a sync route (the old behaviour:
+every login holds a threadpool thread for the whole hash) with async
+routes awaiting PasswordPool (separate processes, bounded admission, 429
+on overflow, no thread held while waiting).
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_login_storm
+    python -m benchmarks.bench_login_storm --logins 200 --workers 4 --max-queue 32 --rounds 12
+
+Reports login throughput, how many were turned away with 429, and the
+latency of the other requests while the storm is on.
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from app.auth.password_pool import PasswordPool, PasswordPoolBusy, _hash, _verify_and_update
+
+# anyio's default thread limiter, which FastAPI uses for sync routes
+THREADPOOL_SIZE = 40
+
+
+def other_request(rows):
+    """A cheap sync route: serialise a page of rows (holds the GIL)."""
+    start = time.perf_counter()
+    json.dumps(rows)
+    return time.perf_counter() - start
+
+
+def percentile(values, p):
+    if not values:
+        return 0.0
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * p))]
+
+
+async def run(label, pool, hashed, args):
+    rows = [{"id": i, "machine_id": f"M{i % 10}", "reason": "Motor trip", "severity": "high"} for i in range(200)]
+    loop = asyncio.get_running_loop()
+    threadpool = ThreadPoolExecutor(max_workers=THREADPOOL_SIZE)
+    results = {"ok": 0, "busy": 0}
+
+    async def login():
+        try:
+            if pool is None:
+                # sync route: bcrypt runs on a threadpool thread
+                ok, _ = await loop.run_in_executor(
+                    threadpool, _verify_and_update, "correct horse", hashed, args.rounds, True
+                )
+            else:
+                # async route: awaits the process pool on the event loop
+                ok, _ = await pool.verify_and_update("correct horse", hashed)
+            key = "ok" if ok else "busy"
+        except PasswordPoolBusy:
+            key = "busy"
+        results[key] += 1
+
+    # start every login up front, like a burst hitting the server
+    start = time.perf_counter()
+    logins = [asyncio.ensure_future(login()) for _ in range(args.logins)]
+    await asyncio.sleep(0)
+
+    # meanwhile, other requests arrive every few ms and go through the
+    # threadpool; latency includes waiting for a free thread
+    latencies = []
+    while not all(f.done() for f in logins):
+        submitted = time.perf_counter()
+        await loop.run_in_executor(threadpool, other_request, rows)
+        latencies.append(time.perf_counter() - submitted)
+        await asyncio.sleep(args.other_interval_ms / 1000)
+
+    elapsed = time.perf_counter() - start
+    threadpool.shutdown()
+
+    print(
+        f"{label:<22} logins ok {results['ok']:>4}  429 {results['busy']:>4}  "
+        f"{results['ok'] / elapsed:>6.1f} logins/s  "
+        f"other requests p50 {percentile(latencies, 0.5) * 1000:>7.2f} ms  "
+        f"p99 {percentile(latencies, 0.99) * 1000:>7.2f} ms  "
+        f"(n={len(latencies)}, mean {statistics.fmean(latencies) * 1000 if latencies else 0:.2f} ms)"
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--logins", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=10)
+    parser.add_argument("--workers", type=int, default=2)
+    parser.add_argument("--max-queue", type=int, default=16)
+    parser.add_argument("--other-interval-ms", type=float, default=5.0)
+    args = parser.parse_args()
+
+    hashed = _hash("correct horse", args.rounds)
+    print(f"logins={args.logins} bcrypt rounds={args.rounds} threadpool={THREADPOOL_SIZE}")
+
+    # old behaviour: sync route, inline on the threadpool, no admission limit
+    asyncio.run(run("inline (threadpool)", None, hashed, args))
+
+    pool = PasswordPool(workers=args.workers, max_queue=args.max_queue, rounds=args.rounds)
+    pool.start()
+    try:
+        # warm the worker processes before measuring
+        asyncio.run(pool.hash("warmup"))
+        asyncio.run(run(f"process pool ({args.workers}+{args.max_queue})", pool, hashed, args))
+    finally:
+        pool.stop()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,102 @@
+# benchmarks/bench_prompt_compaction.py
+"""
+Prompt size and end-to-end analysis latency, legacy vs compacted prompt.
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_prompt_compaction
+    AI_BACKEND=gemini GEMINI_API_KEY=... python -m benchmarks.bench_prompt_compaction --history 50 --live
+
+Without --live the model is simulated with a latency of
+base_ms + ms_per_1k_tokens * prompt_tokens / 1000, which is roughly how
+hosted LLM latency scales with input size. --live calls the configured
+backend; exported variables take precedence over the offline defaults.
+"""
+import argparse
+import json
+import statistics
+import time
+
+import benchmarks.offline_env  # noqa: F401  (must precede app imports)
+from app.services.ai_engine import ai_engine, ATTACHMENT_LOCAL_PATH
+from app.services.prompt_compaction import estimate_tokens
+from benchmarks.fixtures import make_history
+
+
+def legacy_prompt(event, history):
+    """The prompt AIEngine built before compaction (raw rows, indent=2)."""
+    return f"""
+You are an expert manufacturing engineer. 
+Analyze the downtime and RETURN STRICT JSON ONLY.
+** confidence score shoud be in 1-100 %.
+
+Current Event:
+{json.dumps(event, indent=2, default=str)}
+
+History:
+{json.dumps(history[-20:], indent=2, default=str)}
+
+Attached report:
+{ATTACHMENT_LOCAL_PATH}
+
+Return EXACT JSON format:
+{{
+  "root_cause": "",
+  "is_maintenance_required": true/false,
+  "recommended_actions": [""],
+  "preventive_measures": [""],
+  "severity": "low|medium|high|critical",
+  "predicted_next_failure": "",
+  "confidence_score": 0%
+}}
+
+NO MARKDOWN  
+NO ```  
+NO extra explanation  
+ONLY JSON.
+"""
+
+
+def timed_call(prompt, args):
+    start = time.perf_counter()
+    if args.live:
+        ai_engine._call_model_sync(prompt)
+    else:
+        time.sleep((args.base_ms + args.ms_per_1k_tokens * estimate_tokens(prompt) / 1000) / 1000)
+    return (time.perf_counter() - start) * 1000
+
+
+def report(label, prompts, args):
+    sizes = [len(p) for p in prompts]
+    tokens = [estimate_tokens(p) for p in prompts]
+    latencies = [timed_call(p, args) for p in prompts]
+    print(
+        f"{label:<10} chars={statistics.mean(sizes):>8.0f} "
+        f"tokens~={statistics.mean(tokens):>6.0f} "
+        f"latency p50={statistics.median(latencies):>7.1f}ms "
+        f"max={max(latencies):>7.1f}ms"
+    )
+    return statistics.mean(tokens)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--history", type=int, default=20, help="rows passed as history")
+    parser.add_argument("--events", type=int, default=10)
+    parser.add_argument("--live", action="store_true", help="call the real model")
+    parser.add_argument("--base-ms", type=float, default=400.0)
+    parser.add_argument("--ms-per-1k-tokens", type=float, default=250.0)
+    args = parser.parse_args()
+
+    history = make_history(args.history + args.events)
+    events = history[:args.events]
+    history = history[args.events:]
+
+    before = report("legacy", [legacy_prompt(e, history) for e in events], args)
+    after = report("compact", [ai_engine._build_prompt(e, history) for e in events], args)
+    print(f"prompt tokens reduced by {100 * (1 - after / before):.1f}% "
+          f"(budget {ai_engine.prompt_token_budget})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,111 @@
+# benchmarks/bench_startup.py
+"""
+Cold-start import cost: how long a fresh interpreter takes to import the
+config, the AI engine and the whole app, and which heavy third-party
+packages that drags in. Each sample runs in a new process so nothing is
+already in sys.modules.
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_startup
+    python -m benchmarks.bench_startup --runs 10 --top 15 --first-use
+
+--top lists the slowest imports (cumulative, from `python -X importtime`)
+for app.main. --first-use also times building the Supabase client, which
+now happens on the first query instead of at import.
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+
+TARGETS = ["app.config", "app.services.ai_engine", "app.main"]
+
+# Packages that should only load when something actually uses them
+HEAVY = ["supabase", "httpx", "google.generativeai", "grpc"]
+
+PROBE = """
+import json, sys, time
+import benchmarks.offline_env
+start = time.perf_counter()
+import {target}
+elapsed = time.perf_counter() - start
+first_use = None
+if {first_use}:
+    from app.config import supabase
+    start = time.perf_counter()
+    try:
+        supabase.get()
+        first_use = time.perf_counter() - start
+    except Exception as e:
+        first_use = repr(e)
+print(json.dumps({{
+    "seconds": elapsed,
+    "first_use": first_use,
+    "loaded": [m for m in {heavy!r} if m in sys.modules],
+}}))
+"""
+
+
+def probe(target, first_use=False):
+    code = PROBE.format(target=target, first_use=first_use, heavy=HEAVY)
+    out = subprocess.run(
+        [sys.executable, "-c", code],
+        capture_output=True, text=True, check=True, cwd=os.getcwd(),
+    )
+    return json.loads(out.stdout.strip().splitlines()[-1])
+
+
+def slowest_imports(target, top):
+    """(cumulative us, module) for the slowest imports of target."""
+    code = f"import benchmarks.offline_env; import {target}"
+    out = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", code],
+        capture_output=True, text=True, check=True, cwd=os.getcwd(),
+    )
+    rows = []
+    for line in out.stderr.splitlines():
+        # import time: self [us] | cumulative | imported package
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative, name = line[len("import time:"):].split("|")
+        # top-level entries only (nested ones are indented further)
+        if not name[1:].startswith(" "):
+            rows.append((int(cumulative), name.strip()))
+    return sorted(rows, reverse=True)[:top]
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--top", type=int, default=10)
+    parser.add_argument("--first-use", action="store_true")
+    args = parser.parse_args()
+
+    print(f"{'module':<26} {'median ms':>10} {'min ms':>8}  heavy packages loaded")
+    for target in TARGETS:
+        samples = [probe(target) for _ in range(args.runs)]
+        seconds = [s["seconds"] for s in samples]
+        print(
+            f"{target:<26} {statistics.median(seconds) * 1000:>10.1f} "
+            f"{min(seconds) * 1000:>8.1f}  {', '.join(samples[-1]['loaded']) or '-'}"
+        )
+
+    if args.first_use:
+        sample = probe("app.main", first_use=True)
+        first = sample["first_use"]
+        if isinstance(first, float):
+            print(f"\nfirst Supabase use: {first * 1000:.1f} ms (loads {', '.join(sample['loaded'])})")
+        else:
+            print(f"\nfirst Supabase use failed: {first}")
+
+    if args.top:
+        print("\nslowest imports under app.main (cumulative):")
+        for us, name in slowest_imports("app.main", args.top):
+            print(f"  {us / 1000:>8.1f} ms  {name}")
+
+
+if __name__ == "__main__":
+    main()
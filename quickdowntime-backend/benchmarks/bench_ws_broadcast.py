@@ -0,0 +1,139 @@
+# benchmarks/bench_ws_broadcast.py
+"""
+CPU per WebSocket broadcast at 1k / 10k simulated connections, three ways:
+
+  sequential    the original loop: await send_json on each socket in turn
+                (one encode per recipient, one slow client stalls the rest)
+  queued/each   per-socket outboxes, each frame encoded per recipient
+  queued/once   WebSocketManager: per-socket outboxes, encoded once and the
+                same frame queued on every socket
+
+queued/each vs queued/once is what encoding once saves: about 1.2x with
+orjson, whose per-socket encode is already cheap. sequential encodes with
+the stdlib like Starlette's send_json, and queued/once additionally pays
+for waking one writer task per socket (the price of isolating slow
+clients), so at 10k sockets the two end up close on CPU.
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_ws_broadcast
+    python -m benchmarks.bench_ws_broadcast --connections 1000 10000 50000 --broadcasts 50
+
+Sockets are in-process fakes whose send_json encodes like Starlette's and
+whose send_text does nothing, so the numbers are the server-side cost only.
+"""
+import argparse
+import asyncio
+import json
+import time
+
+import benchmarks.offline_env  # noqa: F401  (must precede app imports)
+from app.services.websocket_manager import WebSocketManager, encode_message, orjson
+from benchmarks.fixtures import make_history
+
+
+class FakeSocket:
+    async def accept(self):
+        pass
+
+    async def send_json(self, data):
+        # what starlette.websockets.WebSocket.send_json does before sending
+        json.dumps(data, separators=(",", ":"), ensure_ascii=False)
+
+    async def send_text(self, data):
+        pass
+
+    async def close(self, code=1000):
+        pass
+
+
+def sample_message():
+    row = make_history(1)[0]
+    return {
+        "type": "new_downtime",
+        "id": row["id"],
+        "machine_id": row["machine_id"],
+        "reason": row["reason"],
+        "category": row["category"],
+        "description": row["description"],
+        "severity": row["severity"],
+        "severity_source": "local",
+        "created_at": row["created_at"],
+        "operator_email": row["operator_email"],
+    }
+
+
+async def legacy_broadcast(sockets, message):
+    """broadcast_managers before per-connection queues / pre-encoding."""
+    for connection in sockets:
+        await connection.send_json(message)
+
+
+async def queued_each(manager, message):
+    """Outboxes as in WebSocketManager, but an encode per recipient."""
+    for outbox in list(manager._outboxes.values()):
+        outbox.send(encode_message(message))
+
+
+async def drain(manager):
+    while any(o.queue for o in manager._outboxes.values()):
+        await asyncio.sleep(0)
+
+
+async def measure(n, broadcasts, message):
+    sockets = [FakeSocket() for _ in range(n)]
+
+    cpu = time.process_time()
+    for _ in range(broadcasts):
+        await legacy_broadcast(sockets, message)
+    legacy_ms = (time.process_time() - cpu) * 1000 / broadcasts
+
+    manager = WebSocketManager(queue_size=broadcasts + 1)
+    for sock in sockets:
+        await manager.connect_role(sock, "manager")
+    await drain(manager)
+
+    cpu = time.process_time()
+    for _ in range(broadcasts):
+        await queued_each(manager, message)
+        await drain(manager)
+    each_ms = (time.process_time() - cpu) * 1000 / broadcasts
+
+    cpu = time.process_time()
+    for _ in range(broadcasts):
+        await manager.broadcast_managers(message)
+        await drain(manager)
+    once_ms = (time.process_time() - cpu) * 1000 / broadcasts
+
+    writers = [outbox.task for outbox in manager._outboxes.values()]
+    for sock in sockets:
+        manager.disconnect(sock)
+    await asyncio.gather(*writers, return_exceptions=True)
+
+    print(
+        f"{n:>7} connections  ms cpu/broadcast: sequential {legacy_ms:>8.2f}  "
+        f"queued/each {each_ms:>8.2f}  queued/once {once_ms:>8.2f}  "
+        f"(encode once saves {each_ms / once_ms if once_ms else float('inf'):.1f}x; "
+        f"vs sequential {legacy_ms / once_ms if once_ms else float('inf'):.1f}x)"
+    )
+
+
+async def run(args):
+    message = sample_message()
+    print(f"encoder={'orjson' if orjson is not None else 'json'} "
+          f"frame={len(json.dumps(message))} bytes broadcasts={args.broadcasts}")
+    for n in args.connections:
+        await measure(n, args.broadcasts, message)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 10000])
+    parser.add_argument("--broadcasts", type=int, default=20)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,96 @@
+# benchmarks/bench_ws_encoding.py
+"""
+Bytes per event and CPU per encode for each WebSocket wire encoding a
+client can negotiate: JSON text (default), JSON+deflate, MessagePack and
+MessagePack+deflate.
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_ws_encoding
+    python -m benchmarks.bench_ws_encoding --window-bits 9 12 15 --level 1 6 9
+
+Encoding happens once per broadcast per codec in use (not per socket), so
+the CPU column is per broadcast; bytes are what every subscriber receives.
+"""
+import argparse
+import time
+
+import benchmarks.offline_env  # noqa: F401  (must precede app imports)
+from app.services.websocket_manager import _batch, _stamp, encode_message
+from app.services.ws_codecs import build_codecs, msgpack
+from benchmarks.bench_ws_broadcast import sample_message
+from benchmarks.fixtures import make_history
+
+
+def payloads():
+    row = make_history(1)[0]
+    new = sample_message()
+    resolved = {
+        "type": "downtime_resolved",
+        "id": row["id"],
+        "resolved_by": "0b7c6a52-3c1e-4d0e-9a8f-5f1f3e2d1c0b",
+        "resolved_at": row["created_at"],
+        "machine_id": row["machine_id"],
+        "operator_id": row["operator_id"],
+        "severity": row["severity"],
+    }
+    kpi = {"type": "kpi_delta", "day": "2025-01-01", "delta": {"unseen_alerts": 1, "today_downtimes": 1}}
+    burst = _batch([
+        _stamp(encode_message(dict(
+            new,
+            id=r["id"],
+            machine_id=r["machine_id"],
+            reason=r["reason"],
+            category=r["category"],
+            description=r["description"],
+            severity=r["severity"],
+            created_at=r["created_at"],
+        )), r["id"])
+        for r in make_history(20)
+    ])
+    return [
+        ("new_downtime", _stamp(encode_message(new), 1), 1),
+        ("downtime_resolved", _stamp(encode_message(resolved), 2), 1),
+        ("kpi_delta", _stamp(encode_message(kpi), 3), 1),
+        ("batch of 20", burst, 20),
+    ]
+
+
+def measure(codec, frame, rounds):
+    payload = codec.encode(frame)
+    cpu = time.process_time()
+    for _ in range(rounds):
+        codec.encode(frame)
+    us = (time.process_time() - cpu) * 1e6 / rounds
+    return len(payload), us
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rounds", type=int, default=20000)
+    parser.add_argument("--level", type=int, nargs="+", default=[6])
+    parser.add_argument("--window-bits", type=int, nargs="+", default=[12])
+    parser.add_argument("--min-bytes", type=int, default=200)
+    args = parser.parse_args()
+
+    if msgpack is None:
+        print("msgpack not installed: only JSON encodings are available")
+
+    frames = payloads()
+    for level in args.level:
+        for window_bits in args.window_bits:
+            codecs = build_codecs(level, window_bits, args.min_bytes)
+            print(f"\nlevel={level} window_bits={window_bits} min_bytes={args.min_bytes}")
+            print(f"{'payload':<18} {'encoding':<16} {'bytes':>7} {'bytes/event':>12} {'vs json':>8} {'us/encode':>10}")
+            for label, frame, events in frames:
+                baseline = len(frame.encode("utf-8"))
+                for codec in codecs.values():
+                    size, us = measure(codec, frame, args.rounds // events)
+                    print(
+                        f"{label:<18} {codec.name:<16} {size:>7} {size / events:>12.1f} "
+                        f"{size / baseline:>7.0%} {us:>10.2f}"
+                    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+# benchmarks/bench_ws_fanout.py
+"""
+Filtered fan-out: CPU per broadcast and frames sent when managers subscribe
+to their own machines, vs every manager receiving every event.
+
+Run from quickdowntime-backend/:
+
+    python -m benchmarks.bench_ws_fanout
+    python -m benchmarks.bench_ws_fanout --connections 2000 10000 --filtered-share 0.9
+
+Each filtered socket follows one machine (round-robin over the fixture
+machines), and a share of those also sets min_severity=high.
+"""
+import argparse
+import asyncio
+import random
+import time
+
+import benchmarks.offline_env  # noqa: F401  (must precede app imports)
+from app.services.websocket_manager import WebSocketManager
+from app.services.ws_topics import Subscription
+from benchmarks.bench_ws_broadcast import FakeSocket, drain
+from benchmarks.fixtures import MACHINES, make_history
+
+
+def messages(n):
+    return [
+        {
+            "type": "new_downtime",
+            "id": row["id"],
+            "machine_id": row["machine_id"],
+            "reason": row["reason"],
+            "severity": row["severity"],
+            "operator_id": row["operator_id"],
+            "created_at": row["created_at"],
+        }
+        for row in make_history(n)
+    ]
+
+
+async def measure(n, events, filtered_share, rng):
+    sockets = [FakeSocket() for _ in range(n)]
+    manager = WebSocketManager(queue_size=len(events) + 2)
+
+    for i, sock in enumerate(sockets):
+        subscription = None
+        if rng.random() < filtered_share:
+            params = {"machines": MACHINES[i % len(MACHINES)]}
+            if rng.random() < 0.3:
+                params["min_severity"] = "high"
+            subscription = Subscription.from_params(params)
+        await manager.connect_role(sock, "manager", subscription=subscription)
+    await drain(manager)
+
+    sent_before = sum(o.sent for o in manager._outboxes.values())
+    cpu = time.process_time()
+    for message in events:
+        await manager.broadcast_managers(message)
+        await drain(manager)
+    cpu_ms = (time.process_time() - cpu) * 1000 / len(events)
+    frames = (sum(o.sent for o in manager._outboxes.values()) - sent_before) / len(events)
+
+    writers = [outbox.task for outbox in manager._outboxes.values()]
+    for sock in sockets:
+        manager.disconnect(sock)
+    await asyncio.gather(*writers, return_exceptions=True)
+    return cpu_ms, frames
+
+
+async def run(args):
+    rng = random.Random(args.seed)
+    events = messages(args.broadcasts)
+    print(f"broadcasts={args.broadcasts} machines={len(MACHINES)} filtered_share={args.filtered_share}")
+    for n in args.connections:
+        all_ms, all_frames = await measure(n, events, 0.0, rng)
+        filt_ms, filt_frames = await measure(n, events, args.filtered_share, rng)
+        print(
+            f"{n:>7} connections  unfiltered {all_ms:>8.2f} ms cpu, {all_frames:>7.0f} frames/broadcast  "
+            f"filtered {filt_ms:>8.2f} ms cpu, {filt_frames:>7.0f} frames/broadcast"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--connections", type=int, nargs="+", default=[1000, 5000])
+    parser.add_argument("--broadcasts", type=int, default=20)
+    parser.add_argument("--filtered-share", type=float, default=0.9)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+# benchmarks/fixtures.py
+"""Synthetic downtime_logs rows shaped like the real Supabase table."""
+import random
+from datetime import datetime, timedelta
+
+MACHINES = [
+    "Hot Strip Mill",
+    "Cold Rolling Mill",
+    "Blast Furnace",
+    "Basic Oxygen Furnace",
+    "Continuous Casting Machine",
+    "Plate Mill",
+    "Wire Rod Mill",
+    "Galvanizing Line",
+    "Pickling Line",
+    "Sinter Plant",
+]
+
+REASONS = [
+    ("Motor trip", "Electrical", "Overload on main drive"),
+    ("Hydraulic leak", "Mechanical", "Worn seal on cylinder"),
+    ("Roll change", "Planned", "Scheduled roll change"),
+    ("Sensor fault", "Instrumentation", "Loose thermocouple connector"),
+    ("Conveyor jam", "Mechanical", "Misaligned idler"),
+    ("Power dip", "Electrical", "Grid voltage sag"),
+]
+
+SEVERITIES = ["low", "medium", "high", "critical"]
+
+
+def make_downtime(i: int, rng: random.Random, machine: str = None) -> dict:
+    reason, category, root_cause = rng.choice(REASONS)
+    created = datetime(2025, 1, 1) + timedelta(minutes=17 * i)
+    return {
+        "id": i,
+        "machine_id": machine or rng.choice(MACHINES),
+        "reason": reason,
+        "category": category,
+        "description": f"{reason} reported by shift crew near bay {rng.randint(1, 12)}",
+        "duration_minutes": rng.randint(5, 240),
+        "image_path": f"./app/uploads/img_{i:08x}.jpg",
+        "audio_path": f"./app/uploads/aud_{i:08x}.webm",
+        "operator_id": str(rng.randint(1, 40)),
+        "operator_email": f"operator{rng.randint(1, 40)}@plant.example",
+        "status": rng.choice(["open", "resolved"]),
+        "severity": rng.choice(SEVERITIES),
+        "root_cause": root_cause,
+        "seen": rng.random() < 0.5,
+        "created_at": created.isoformat(),
+        "updated_at": created.isoformat(),
+        "start_time": created.isoformat(),
+        "end_time": None,
+        "resolved_at": None,
+        "resolved_by": None,
+        "resolution_notes": None,
+    }
+
+
+def make_history(n: int, seed: int = 7) -> list:
+    rng = random.Random(seed)
+    rows = [make_downtime(i, rng) for i in range(n)]
+    # newest first, as the routers query it
+    return list(reversed(rows))
@@ -0,0 +1,103 @@
+# benchmarks/memory_db.py
+"""
+In-memory replacement for the Supabase client, covering the query-builder
+calls the ingest path makes (insert / update / select with eq, order,
+limit, single). Lets benchmarks drive the real routers without network.
+"""
+import itertools
+import threading
+import time
+from datetime import datetime
+
+
+class _Result:
+    def __init__(self, data):
+        self.data = data
+
+
+class _Query:
+    def __init__(self, db, table):
+        self.db = db
+        self.table = table
+        self.op = "select"
+        self.payload = None
+        self.filters = []
+        self.order_by = None
+        self.desc = False
+        self.limit_n = None
+        self.single_row = False
+
+    def select(self, *_cols, **_kw):
+        self.op = "select"
+        return self
+
+    def insert(self, payload):
+        self.op, self.payload = "insert", payload
+        return self
+
+    def update(self, payload):
+        self.op, self.payload = "update", payload
+        return self
+
+    def eq(self, col, value):
+        self.filters.append(lambda r: r.get(col) == value)
+        return self
+
+    def gte(self, col, value):
+        self.filters.append(lambda r: r.get(col) is not None and str(r.get(col)) >= str(value))
+        return self
+
+    def order(self, col, desc=False):
+        self.order_by, self.desc = col, desc
+        return self
+
+    def limit(self, n):
+        self.limit_n = n
+        return self
+
+    def single(self):
+        self.single_row = True
+        return self
+
+    def execute(self):
+        if self.db.latency_ms:
+            time.sleep(self.db.latency_ms / 1000)
+        with self.db.lock:
+            rows = self.db.tables.setdefault(self.table, [])
+
+            if self.op == "insert":
+                items = self.payload if isinstance(self.payload, list) else [self.payload]
+                out = []
+                for item in items:
+                    row = {"id": next(self.db.ids), "created_at": datetime.utcnow().isoformat(), **item}
+                    rows.append(row)
+                    out.append(dict(row))
+                return _Result(out)
+
+            matched = [r for r in rows if all(f(r) for f in self.filters)]
+
+            if self.op == "update":
+                for row in matched:
+                    row.update(self.payload)
+                return _Result([dict(r) for r in matched])
+
+            if self.order_by:
+                matched.sort(key=lambda r: str(r.get(self.order_by) or ""), reverse=self.desc)
+            if self.limit_n is not None:
+                matched = matched[:self.limit_n]
+            data = [dict(r) for r in matched]
+            if self.single_row:
+                return _Result(data[0] if data else None)
+            return _Result(data)
+
+
+class MemoryDB:
+    def __init__(self, latency_ms: float = 0.0, seed_rows=None):
+        self.latency_ms = latency_ms
+        self.lock = threading.Lock()
+        self.tables = {"downtime_logs": [dict(r) for r in (seed_rows or [])]}
+        start = max((r["id"] for r in self.tables["downtime_logs"]), default=0) + 1
+        self.ids = itertools.count(start)
+
+    def table(self, name):
+        return _Query(self, name)
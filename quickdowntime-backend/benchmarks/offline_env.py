@@ -0,0 +1,13 @@
+# benchmarks/offline_env.py
+"""
+Import first in offline benchmarks: Settings are read at import time and
+none of these need real credentials.
+"""
+import os
+import tempfile
+
+os.environ.setdefault("SUPABASE_URL", "http://localhost:54321")
+os.environ.setdefault("SUPABASE_SERVICE_KEY", "bench.bench.bench")
+os.environ.setdefault("SECRET_KEY", "bench")
+os.environ.setdefault("DATA_DIR", tempfile.mkdtemp(prefix="qd-bench-"))
+os.environ.setdefault("AI_BACKEND", "local")
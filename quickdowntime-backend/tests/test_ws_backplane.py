@@ -0,0 +1,127 @@
+# tests/test_ws_backplane.py
+"""
+UnixSocketBackplane across real worker processes: each worker is a fresh
+interpreter bound to the same directory, like uvicorn --workers N.
+
+Run from quickdowntime-backend/:
+
+    python -m pytest tests/test_ws_backplane.py -q
+"""
+import json
+import os
+import socket
+import subprocess
+import sys
+
+import pytest
+
+pytestmark = pytest.mark.skipif(not hasattr(socket, "AF_UNIX"), reason="needs Unix sockets")
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# One worker: waits for the other to appear, optionally stops reading for
+# `stall` seconds (its receive queue fills up), publishes `count` frames
+# and collects the other's until it has them all or `timeout` passes.
+# `backlog` caps what it holds for a slow peer
+WORKER = """
+import asyncio, json, os, sys, time
+from app.services.ws_backplane import UnixSocketBackplane
+
+directory, name, count, stall, timeout, backlog = sys.argv[1], sys.argv[2], int(sys.argv[3]), float(sys.argv[4]), float(sys.argv[5]), int(sys.argv[6])
+UnixSocketBackplane.MAX_BACKLOG = backlog
+
+async def main():
+    received, losses = [], []
+    backplane = UnixSocketBackplane(directory)
+    backplane.attach(
+        lambda target, channel, frame, key, topics: received.append(json.loads(frame)),
+        lambda: losses.append(time.monotonic()),
+    )
+    await backplane.start()
+    loop = asyncio.get_running_loop()
+
+    deadline = time.monotonic() + timeout
+    while not backplane._peers() and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+        backplane._peers_listed_at = 0.0
+    # both sides must have found each other before anyone publishes
+    await asyncio.sleep(0.5)
+
+    if stall:
+        loop.remove_reader(backplane._sock.fileno())
+        loop.call_later(stall, loop.add_reader, backplane._sock.fileno(), backplane._on_readable)
+
+    for i in range(count):
+        await backplane.publish("all", None, json.dumps({"from": name, "i": i, "pad": "x" * 512}), None, {})
+
+    def theirs():
+        return [m["i"] for m in received if m["from"] != name]
+
+    while len(theirs()) < count and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    # let our own backlog reach the other side before closing
+    while backplane._backlog and time.monotonic() < deadline:
+        await asyncio.sleep(0.05)
+    await asyncio.sleep(0.2)
+
+    print(json.dumps({
+        "theirs": theirs(),
+        "own": len(received) - len(theirs()),
+        "losses": len(losses),
+        "stats": backplane.stats(),
+    }))
+    await backplane.stop()
+
+asyncio.run(main())
+"""
+
+
+def run_workers(directory, count, stalls=(0.0, 0.0), timeout=20.0, backlog=1024):
+    env = dict(os.environ, PYTHONPATH=BACKEND_DIR)
+    procs = [
+        subprocess.Popen(
+            [sys.executable, "-c", WORKER, str(directory), name, str(count), str(stall), str(timeout), str(backlog)],
+            cwd=BACKEND_DIR, env=env, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True,
+        )
+        for name, stall in zip(("a", "b"), stalls)
+    ]
+    results = []
+    for proc in procs:
+        out, err = proc.communicate(timeout=timeout + 10)
+        assert proc.returncode == 0, err
+        results.append(json.loads(out.strip().splitlines()[-1]))
+    return results
+
+
+def test_broadcasts_reach_the_other_worker(tmp_path):
+    a, b = run_workers(tmp_path, count=50)
+
+    for result in (a, b):
+        # every frame from the other worker, once, in order; own ones locally
+        assert result["theirs"] == list(range(50))
+        assert result["own"] == 50
+        assert result["losses"] == 0
+
+
+def test_full_receive_queue_is_retried_not_dropped(tmp_path):
+    # b stops reading for a second while a publishes far more than fits
+    # in a Unix datagram queue
+    a, b = run_workers(tmp_path, count=300, stalls=(0.0, 1.0))
+
+    assert b["theirs"] == list(range(300))
+    assert b["losses"] == 0
+    assert a["stats"]["deferred"] > 0
+    assert a["stats"]["dropped"] == 0
+    assert a["theirs"] == list(range(300))
+
+
+def test_backlog_overflow_is_reported_to_the_receiver(tmp_path):
+    # a can hold only 20 frames for b, so most are dropped; b must notice
+    a, b = run_workers(tmp_path, count=300, stalls=(0.0, 1.0), timeout=8.0, backlog=20)
+
+    assert a["stats"]["dropped"] > 0
+    assert b["losses"] > 0
+    assert b["stats"]["lost"] == a["stats"]["dropped"]
+    # what did arrive is still in order, ending with the newest
+    assert b["theirs"] == sorted(b["theirs"])
+    assert b["theirs"][-1] == 299
@@ -1,5 +1,6 @@
 // src/api/axiosClient.ts
 import axios from "axios";
+import { useAuth } from "../store/authStore";
 
 const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8000";
 
@@ -16,11 +17,24 @@ client.interceptors.request.use((config) => {
 
 client.interceptors.response.use(
   res => res,
-  err => {
+  async err => {
     const status = err.response?.status;
+    const config: any = err.config;
+
+    // Expired access token: renew it once through the refresh token and
+    // replay the request (no password needed)
+    if (status === 401 && config && !config._retried && !config.url?.startsWith("/auth/")) {
+      config._retried = true;
+      const token = await useAuth.getState().refresh();
+      if (token) {
+        config.headers.Authorization = `Bearer ${token}`;
+        return client(config);
+      }
+    }
 
     if (status === 401 || status === 403) {
       localStorage.removeItem("token");
+      localStorage.removeItem("refresh_token");
       window.location.href = "/";
     }
 
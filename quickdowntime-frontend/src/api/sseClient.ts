@@ -0,0 +1,53 @@
+// src/api/sseClient.ts
+// EventSource can't send the Authorization header, so SSE endpoints are
+// read with fetch + a streaming body reader instead.
+
+const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8000";
+
+export type SSEHandler = (event: string, data: any) => void;
+
+export async function streamSSE(path: string, onEvent: SSEHandler, signal?: AbortSignal) {
+  const token = localStorage.getItem("token");
+  const res = await fetch(`${API_BASE}${path}`, {
+    headers: {
+      Accept: "text/event-stream",
+      ...(token ? { Authorization: `Bearer ${token}` } : {}),
+    },
+    signal,
+  });
+
+  if (!res.ok || !res.body) {
+    throw new Error(`SSE request failed: ${res.status}`);
+  }
+
+  const reader = res.body.getReader();
+  const decoder = new TextDecoder();
+  let buffer = "";
+
+  while (true) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buffer += decoder.decode(value, { stream: true });
+
+    // frames are separated by a blank line
+    let sep;
+    while ((sep = buffer.indexOf("\n\n")) !== -1) {
+      const frame = buffer.slice(0, sep);
+      buffer = buffer.slice(sep + 2);
+
+      let event = "message";
+      const dataLines: string[] = [];
+      for (const line of frame.split("\n")) {
+        if (line.startsWith("event:")) event = line.slice(6).trim();
+        else if (line.startsWith("data:")) dataLines.push(line.slice(5).trim());
+      }
+      if (!dataLines.length) continue;
+
+      try {
+        onEvent(event, JSON.parse(dataLines.join("\n")));
+      } catch (e) {
+        console.warn("Bad SSE frame", frame, e);
+      }
+    }
+  }
+}
@@ -26,6 +26,7 @@ export default function ManagerLayout({ children }: Props) {
   // Real-time alert count from Zustand
   const alertCount = useAlertStore((s) => s.count);
   const setCount = useAlertStore((s) => s.setCount);
+  const hasLiveKpis = useAlertStore((s) => s.kpis !== null);
 
   // 🔥 Fetch alert count from API
   const fetchAlertCount = async () => {
@@ -37,18 +38,10 @@ export default function ManagerLayout({ children }: Props) {
     }
   };
 
-  // 🔥 Fetch count on mount and when route changes
+  // 🔥 Fetch count once until the WebSocket snapshot arrives; after that
+  // the server pushes kpi_delta messages, so there is nothing to poll
   useEffect(() => {
-    fetchAlertCount();
-  }, [location.pathname]);
-
-  // 🔥 Optional: Poll for new alerts every 30 seconds
-  useEffect(() => {
-    const interval = setInterval(() => {
-      fetchAlertCount();
-    }, 30000); // 30 seconds
-
-    return () => clearInterval(interval);
+    if (!hasLiveKpis) fetchAlertCount();
   }, []);
 
   const navItems = [
@@ -19,7 +19,7 @@ export default function Login() {
         console.log("✔️ Response:", r.data);
 
         const token = r.data.access_token;
-        setToken(token);
+        setToken(token, r.data.refresh_token);
         console.log("✔️ Token saved");
 
         const payload: any = jwtDecode(token);
@@ -1,6 +1,7 @@
 import { useEffect, useState } from "react";
 import ManagerLayout from "../../components/layout/ManagerLayout";
 import client from "../../api/axiosClient";
+import { streamSSE } from "../../api/sseClient";
 
 export default function AIInsights() {
   const [daily, setDaily] = useState<any>(null);
@@ -9,20 +10,48 @@ export default function AIInsights() {
   const [activeTab, setActiveTab] = useState<'daily' | 'weekly'>('daily');
 
   useEffect(() => {
-    load();
+    const controller = new AbortController();
+    load(controller.signal);
+    return () => controller.abort();
   }, []);
 
-  const load = async () => {
+  // Stream the analysis text as the model writes it; the final "done"
+  // frame carries machine_stats / cause_stats
+  const streamInto = async (
+    path: string,
+    setData: (fn: (prev: any) => any) => void,
+    signal: AbortSignal
+  ) => {
+    await streamSSE(path, (event, data) => {
+      if (event === "chunk") {
+        setLoading(false);
+        setData((prev) => ({ ...prev, analysis: (prev?.analysis || "") + data.text }));
+      } else if (event === "done") {
+        setData((prev) => ({ ...prev, ...data, analysis: prev?.analysis ?? data.analysis }));
+      }
+    }, signal);
+  };
+
+  const load = async (signal: AbortSignal) => {
     try {
-      const [dailyRes, weeklyRes] = await Promise.all([
-        client.get("/api/ai/analysis/daily"),
-        client.get("/api/ai/analysis/weekly")
+      await Promise.all([
+        streamInto("/api/ai/analysis/daily/stream", setDaily, signal),
+        streamInto("/api/ai/analysis/weekly/stream", setWeekly, signal),
       ]);
-
-      setDaily(dailyRes.data);
-      setWeekly(weeklyRes.data);
     } catch (err) {
-      console.error("AI error:", err);
+      if (signal.aborted) return;
+      console.warn("AI stream failed, falling back:", err);
+      try {
+        const [dailyRes, weeklyRes] = await Promise.all([
+          client.get("/api/ai/analysis/daily"),
+          client.get("/api/ai/analysis/weekly")
+        ]);
+
+        setDaily(dailyRes.data);
+        setWeekly(weeklyRes.data);
+      } catch (err2) {
+        console.error("AI error:", err2);
+      }
     } finally {
       setLoading(false);
     }
@@ -158,6 +187,11 @@ function Section({ title, data, icon, color }: any) {
             <path strokeLinecap="round" strokeLinejoin="round" strokeWidth={2} d="M13 10V3L4 14h7v7l9-11h-7z" />
           </svg>
           <h3 className="text-sm font-semibold text-gray-400">AI Analysis</h3>
+          {data?.generated_at && (
+            <span className="ml-auto text-xs text-gray-500">
+              Updated {new Date(data.generated_at + "Z").toLocaleString()}
+            </span>
+          )}
         </div>
         <div className="text-gray-300 whitespace-pre-wrap leading-relaxed">
           {data?.analysis || "No analysis available"}
@@ -1,10 +1,11 @@
 //app/src/pages/manager/Dashboard.tsx
 
-import { useEffect, useState, useRef } from "react";
+import { useEffect, useState } from "react";
 import { useNavigate } from "react-router-dom";
 import client from "../../api/axiosClient";
 import ManagerLayout from "../../components/layout/ManagerLayout";
 import { useAlertStore } from "../../store/alertStore";
+import { wsClient } from "../../services/wsClient";
 import { Activity, AlertTriangle, CheckCircle, AlertOctagon } from "lucide-react";
 
 export default function ManagerDashboard() {
@@ -13,14 +14,18 @@ export default function ManagerDashboard() {
   const [machines, setMachines] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const setAlertCount = useAlertStore((s) => s.setCount);
-  const increment = useAlertStore((s) => s.increment);
   const navigate = useNavigate();
 
-  const wsRef = useRef<WebSocket | null>(null);
-
   useEffect(() => {
     load();
-    setupWS();
+    // shared manager socket (keepalive, replay, batched bursts)
+    const offMessage = wsClient.addMessageListener(onWSMessage);
+    // missed more broadcasts than the server could replay
+    const offResync = wsClient.addResyncListener(load);
+    return () => {
+      offMessage();
+      offResync();
+    };
   }, []);
 
   const load = async () => {
@@ -35,41 +40,19 @@ export default function ManagerDashboard() {
       setAlerts(a.data);
       setMachines(m.data);
       
-      // ✅ Count only UNSEEN alerts
-      const unseenCount = a.data.filter((alert: any) => !alert.seen).length;
-      setAlertCount(unseenCount);
+      // ✅ Count ALL unseen alerts, not just the 5 shown here
+      setAlertCount(s.data.unseen_alerts ?? 0);
     } catch (err) {
       console.log("Dashboard load error:", err);
     }
     setLoading(false);
   };
 
-  const setupWS = () => {
-    const token = localStorage.getItem("token");
-    if (!token) return;
-
-    const ws = new WebSocket(
-      `${import.meta.env.VITE_WS_URL}/api/ws/manager?token=${token}`
-    );
-
-    wsRef.current = ws;
-
-    ws.onmessage = (e) => {
-      try {
-        const msg = JSON.parse(e.data);
-
-        if (msg.type === "new_downtime_with_ai") {
-          setAlerts((prev) => [msg.downtime, ...prev.slice(0, 4)]);
-          increment();
-          load(); // Refresh all data including machine status
-        }
-      } catch (err) {
-        console.log("WS message parse error", err);
-      }
-    };
-
-    ws.onerror = (e) => console.log("WS error:", e);
-    ws.onclose = () => console.log("WS closed");
+  const onWSMessage = (msg: any) => {
+    if (msg.type === "new_downtime_with_ai") {
+      setAlerts((prev) => [msg.downtime, ...prev.slice(0, 4)]);
+      load(); // Refresh all data including machine status
+    }
   };
 
   return (
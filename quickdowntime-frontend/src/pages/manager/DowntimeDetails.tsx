@@ -1,7 +1,8 @@
-import { useEffect, useState, useRef } from "react";
+import { useEffect, useState } from "react";
 import { useParams } from "react-router-dom";
 import ManagerLayout from "../../components/layout/ManagerLayout";
 import client from "../../api/axiosClient";
+import { wsClient } from "../../services/wsClient";
 
 export default function DowntimeDetails() {
   const { id } = useParams();
@@ -9,11 +10,14 @@ export default function DowntimeDetails() {
   const [analysis, setAnalysis] = useState<any>(null);
   const [loading, setLoading] = useState(true);
 
-  const wsRef = useRef<WebSocket | null>(null);
-
   useEffect(() => {
     load();
-    setupWS();
+    // shared manager socket instead of a page-local one
+    return wsClient.addMessageListener((msg) => {
+      if (msg.type === "downtime_resolved" && Number(msg.id) === Number(id)) {
+        load(); // auto refresh
+      }
+    });
   }, []);
 
   const load = async () => {
@@ -29,27 +33,6 @@ export default function DowntimeDetails() {
     setLoading(false);
   };
 
-  const setupWS = () => {
-    const token = localStorage.getItem("token");
-    if (!token) return;
-
-    const ws = new WebSocket(
-      `${import.meta.env.VITE_WS_URL}/api/ws/manager?token=${token}`
-    );
-
-    wsRef.current = ws;
-
-    ws.onmessage = (e) => {
-      try {
-        const msg = JSON.parse(e.data);
-
-        if (msg.type === "downtime_resolved" && Number(msg.id) === Number(id)) {
-          load(); // auto refresh
-        }
-      } catch {}
-    };
-  };
-
   const resolve = async () => {
     const notes = prompt("Enter resolution notes:");
     if (notes === null) return;
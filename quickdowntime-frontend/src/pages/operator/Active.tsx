@@ -1,10 +1,14 @@
-import { useEffect, useState } from "react";
+import { useEffect, useRef, useState } from "react";
 import client from "../../api/axiosClient"; 
+import { wsClient } from "../../services/wsClient";
+import { useAuth } from "../../store/authStore";
 
 export default function OperatorActive() {
   const [activeList, setActiveList] = useState<any[]>([]);
   const [loading, setLoading] = useState(true);
   const [resolving, setResolving] = useState<number | null>(null);
+  const activeCount = useRef(0);
+  activeCount.current = activeList.length;
 
   async function loadActive() {
     try {
@@ -41,8 +45,35 @@ export default function OperatorActive() {
 
   useEffect(() => {
     loadActive();
-    const interval = setInterval(loadActive, 10000);
-    return () => clearInterval(interval);
+
+    // Live updates instead of polling: the operator socket only carries
+    // this operator's downtimes and open-downtime count
+    const token = useAuth.getState().token ?? localStorage.getItem("token");
+    if (token) wsClient.connect(token, "operator");
+
+    const offMessage = wsClient.addMessageListener((msg) => {
+      switch (msg.type) {
+        case "downtime_resolved":
+          setActiveList(prev => prev.filter(item => item.id !== msg.id));
+          break;
+        case "kpi_snapshot":
+          // (re)connected: only refetch if we're out of step
+          if (msg.kpis?.open_downtimes !== activeCount.current) loadActive();
+          break;
+        case "kpi_delta":
+          // raised elsewhere (another device, offline sync)
+          if ((msg.delta?.open_downtimes ?? 0) > 0) loadActive();
+          break;
+        default:
+          break;
+      }
+    });
+    const offResync = wsClient.addResyncListener(loadActive);
+
+    return () => {
+      offMessage();
+      offResync();
+    };
   }, []);
 
   if (loading) {
@@ -15,7 +15,9 @@ export default function OperatorQueue() {
 
   async function retry(item: any) {
     try {
-      await client.post("/api/operator/log", item);
+      await client.post("/api/operator/log", item, {
+        headers: { "Idempotency-Key": item.id },
+      });
       await deleteOutbox(item.id);
       load();
       alert("Sent");
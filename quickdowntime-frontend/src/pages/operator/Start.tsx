@@ -69,7 +69,7 @@ export default function OperatorStart() {
   }
 
   // ---- ONLINE (MULTIPART) SUBMIT ----
-  async function submitOnline(payload: any) {
+  async function submitOnline(payload: any, idempotencyKey: string) {
     const form = new FormData();
     form.append("machine_id", payload.machine_id);
 
@@ -83,7 +83,10 @@ export default function OperatorStart() {
     if (payload.audio_file) form.append("audio", payload.audio_file);
 
     return client.post("/api/operator/log", form, {
-      headers: { "Content-Type": "multipart/form-data" },
+      headers: {
+        "Content-Type": "multipart/form-data",
+        "Idempotency-Key": idempotencyKey,
+      },
     });
   }
 
@@ -91,10 +94,14 @@ export default function OperatorStart() {
   async function submit(payload: any) {
     const online = navigator.onLine;
 
+    // One key per submission: online retries and the offline queue reuse it,
+    // so the server never logs the same downtime twice
+    const id = uuidv4();
+
     if (online) {
       try {
         if (payload.image_file || payload.audio_file) {
-          await submitOnline(payload);
+          await submitOnline(payload, id);
           alert("Submitted online");
           return;
         }
@@ -107,6 +114,8 @@ export default function OperatorStart() {
           description: payload.description,
           image_base64: payload.image_base64 || null,
           audio_base64: payload.audio_base64 || null,
+        }, {
+          headers: { "Idempotency-Key": id },
         });
 
         alert("Submitted online (JSON)");
@@ -117,7 +126,6 @@ export default function OperatorStart() {
     }
 
     // ---- OFFLINE QUEUE ----
-    const id = uuidv4();
     const queued = {
       id,
       created_at: new Date().toISOString(),
@@ -1,17 +1,33 @@
 // src/services/wsClient.ts
 /* eslint-disable no-console */
+import { decodeFrame, offeredProtocols } from "./wsCodec";
+
 type MessageHandler = (msg: any) => void;
 
+// Reconnect window after a server restart that gave no retry hint
+// (matches the server's WS_DRAIN_RECONNECT_SPREAD_SECONDS default)
+const RESTART_SPREAD_MS = 20_000;
+
 class WSClient {
   private ws: WebSocket | null = null;
   private url = import.meta.env.VITE_WS_URL || "ws://localhost:8000";
   private token: string | null = null;
+  private role = "manager"; // socket endpoint: /api/ws/manager or /api/ws/operator
 
   // reconnection
   private reconnectAttempts = 0;
   private maxReconnectAttempts = 20;
   private reconnectTimer: ReturnType<typeof setTimeout> | null = null;
 
+  // replay: last broadcast seen, so a reconnect only receives what was missed
+  private lastSeq: number | null = null;
+  private epoch: string | null = null;
+  private resyncListeners = new Set<() => void>();
+  private messageListeners = new Set<MessageHandler>();
+
+  // binary frames may need async inflate; keep them in arrival order
+  private decodeChain: Promise<void> = Promise.resolve();
+
   // heartbeat
   private pingTimer: ReturnType<typeof setInterval> | null = null;
   private pingIntervalMs = 30000; // 30s
@@ -81,15 +97,23 @@ class WSClient {
     return !!(this.ws && this.ws.readyState === WebSocket.OPEN);
   }
 
-  public connect(token?: string) {
+  public connect(token?: string, role?: string) {
     const newToken = token ?? this.token;
     if (!newToken) {
       this.log("No token provided - not connecting");
       return;
     }
     this.token = newToken;
+    if (role && role !== this.role) {
+      // different endpoint: sequence numbers don't carry over
+      this.disconnect();
+      this.role = role;
+    }
 
-    if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+    if (
+      this.ws &&
+      (this.ws.readyState === WebSocket.OPEN || this.ws.readyState === WebSocket.CONNECTING)
+    ) {
       this.log("WS already open");
       return;
     }
@@ -99,9 +123,15 @@ class WSClient {
       this.reconnectTimer = null;
     }
 
-    const url = `${this.url}/api/ws/manager?token=${encodeURIComponent(this.token)}`;
+    let url = `${this.url}/api/ws/${this.role}?token=${encodeURIComponent(this.token)}`;
+    if (this.lastSeq !== null && this.epoch) {
+      url += `&last_seq=${this.lastSeq}&epoch=${encodeURIComponent(this.epoch)}`;
+    }
     this.log("Connecting to", url);
-    this.ws = new WebSocket(url);
+    // offer compact encodings; the server picks one or falls back to JSON text
+    const ws = new WebSocket(url, offeredProtocols());
+    ws.binaryType = "arraybuffer";
+    this.ws = ws;
 
     this.ws.onopen = () => {
       this.log("Connected");
@@ -111,21 +141,102 @@ class WSClient {
     };
 
     this.ws.onmessage = (ev) => {
-      let data: any = null;
-      try {
-        data = JSON.parse(ev.data);
-      } catch (e) {
-        this.log("Non-JSON WS message:", ev.data);
+      this.decodeChain = this.decodeChain.then(async () => {
+        let data: any = null;
+        try {
+          data = await decodeFrame(ev.data, ws.protocol);
+        } catch (e) {
+          this.log("Undecodable WS message:", ev.data, e);
+          return;
+        }
+        // socket replaced while this frame was being decoded
+        if (this.ws !== ws) return;
+        this.handleFrame(data);
+      });
+    };
+
+    this.ws.onerror = (err) => {
+      this.log("WS error", err);
+      this.onError?.(err);
+    };
+
+    this.ws.onclose = (ev) => {
+      this.log("WS closed", ev.code, ev.reason);
+      this.stopPing();
+      this.onClose?.(ev.code);
+      if (ev.code === 1000 || ev.code === 4001 || ev.code === 4003) {
+        this.log("Not reconnecting (clean/auth close)");
         return;
       }
-
-      if (data?.type === "pong") {
-        this.log("pong");
+      if (ev.code === 1012) {
+        // server restarting: wait the delay it handed out ("retry=<ms>"),
+        // or a random one if it closed without a hint, so clients don't
+        // all reconnect to the next instance at once
+        const hint = /retry=(\d+)/.exec(ev.reason || "");
+        const delay = hint ? Number(hint[1]) : Math.random() * RESTART_SPREAD_MS;
+        this.reconnectAttempts = 0;
+        this.scheduleReconnect(delay + Math.random() * 1000);
         return;
       }
+      this.scheduleReconnect();
+    };
+  }
+
+  private handleFrame(data: any) {
+    if (data?.type === "pong") {
+      this.log("pong");
+      return;
+    }
+
+    if (data?.type === "ping") {
+      // server keepalive: answer or get dropped as idle
+      this.send({ type: "pong" });
+      return;
+    }
+
+    if (data?.type === "hello") {
+      // fresh connection or server restart: start counting from here
+      if (this.epoch !== data.epoch || this.lastSeq === null) {
+        this.epoch = data.epoch;
+        this.lastSeq = data.seq;
+      }
+      return;
+    }
+
+    if (data?.type === "resync") {
+      // gap larger than the server's replay buffer: refetch everything
+      this.log("Resync required");
+      this.epoch = data.epoch;
+      this.lastSeq = data.seq;
+      this.resyncListeners.forEach((fn) => fn());
+      return;
+    }
+
+    if (data?.type === "batch" && Array.isArray(data.events)) {
+      // a burst coalesced by the server: one sound / notification for all
+      let notified = false;
+      data.events.forEach((event: any) => {
+        if (this.handleEvent(event, !notified)) notified = true;
+      });
+      return;
+    }
 
-      // play sound + notification for key types
-      if (data?.type === "new_downtime" || data?.type === "new_downtime_with_ai") {
+    this.handleEvent(data, true);
+  }
+
+  // Returns true if it raised a new-downtime alert
+  private handleEvent(data: any, notify: boolean): boolean {
+    if (typeof data?.seq === "number") {
+      // already seen (replayed and also delivered live)
+      if (this.lastSeq !== null && data.seq <= this.lastSeq) return false;
+      this.lastSeq = data.seq;
+    }
+
+    let alerted = false;
+    // play sound + notification for key types
+    if (data?.type === "new_downtime" || data?.type === "new_downtime_with_ai") {
+      alerted = true;
+      if (notify) {
         // play sound & show notification (UI will also update via hook)
         this.playSound();
         if (Notification.permission === "granted") {
@@ -138,42 +249,56 @@ class WSClient {
           } catch {}
         }
       }
+    }
 
-      this.onMessage && this.onMessage(data);
-    };
-
-    this.ws.onerror = (err) => {
-      this.log("WS error", err);
-      this.onError?.(err);
-    };
+    this.onMessage && this.onMessage(data);
+    this.messageListeners.forEach((fn) => fn(data));
+    return alerted;
+  }
 
-    this.ws.onclose = (ev) => {
-      this.log("WS closed", ev.code, ev.reason);
-      this.stopPing();
-      this.onClose?.(ev.code);
-      if (ev.code === 1000 || ev.code === 4001 || ev.code === 4003) {
-        this.log("Not reconnecting (clean/auth close)");
-        return;
+  private send(message: any) {
+    try {
+      if (this.ws && this.ws.readyState === WebSocket.OPEN) {
+        this.ws.send(JSON.stringify(message));
       }
-      this.scheduleReconnect();
-    };
+    } catch (e) {
+      this.log("Send failed", e);
+    }
   }
 
-  private scheduleReconnect() {
+  private scheduleReconnect(delayMs?: number) {
     if (this.reconnectAttempts >= this.maxReconnectAttempts) {
       this.log("Max reconnect attempts reached");
       return;
     }
     this.reconnectAttempts++;
-    const delay = Math.min(1000 * Math.pow(2, this.reconnectAttempts), 30000);
+    const delay = delayMs ?? Math.min(1000 * Math.pow(2, this.reconnectAttempts), 30000);
     this.log(`Reconnecting in ${delay}ms (attempt ${this.reconnectAttempts})`);
     this.reconnectTimer = setTimeout(() => {
       this.connect(this.token ?? undefined);
     }, delay);
   }
 
+  // Called when missed events can't be replayed and state must be refetched
+  public addResyncListener(fn: () => void) {
+    this.resyncListeners.add(fn);
+    return () => {
+      this.resyncListeners.delete(fn);
+    };
+  }
+
+  // Extra message handlers (pages), alongside the onMessage hook
+  public addMessageListener(fn: MessageHandler) {
+    this.messageListeners.add(fn);
+    return () => {
+      this.messageListeners.delete(fn);
+    };
+  }
+
   public disconnect() {
     this.log("Manual disconnect");
+    this.lastSeq = null;
+    this.epoch = null;
     if (this.reconnectTimer) {
       clearTimeout(this.reconnectTimer);
       this.reconnectTimer = null;
@@ -190,13 +315,7 @@ class WSClient {
   private startPing() {
     this.stopPing();
     this.pingTimer = setInterval(() => {
-      try {
-        if (this.ws && this.ws.readyState === WebSocket.OPEN) {
-          this.ws.send(JSON.stringify({ type: "ping", ts: Date.now() }));
-        }
-      } catch (e) {
-        this.log("Ping failed", e);
-      }
+      this.send({ type: "ping", ts: Date.now() });
     }, this.pingIntervalMs);
   }
 
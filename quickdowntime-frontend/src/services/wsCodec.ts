@@ -0,0 +1,110 @@
+// src/services/wsCodec.ts
+// Wire encodings negotiated with the server through Sec-WebSocket-Protocol.
+// Text frames are JSON. Binary frames are one flag byte (0 = plain,
+// 1 = raw-deflated) followed by a MessagePack or UTF-8 JSON body.
+
+export const MSGPACK_DEFLATE = "quickdowntime.msgpack+deflate";
+export const MSGPACK = "quickdowntime.msgpack";
+export const JSON_DEFLATE = "quickdowntime.json+deflate";
+export const JSON_TEXT = "quickdowntime.json";
+
+const FLAG_DEFLATE = 1;
+
+const canInflate = typeof DecompressionStream !== "undefined";
+
+// Subprotocols to offer, best first. VITE_WS_ENCODING=json opts out.
+export function offeredProtocols(): string[] {
+  if (import.meta.env.VITE_WS_ENCODING === "json") return [JSON_TEXT];
+  return canInflate ? [MSGPACK_DEFLATE, MSGPACK, JSON_TEXT] : [MSGPACK, JSON_TEXT];
+}
+
+async function inflate(bytes: Uint8Array): Promise<Uint8Array> {
+  const stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("deflate-raw"));
+  return new Uint8Array(await new Response(stream).arrayBuffer());
+}
+
+const utf8 = new TextDecoder();
+
+// Decode-only MessagePack (everything the server's msgpack.packb can emit
+// for JSON-shaped data)
+export function unpack(bytes: Uint8Array): any {
+  const view = new DataView(bytes.buffer, bytes.byteOffset, bytes.byteLength);
+  let pos = 0;
+
+  const str = (n: number) => {
+    const s = utf8.decode(bytes.subarray(pos, pos + n));
+    pos += n;
+    return s;
+  };
+  const bin = (n: number) => {
+    const b = bytes.slice(pos, pos + n);
+    pos += n;
+    return b;
+  };
+  const array = (n: number) => {
+    const out = new Array(n);
+    for (let i = 0; i < n; i++) out[i] = read();
+    return out;
+  };
+  const map = (n: number) => {
+    const out: Record<string, any> = {};
+    for (let i = 0; i < n; i++) {
+      const key = read();
+      out[String(key)] = read();
+    }
+    return out;
+  };
+
+  function read(): any {
+    const byte = bytes[pos++];
+
+    if (byte <= 0x7f) return byte;
+    if (byte >= 0xe0) return byte - 0x100;
+    if (byte >= 0x80 && byte <= 0x8f) return map(byte & 0x0f);
+    if (byte >= 0x90 && byte <= 0x9f) return array(byte & 0x0f);
+    if (byte >= 0xa0 && byte <= 0xbf) return str(byte & 0x1f);
+
+    let value: any;
+    switch (byte) {
+      case 0xc0: return null;
+      case 0xc2: return false;
+      case 0xc3: return true;
+      case 0xc4: value = view.getUint8(pos); pos += 1; return bin(value);
+      case 0xc5: value = view.getUint16(pos); pos += 2; return bin(value);
+      case 0xc6: value = view.getUint32(pos); pos += 4; return bin(value);
+      case 0xca: value = view.getFloat32(pos); pos += 4; return value;
+      case 0xcb: value = view.getFloat64(pos); pos += 8; return value;
+      case 0xcc: value = view.getUint8(pos); pos += 1; return value;
+      case 0xcd: value = view.getUint16(pos); pos += 2; return value;
+      case 0xce: value = view.getUint32(pos); pos += 4; return value;
+      case 0xcf: value = Number(view.getBigUint64(pos)); pos += 8; return value;
+      case 0xd0: value = view.getInt8(pos); pos += 1; return value;
+      case 0xd1: value = view.getInt16(pos); pos += 2; return value;
+      case 0xd2: value = view.getInt32(pos); pos += 4; return value;
+      case 0xd3: value = Number(view.getBigInt64(pos)); pos += 8; return value;
+      case 0xd9: value = view.getUint8(pos); pos += 1; return str(value);
+      case 0xda: value = view.getUint16(pos); pos += 2; return str(value);
+      case 0xdb: value = view.getUint32(pos); pos += 4; return str(value);
+      case 0xdc: value = view.getUint16(pos); pos += 2; return array(value);
+      case 0xdd: value = view.getUint32(pos); pos += 4; return array(value);
+      case 0xde: value = view.getUint16(pos); pos += 2; return map(value);
+      case 0xdf: value = view.getUint32(pos); pos += 4; return map(value);
+      default:
+        throw new Error(`Unsupported msgpack byte 0x${byte.toString(16)}`);
+    }
+  }
+
+  return read();
+}
+
+// Decode one frame according to the negotiated subprotocol
+export async function decodeFrame(data: string | ArrayBuffer, protocol: string): Promise<any> {
+  if (typeof data === "string") return JSON.parse(data);
+
+  const frame = new Uint8Array(data);
+  let body = frame.subarray(1);
+  if (frame[0] === FLAG_DEFLATE) body = await inflate(body);
+
+  if (protocol === MSGPACK || protocol === MSGPACK_DEFLATE) return unpack(body);
+  return JSON.parse(utf8.decode(body));
+}
@@ -5,7 +5,7 @@ import { useAlertStore } from "../store/alertStore";
 import { useAuth } from "../store/authStore";
 
 export function useManagerWS() {
-  const { addAlert, increment } = useAlertStore();
+  const { addAlert, updateAlert, applyKpiSnapshot, applyKpiDelta } = useAlertStore();
   const { token, user } = useAuth.getState(); // synchronous snapshot
 
   useEffect(() => {
@@ -17,10 +17,19 @@ export function useManagerWS() {
         case "new_downtime_with_ai":
         case "downtime_created":
           if (payload) {
-            addAlert(payload);
-            increment();
+            addAlert(payload); // badge count comes with the kpi_delta
           }
           break;
+        case "kpi_snapshot":
+          applyKpiSnapshot(msg.day, msg.kpis);
+          break;
+        case "kpi_delta":
+          applyKpiDelta(msg.day, msg.delta);
+          break;
+        case "downtime_analysis":
+          // LLM refinement of the locally estimated severity / root cause
+          updateAlert(msg.id, { severity: msg.severity });
+          break;
         default:
           break;
       }
@@ -33,7 +42,7 @@ export function useManagerWS() {
     // Connect only if current user role is manager and token exists.
     if (user?.role === "manager" && (token || localStorage.getItem("token"))) {
       const t = token ?? localStorage.getItem("token")!;
-      wsClient.connect(t);
+      wsClient.connect(t, "manager");
     } else {
       // Ensure no connection for non-managers
       // do NOT forcibly disconnect here if you want persistent globally; but to be safe:
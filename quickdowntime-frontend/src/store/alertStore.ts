@@ -10,23 +10,42 @@ interface Alert {
   created_at: string;
 }
 
+// Live counters pushed by the server (kpi_snapshot on connect, then kpi_delta)
+export interface Kpis {
+  unseen_alerts?: number;
+  open_downtimes?: number;
+  today_downtimes?: number;
+  resolved_today?: number;
+  high_priority?: number;
+}
+
+const TODAY_FIELDS: (keyof Kpis)[] = ["today_downtimes", "resolved_today", "high_priority"];
+
 interface AlertState {
   count: number;
   alerts: Alert[];
+  kpis: Kpis | null;
+  kpiDay: string | null;
   
   setCount: (v: number) => void;
   increment: () => void;
   reset: () => void;
   
   addAlert: (alert: Alert) => void;
+  updateAlert: (id: number, patch: Partial<Alert>) => void;
   setAlerts: (alerts: Alert[]) => void;
   markAllSeen: () => void;
   updateCountFromAlerts: () => void;
+
+  applyKpiSnapshot: (day: string, kpis: Kpis) => void;
+  applyKpiDelta: (day: string, delta: Kpis) => void;
 }
 
 export const useAlertStore = create<AlertState>((set, get) => ({
   count: 0,
   alerts: [],
+  kpis: null,
+  kpiDay: null,
   
   setCount: (v) => set(() => ({ count: Math.max(0, v) })),
   
@@ -44,13 +63,18 @@ export const useAlertStore = create<AlertState>((set, get) => ({
   addAlert: (alert) =>
     set((state) => {
       const newAlerts = [alert, ...state.alerts];
-      // Don't auto-calculate count here - let the API be the source of truth
+      // Don't touch count here - it follows the server's kpi_delta messages
       return {
         alerts: newAlerts,
-        count: state.count + 1, // Just increment
       };
     }),
   
+  // Apply a later refinement (e.g. LLM severity) to an alert already shown
+  updateAlert: (id, patch) =>
+    set((state) => ({
+      alerts: state.alerts.map((a) => (a.id === id ? { ...a, ...patch } : a)),
+    })),
+  
   setAlerts: (alerts) =>
     set(() => {
       // Calculate unseen count from alerts
@@ -72,4 +96,31 @@ export const useAlertStore = create<AlertState>((set, get) => ({
     set((state) => ({
       count: state.alerts.filter(a => !a.seen).length,
     })),
+
+  applyKpiSnapshot: (day, kpis) =>
+    set((state) => ({
+      kpis: { ...kpis },
+      kpiDay: day,
+      count: kpis.unseen_alerts ?? state.count,
+    })),
+
+  applyKpiDelta: (day, delta) =>
+    set((state) => {
+      if (!state.kpis) return {}; // wait for the snapshot
+      const kpis: Kpis = { ...state.kpis };
+      if (day !== state.kpiDay) {
+        // new day: today's counters start over
+        TODAY_FIELDS.forEach((field) => {
+          if (field in kpis) kpis[field] = 0;
+        });
+      }
+      (Object.keys(delta) as (keyof Kpis)[]).forEach((field) => {
+        kpis[field] = Math.max(0, (kpis[field] ?? 0) + (delta[field] ?? 0));
+      });
+      return {
+        kpis,
+        kpiDay: day,
+        count: kpis.unseen_alerts ?? state.count,
+      };
+    }),
 }));
\ No newline at end of file
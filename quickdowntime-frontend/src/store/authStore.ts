@@ -1,31 +1,91 @@
 // src/store/authStore.ts
 import { create } from "zustand";
+import axios from "axios";
 import jwtDecode from "jwt-decode";
 import { wsClient } from "../services/wsClient";
 
+const API_BASE = import.meta.env.VITE_API_BASE || "http://localhost:8000";
+
+// Renew this long before the access token expires
+const REFRESH_MARGIN_MS = 60_000;
+
 interface AuthState {
   token: string | null;
   user: any | null;
-  setToken: (tk: string) => void;
+  setToken: (tk: string, refreshToken?: string) => void;
+  refresh: () => Promise<string | null>;
   logout: () => void;
 }
 
-export const useAuth = create<AuthState>((set) => ({
+let refreshTimer: ReturnType<typeof setTimeout> | null = null;
+let inFlight: Promise<string | null> | null = null;
+
+function scheduleRefresh(tk: string) {
+  if (refreshTimer) clearTimeout(refreshTimer);
+  refreshTimer = null;
+  if (!localStorage.getItem("refresh_token")) return;
+
+  const { exp } = jwtDecode<{ exp?: number }>(tk);
+  if (!exp) return;
+  const delay = Math.max(exp * 1000 - Date.now() - REFRESH_MARGIN_MS, 0);
+  refreshTimer = setTimeout(() => useAuth.getState().refresh(), delay);
+}
+
+export const useAuth = create<AuthState>((set, get) => ({
   token: localStorage.getItem("token"),
   user: localStorage.getItem("token")
     ? jwtDecode(localStorage.getItem("token")!)
     : null,
 
-  setToken: (tk: string) => {
+  setToken: (tk: string, refreshToken?: string) => {
     localStorage.setItem("token", tk);
-    const user = jwtDecode(tk);
+    if (refreshToken) localStorage.setItem("refresh_token", refreshToken);
+    const user: any = jwtDecode(tk);
     set({ token: tk, user });
-    // connect WS with new token immediately
-    wsClient.connect(tk);
+    scheduleRefresh(tk);
+    // connect WS with new token immediately (reconnects pick it up too)
+    wsClient.connect(tk, user?.role);
+  },
+
+  // Swap the refresh token for a new access token; null when the session
+  // is gone. Concurrent callers share one request, since each refresh
+  // token can only be used once.
+  refresh: () => {
+    if (inFlight) return inFlight;
+
+    const sent = localStorage.getItem("refresh_token");
+    if (!sent) return Promise.resolve(null);
+
+    inFlight = axios
+      .post(`${API_BASE}/auth/refresh`, { refresh_token: sent })
+      .then((r) => {
+        get().setToken(r.data.access_token, r.data.refresh_token);
+        return r.data.access_token as string;
+      })
+      .catch(() => {
+        // another tab may have rotated it first: adopt its tokens
+        const current = localStorage.getItem("refresh_token");
+        const token = localStorage.getItem("token");
+        if (current && current !== sent && token) {
+          get().setToken(token);
+          return token;
+        }
+        return null;
+      })
+      .finally(() => {
+        inFlight = null;
+      });
+    return inFlight;
   },
 
   logout: () => {
+    const refreshToken = localStorage.getItem("refresh_token");
+    if (refreshToken) {
+      axios.post(`${API_BASE}/auth/logout`, { refresh_token: refreshToken }).catch(() => {});
+    }
+    if (refreshTimer) clearTimeout(refreshTimer);
     localStorage.removeItem("token");
+    localStorage.removeItem("refresh_token");
     // disconnect websocket immediately
     try {
       wsClient.disconnect();
@@ -35,3 +95,7 @@ export const useAuth = create<AuthState>((set) => ({
     window.location.href = "/";
   },
 }));
+
+// Keep a restored session renewed
+const stored = localStorage.getItem("token");
+if (stored) scheduleRefresh(stored);
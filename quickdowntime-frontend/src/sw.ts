@@ -44,6 +44,16 @@ async function getOutboxEntries() {
     req.onerror = () => rej(req.error);
   });
 }
+async function putOutboxEntry(entry: any) {
+  const db = await openDB();
+  return new Promise((res, rej) => {
+    const tx = db.transaction("outbox", "readwrite");
+    const store = tx.objectStore("outbox");
+    store.put(entry);
+    tx.oncomplete = () => res(true);
+    tx.onerror = () => rej(tx.error);
+  });
+}
 async function deleteOutboxEntry(id: number) {
   const db = await openDB();
   return new Promise((res, rej) => {
@@ -112,7 +122,12 @@ self.addEventListener("message", (ev: any) => {
   const msg = ev.data || {};
   if (msg.type === "QUEUE_DOWNTIME") {
     // payload contains: { form: { ... }, files: { image: {...}, audio: {...} } }
-    saveOutboxEntry(msg.payload).then(() => {
+    // the idempotency key is fixed when the entry is queued, so every
+    // flush of it sends the same UUID
+    saveOutboxEntry({
+      payload: msg.payload,
+      idempotency_key: msg.payload?.idempotency_key || crypto.randomUUID()
+    }).then(() => {
       // try to register sync
       // @ts-ignore
       if (self.registration && (self.registration as any).sync) {
@@ -150,11 +165,19 @@ async function flushOutbox() {
         fd.append("audio", blob, e.payload.audioName || "audio.webm");
       }
 
-      // post to your upload endpoint
-      const fetchResp = await fetch("/api/downtime/log", {
+      // post to the upload endpoint
+      // the idempotency key lets the server drop replays of an entry that
+      // was already stored before a previous flush lost its response;
+      // entries queued before keys existed get one now and keep it
+      if (!e.idempotency_key) {
+        e.idempotency_key = e.payload.idempotency_key || crypto.randomUUID();
+        await putOutboxEntry(e);
+      }
+      const fetchResp = await fetch("/api/downtime/log-local", {
         method: "POST",
         body: fd,
-        credentials: "same-origin"
+        credentials: "same-origin",
+        headers: { "Idempotency-Key": e.idempotency_key }
       });
 
       if (fetchResp.ok) {
@@ -1,11 +1,18 @@
+import { v4 as uuidv4 } from "uuid";
 import client from "../api/axiosClient";
-import { getPendingLogs, deleteLog } from "./db";
+import { getPendingLogs, deleteLog, saveOfflineLog } from "./db";
 
 export async function syncOfflineLogs() {
   const logs = await getPendingLogs();
   if (!logs.length) return;
 
   for (const log of logs) {
+    // log-local only accepts UUID keys; store it so every retry reuses it
+    if (!log.idempotency_key) {
+      log.idempotency_key = uuidv4();
+      await saveOfflineLog(log);
+    }
+
     const fd = new FormData();
     fd.append("machine_id", log.machine_id);
     fd.append("reason", log.reason);
@@ -19,7 +26,9 @@ export async function syncOfflineLogs() {
       fd.append("audio", log.audioBlob, `${log.id}.webm`);
 
     try {
-      await client.post("/api/downtime/log-local", fd);
+      await client.post("/api/downtime/log-local", fd, {
+        headers: { "Idempotency-Key": log.idempotency_key },
+      });
       await deleteLog(log.id);
     } catch (err) {
       console.log("sync failed, will retry", err);